@@ -28,12 +28,22 @@ bl_info = {
 # load and reload submodules
 ##################################
 
-from . import developer_utils
-import importlib
+import os
+import time
 
-importlib.reload(developer_utils)
-modules = developer_utils.setup_addon_modules(
-    __path__, __name__, "bpy" in locals())
+# Set PREFLIGHT_DEV=1 to import every submodule up front and to register
+# the UI in background mode too, like older versions always did.
+DEV_MODE = os.environ.get("PREFLIGHT_DEV") == "1"
+
+# Reloading scripts needs every submodule reloaded, in order. Outside
+# of that, submodules are imported as they are needed.
+if DEV_MODE or "bpy" in locals():
+    from . import developer_utils
+    import importlib
+
+    importlib.reload(developer_utils)
+    modules = developer_utils.setup_addon_modules(
+        __path__, __name__, "bpy" in locals())
 
 
 # register
@@ -43,6 +53,9 @@ import traceback
 
 addon_keymaps = []
 
+# Wall time of the last register() call, in seconds
+register_seconds = 0.0
+
 
 def register_keymaps():
     global addon_keymaps
@@ -50,7 +63,7 @@ def register_keymaps():
     if kcfg:
         km = kcfg.keymaps.new(name='3D View', space_type='VIEW_3D')
         kmi_mnu = km.keymap_items.new("wm.call_menu", "M", "PRESS", alt=True)
-        kmi_mnu.properties.name = PF_MT_preflight_menu.bl_idname
+        kmi_mnu.properties.name = "PF_MT_preflight_menu"
         addon_keymaps.append((km, kmi_mnu))
 
 
@@ -66,9 +79,6 @@ from . properties import PreflightMeshGroup
 from . properties import PreflightExportGroup
 from . properties import PreflightExportOptionsGroup
 from . properties import PreflightOptionsGroup
-from . menus import PF_MT_preflight_menu
-from . menus import PF_MT_remove_export_group_menu
-from . menus import PF_MT_add_selection_menu
 from . operators import PF_OT_add_selection_to_preflight_group
 from . operators import PF_OT_create_preflight_group_from_selection
 from . operators import PF_OT_add_preflight_object_operator
@@ -76,12 +86,14 @@ from . operators import PF_OT_remove_preflight_object_operator
 from . operators import PF_OT_add_preflight_export_group_operator
 from . operators import PF_OT_remove_preflight_export_group_operator
 from . operators import PF_OT_export_mesh_group_operator
+from . operators import PF_OT_export_animation_clip_operator
 from . operators import PF_OT_export_mesh_groups_operator
+from . operators import PF_OT_plan_exports_operator
 from . operators import PF_OT_reset_export_options_operator
 from . operators import PF_OT_export_group_move_slot
-from . panels import PF_PT_preflight_panel
-from . panels import PF_PT_preflight_export_options_panel
-from . ui import PF_UL_export_object_ui_list
+from . import manifest
+from . import validity
+from . import watch
 
 
 classes = (
@@ -89,9 +101,6 @@ classes = (
     PreflightExportGroup,
     PreflightExportOptionsGroup,
     PreflightOptionsGroup,
-    PF_MT_preflight_menu,
-    PF_MT_remove_export_group_menu,
-    PF_MT_add_selection_menu,
     PF_OT_add_selection_to_preflight_group,
     PF_OT_create_preflight_group_from_selection,
     PF_OT_add_preflight_object_operator,
@@ -99,30 +108,91 @@ classes = (
     PF_OT_add_preflight_export_group_operator,
     PF_OT_remove_preflight_export_group_operator,
     PF_OT_export_mesh_group_operator,
+    PF_OT_export_animation_clip_operator,
     PF_OT_export_mesh_groups_operator,
+    PF_OT_plan_exports_operator,
     PF_OT_reset_export_options_operator,
     PF_OT_export_group_move_slot,
-    PF_PT_preflight_panel,
-    PF_PT_preflight_export_options_panel,
-    PF_UL_export_object_ui_list,
 )
 
+# UI classes, imported and registered only when there is a UI to show
+ui_classes = []
+
+
+def load_ui_classes():
+    from . menus import PF_MT_preflight_menu
+    from . menus import PF_MT_remove_export_group_menu
+    from . menus import PF_MT_add_selection_menu
+    from . panels import PF_PT_preflight_panel
+    from . panels import PF_PT_preflight_export_options_panel
+    from . ui import PF_UL_export_object_ui_list
+
+    return [
+        PF_MT_preflight_menu,
+        PF_MT_remove_export_group_menu,
+        PF_MT_add_selection_menu,
+        PF_PT_preflight_panel,
+        PF_PT_preflight_export_options_panel,
+        PF_UL_export_object_ui_list,
+    ]
+
+
+def register_ui():
+    """
+    Register menus, panels and keymaps. Skipped by register() in
+    background mode, where nothing is drawn.
+    """
+    from bpy.utils import register_class
+    if ui_classes:
+        return
+
+    ui_classes.extend(load_ui_classes())
+    for cls in ui_classes:
+        register_class(cls)
+
+    register_keymaps()
+    watch.register()
+
+
+def unregister_ui():
+    from bpy.utils import unregister_class
+    if not ui_classes:
+        return
+
+    for cls in reversed(ui_classes):
+        unregister_class(cls)
+    ui_classes.clear()
+
+    unregister_keymaps()
+    watch.unregister()
+
 
 def register():
+    global register_seconds
+    time_start = time.perf_counter()
+
     from bpy.utils import register_class
     for cls in classes:
         register_class(cls)
 
-    register_keymaps()
     bpy.types.Scene.preflight_props = bpy.props.PointerProperty(type=PreflightOptionsGroup)
+    validity.register()
+    manifest.register()
+
+    if DEV_MODE or not bpy.app.background:
+        register_ui()
+
+    register_seconds = time.perf_counter() - time_start
 
 
 def unregister():
     from bpy.utils import unregister_class
+    unregister_ui()
     for cls in reversed(classes):
         unregister_class(cls)
 
-    unregister_keymaps()
+    validity.unregister()
+    manifest.unregister()
 
 
 if __name__ == "__main__":
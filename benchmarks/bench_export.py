@@ -0,0 +1,157 @@
+import argparse
+import bpy
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+CLI_SCRIPT = os.path.join(os.path.dirname(BENCH_DIR), "cli", "preflight_blendfile.py")
+
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(CLI_SCRIPT))
+
+import preflight_blendfile  # noqa: E402
+import scenes  # noqa: E402
+
+
+def main():
+    """
+    Build each benchmark case as a synthetic scene, then time
+    preflight.export_all_groups in this process and the CLI end
+    to end in a fresh Blender process.
+
+    $ blender -b --factory-startup --python benchmarks/bench_export.py -- --output build/bench.json
+    $ python benchmarks/compare.py benchmarks/baseline.json build/bench.json
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark export throughput on synthetic scenes')
+    parser.add_argument('--cases', default=os.path.join(BENCH_DIR, "cases.json"),
+                        help='JSON file listing the benchmark cases.')
+    parser.add_argument('--case', nargs='+',
+                        help='Only run the cases with these names.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed exports per case.')
+    parser.add_argument('--skip-cli', action='store_true',
+                        help='Only time the operator, not the CLI.')
+    parser.add_argument('--output',
+                        help='Write the results as JSON to this path.')
+    args = parser.parse_known_args(preflight_blendfile.script_args())[0]
+
+    if not preflight_blendfile.check_addons(addons=["fbx_preflight", "io_scene_fbx"]):
+        print("Benchmark Failed.")
+        return False
+
+    from fbx_preflight import report
+
+    with open(args.cases) as cases_file:
+        cases = [case for case in json.load(cases_file)
+                 if not args.case or case["name"] in args.case]
+
+    results = {
+        "blender": bpy.app.version_string,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "cases": {},
+    }
+    work_dir = tempfile.mkdtemp(prefix="preflight-bench-")
+
+    try:
+        for case in cases:
+            print("Building {0}...".format(case["name"]))
+            results["cases"][case["name"]] = run_case(case, work_dir, args, report)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        output_dir = os.path.dirname(os.path.abspath(args.output))
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    return True
+
+
+def run_case(case, work_dir, args, report):
+    params = {key: value for key, value in case.items() if key != "name"}
+    case_dir = os.path.join(work_dir, case["name"])
+    blendfile = os.path.join(case_dir, "scene.blend")
+    report_path = os.path.join(case_dir, "report.json")
+    os.makedirs(case_dir)
+
+    vertices = scenes.build_scene(params)
+    bpy.context.scene.preflight_props.export_options.export_location = "//export"
+    bpy.ops.wm.save_as_mainfile(filepath=blendfile, check_existing=False)
+
+    result = {"params": params, "vertices": vertices}
+
+    def export_operator():
+        bpy.ops.preflight.export_all_groups(report_path=report_path)
+
+    result["export_all_groups"] = timed(export_operator, args.repeat)
+
+    # Stage totals and output counts of the last run
+    last_report = report.ExportReport.read(report_path)
+    result["files"] = len(last_report.groups)
+    result["failed"] = len(last_report.failed)
+    result["stages"] = sum_entries(group.get("stages", {}) for group in last_report.groups)
+    result["counts"] = sum_entries(group.get("counts", {}) for group in last_report.groups)
+
+    if not args.skip_cli:
+        command = [bpy.app.binary_path, "--background", blendfile,
+                   "--python", CLI_SCRIPT, "--", "--report", report_path]
+
+        def export_cli():
+            subprocess.run(command, stdout=subprocess.DEVNULL, check=True)
+
+        result["cli"] = timed(export_cli, args.repeat)
+
+    return result
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(max(1, repeat)):
+        time_start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - time_start)
+
+    return {
+        "best": min(timings),
+        "mean": sum(timings) / len(timings),
+    }
+
+
+def sum_entries(entries):
+    totals = {}
+    for entry in entries:
+        for key, value in entry.items():
+            if key == "peak_rss":
+                totals[key] = max(totals.get(key, 0), value)
+            else:
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def print_results(results):
+    print("\n------------------------------------------------------")
+    print("Blender {0}, {1}".format(results["blender"], results["platform"]))
+    for name, result in results["cases"].items():
+        line = "{0:<16} {1:>9} verts  {2:>4} files  operator {3:>8.3f}s".format(
+            name, result["vertices"], result["files"], result["export_all_groups"]["best"])
+        if "cli" in result:
+            line += "  cli {0:>8.3f}s".format(result["cli"]["best"])
+        print(line)
+        if result["failed"]:
+            print("                 {0} files failed to export".format(result["failed"]))
+
+
+if __name__ == "__main__":
+    main()
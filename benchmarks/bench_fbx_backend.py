@@ -0,0 +1,104 @@
+import argparse
+import bpy
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cli"))
+
+import preflight_blendfile  # noqa: E402
+
+
+def main():
+    """
+    Compare Blender's FBX exporter with the fast writer on a
+    generated scene of subdivided meshes.
+
+    $ blender -b --factory-startup --python benchmarks/bench_fbx_backend.py -- --objects 20 --subdivisions 4
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark the FBX export backends')
+    parser.add_argument('--objects', type=int, default=10,
+                        help='Number of meshes in the scene.')
+    parser.add_argument('--subdivisions', type=int, default=3,
+                        help='Subdivision levels applied to each mesh.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed exports per backend.')
+    parser.add_argument('--output',
+                        help='Write the results as JSON to this path.')
+    args = parser.parse_known_args(preflight_blendfile.script_args())[0]
+
+    if not preflight_blendfile.check_addons(addons=["fbx_preflight", "io_scene_fbx"]):
+        print("Benchmark Failed.")
+        return False
+
+    from fbx_preflight import fast_writer
+
+    objects = build_scene(args.objects, args.subdivisions)
+    export_options = bpy.context.scene.preflight_props.export_options
+    options = export_options.get_options_dict(bake_anim=False, use_mesh_modifiers=True)
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    output_dir = tempfile.mkdtemp(prefix="preflight-bench-")
+
+    def export_stock(filepath):
+        bpy.ops.object.select_all(action='DESELECT')
+        for obj in objects:
+            obj.select_set(True)
+        bpy.ops.export_scene.fbx(filepath=filepath, **options)
+
+    def export_fast(filepath):
+        fast_writer.export(objects, filepath, depsgraph, **options)
+
+    results = {
+        "objects": args.objects,
+        "subdivisions": args.subdivisions,
+        "vertices": sum(len(obj.evaluated_get(depsgraph).data.vertices) for obj in objects),
+        "backends": {},
+    }
+    for name, export in (("FBX", export_stock), ("FAST", export_fast)):
+        filepath = os.path.join(output_dir, "{0}.fbx".format(name))
+        timings = []
+        for _ in range(args.repeat):
+            time_start = time.perf_counter()
+            export(filepath)
+            timings.append(time.perf_counter() - time_start)
+        results["backends"][name] = {
+            "best": min(timings),
+            "mean": sum(timings) / len(timings),
+            "bytes": os.path.getsize(filepath),
+        }
+
+    print("\n------------------------------------------------------")
+    print("{0} objects, {1} vertices".format(results["objects"], results["vertices"]))
+    for name, result in results["backends"].items():
+        print("{0:<5} best {1:>8.4f}s  mean {2:>8.4f}s  {3:>10} bytes".format(
+            name, result["best"], result["mean"], result["bytes"]))
+    print("Speedup: {0:.2f}x".format(
+        results["backends"]["FBX"]["best"] / results["backends"]["FAST"]["best"]))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    return True
+
+
+def build_scene(count, subdivisions):
+    objects = []
+    for idx in range(count):
+        bpy.ops.mesh.primitive_monkey_add(location=(idx * 3.0, 0.0, 0.0))
+        obj = bpy.context.active_object
+        obj.name = "Bench.{0:03d}".format(idx)
+        obj.data.uv_layers.new(name="UVMap")
+        modifier = obj.modifiers.new("Subdivision", 'SUBSURF')
+        modifier.levels = subdivisions
+        modifier.render_levels = subdivisions
+        objects.append(obj)
+    return objects
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MARKER = "PREFLIGHT_REGISTER "
+
+# Run inside Blender: enable the add-on and print how long it took
+ENABLE_SCRIPT = """
+import addon_utils, json, time
+time_start = time.perf_counter()
+addon_utils.enable("fbx_preflight")
+enable_seconds = time.perf_counter() - time_start
+import fbx_preflight
+print("{marker}" + json.dumps({{
+    "enable_seconds": enable_seconds,
+    "register_seconds": fbx_preflight.register_seconds,
+}}), flush=True)
+""".format(marker=MARKER)
+
+
+def main():
+    """
+    Measure what enabling the add-on costs a background Blender,
+    with the lazy startup path and with PREFLIGHT_DEV=1, which
+    imports every submodule and registers the UI like older
+    versions did.
+
+    $ python benchmarks/bench_register.py --blender /path/to/blender --repeat 10
+    """
+    parser = argparse.ArgumentParser(
+        description='Benchmark add-on registration in background Blender')
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'),
+                        help='Path to the Blender executable.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of Blender launches per mode.')
+    parser.add_argument('--output',
+                        help='Write the results as JSON to this path.')
+    args = parser.parse_args()
+
+    results = {}
+    for mode, dev in (("dev", "1"), ("lazy", "0")):
+        runs = [launch(args.blender, dev) for _ in range(max(1, args.repeat))]
+        results[mode] = {
+            key: {
+                "best": min(run[key] for run in runs),
+                "mean": sum(run[key] for run in runs) / len(runs),
+            } for key in ("process_seconds", "enable_seconds", "register_seconds")
+        }
+
+    print("\n------------------------------------------------------")
+    for mode, result in results.items():
+        print("{0:<5} process {1:>7.3f}s  enable {2:>7.4f}s  register {3:>7.4f}s".format(
+            mode, result["process_seconds"]["best"], result["enable_seconds"]["best"],
+            result["register_seconds"]["best"]))
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    return True
+
+
+def launch(blender, dev):
+    env = dict(os.environ, PREFLIGHT_DEV=dev)
+    command = [blender, "--background", "--factory-startup",
+               "--python-expr", ENABLE_SCRIPT]
+
+    time_start = time.perf_counter()
+    output = subprocess.run(command, env=env, stdout=subprocess.PIPE,
+                            universal_newlines=True, check=True).stdout
+    process_seconds = time.perf_counter() - time_start
+
+    for line in output.splitlines():
+        if line.startswith(MARKER):
+            return dict(json.loads(line[len(MARKER):]), process_seconds=process_seconds)
+
+    raise RuntimeError("Blender did not report the add-on's register time.")
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
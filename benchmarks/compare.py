@@ -0,0 +1,93 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+
+# Timings compared between a baseline and a new run, by key in each case
+METRICS = ("export_all_groups", "cli")
+
+
+def main():
+    """
+    Compare benchmark results against a baseline, and exit with an
+    error when a case got slower than its threshold allows. Baselines
+    depend on the machine, so none is committed: without one, the
+    results are only recorded as the baseline when --update is given.
+
+    $ python benchmarks/compare.py benchmarks/baseline.json build/bench.json --threshold 0.2
+    """
+    parser = argparse.ArgumentParser(
+        description='Check benchmark results for regressions')
+    parser.add_argument('baseline', help='Results of the reference run.')
+    parser.add_argument('results', help='Results of the run to check.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown as a fraction of the baseline, unless a case sets its own.')
+    parser.add_argument('--min-seconds', type=float, default=0.05,
+                        help='Ignore slowdowns smaller than this, which are mostly noise.')
+    parser.add_argument('--update', action='store_true',
+                        help='Save the results as the new baseline once they pass, or when there is no baseline yet.')
+    args = parser.parse_args()
+
+    with open(args.results) as results_file:
+        results = json.load(results_file)
+
+    if not os.path.exists(args.baseline):
+        print("No baseline at {0}, nothing to compare.".format(args.baseline))
+        if args.update:
+            save_baseline(args.results, args.baseline)
+        else:
+            print("Record one on this machine with --update.")
+        return True
+
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions = compare(baseline, results, args.threshold, args.min_seconds)
+    for line in regressions:
+        print(line)
+
+    print("{0} regressions in {1} cases.".format(len(regressions), len(results["cases"])))
+    if args.update and not regressions:
+        save_baseline(args.results, args.baseline)
+    return not regressions
+
+
+def save_baseline(results_path, baseline_path):
+    baseline_dir = os.path.dirname(baseline_path)
+    if baseline_dir and not os.path.exists(baseline_dir):
+        os.makedirs(baseline_dir)
+    shutil.copyfile(results_path, baseline_path)
+    print("Saved {0} as the baseline.".format(results_path))
+
+
+def compare(baseline, results, threshold, min_seconds):
+    """Return a line describing each timing that regressed."""
+    regressions = []
+
+    for name, result in sorted(results["cases"].items()):
+        reference = baseline["cases"].get(name)
+        if reference is None:
+            print("{0:<16} new case, no baseline".format(name))
+            continue
+
+        allowed = result["params"].get("threshold", threshold)
+        for metric in METRICS:
+            if metric not in result or metric not in reference:
+                continue
+
+            before = reference[metric]["best"]
+            after = result[metric]["best"]
+            change = (after - before) / before if before else 0.0
+            print("{0:<16} {1:<18} {2:>8.3f}s -> {3:>8.3f}s  {4:>+7.1%}".format(
+                name, metric, before, after, change))
+
+            if change > allowed and after - before > min_seconds:
+                regressions.append("REGRESSION {0} {1}: {2:+.1%} (allowed {3:+.1%})".format(
+                    name, metric, change, allowed))
+
+    return regressions
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
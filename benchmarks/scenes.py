@@ -0,0 +1,171 @@
+import bpy
+import math
+
+# Modifiers stacked on every mesh, in order, cheap enough to stack deep
+MODIFIER_STACK = [
+    ('SIMPLE_DEFORM', {"deform_method": 'TWIST', "angle": 0.2}),
+    ('DISPLACE', {"strength": 0.05}),
+    ('WAVE', {"height": 0.1}),
+    ('SMOOTH', {"factor": 0.2, "iterations": 1}),
+]
+
+DEFAULT_CASE = {
+    "groups": 1,
+    "objects_per_group": 1,
+    "polycount": 1000,
+    "modifiers": 0,
+    "armatures": 0,
+    "bones": 16,
+    "actions": 0,
+    "frames": 30,
+}
+
+
+def clear_scene():
+    """Remove every object, mesh, armature, action and export group."""
+    for collection in (bpy.data.objects, bpy.data.meshes,
+                       bpy.data.armatures, bpy.data.actions):
+        for block in list(collection):
+            collection.remove(block)
+
+    bpy.context.scene.preflight_props.fbx_export_groups.clear()
+
+
+def build_scene(case):
+    """
+    Build a scene of export groups from a benchmark case, a dict
+    with the keys of DEFAULT_CASE:
+
+    groups, objects_per_group -- export groups of grid meshes
+    polycount -- faces per mesh
+    modifiers -- depth of the modifier stack on each mesh
+    armatures, bones, actions, frames -- rigged groups, each with
+        a chain of bones, a skinned mesh and its own actions
+
+    Return the number of vertices in the scene before modifiers.
+    """
+    case = dict(DEFAULT_CASE, **case)
+    clear_scene()
+
+    scene = bpy.context.scene
+    groups = scene.preflight_props.fbx_export_groups
+    side = max(1, int(math.sqrt(case["polycount"])))
+    vertices = 0
+
+    for group_idx in range(case["groups"]):
+        group = groups.add()
+        group.name = "Group.{0:03d}".format(group_idx)
+        group.apply_modifiers = True
+
+        for obj_idx in range(case["objects_per_group"]):
+            obj = new_grid("Mesh.{0:03d}.{1:03d}".format(group_idx, obj_idx), side)
+            obj.location = (obj_idx * 3.0, group_idx * 3.0, 0.0)
+            add_modifiers(obj, case["modifiers"])
+            add_to_group(group, obj)
+            vertices += len(obj.data.vertices)
+
+    for rig_idx in range(case["armatures"]):
+        group = groups.add()
+        group.name = "Rig.{0:03d}".format(rig_idx)
+        group.include_animations = True
+
+        armature = new_armature("Rig.{0:03d}".format(rig_idx), case["bones"])
+        armature.location = (rig_idx * 3.0, -6.0, 0.0)
+        mesh = new_grid("Skin.{0:03d}".format(rig_idx), side)
+        mesh.parent = armature
+        modifier = mesh.modifiers.new("Armature", 'ARMATURE')
+        modifier.object = armature
+        skin_to_chain(mesh, armature)
+
+        for action_idx in range(case["actions"]):
+            new_action(armature, "Action.{0:03d}.{1:03d}".format(rig_idx, action_idx),
+                       case["frames"], seed=action_idx)
+
+        add_to_group(group, armature)
+        add_to_group(group, mesh)
+        vertices += len(mesh.data.vertices)
+
+    scene.preflight_props.export_options.export_animation_clips = case["actions"] > 0
+    return vertices
+
+
+def add_to_group(group, obj):
+    item = group.obj_names.add()
+    item.obj_pointer = obj
+
+
+def new_grid(name, side):
+    """Add an object with a flat grid mesh of side * side quads."""
+    coords = [((x / side) * 2.0 - 1.0, (y / side) * 2.0 - 1.0, 0.0)
+              for y in range(side + 1) for x in range(side + 1)]
+    faces = []
+    for y in range(side):
+        for x in range(side):
+            v = y * (side + 1) + x
+            faces.append((v, v + 1, v + side + 2, v + side + 1))
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.from_pydata(coords, [], faces)
+    mesh.uv_layers.new(name="UVMap")
+    mesh.update()
+
+    obj = bpy.data.objects.new(name, mesh)
+    bpy.context.scene.collection.objects.link(obj)
+    return obj
+
+
+def add_modifiers(obj, depth):
+    for idx in range(depth):
+        modifier_type, settings = MODIFIER_STACK[idx % len(MODIFIER_STACK)]
+        modifier = obj.modifiers.new("{0}.{1}".format(modifier_type.title(), idx), modifier_type)
+        for key, value in settings.items():
+            setattr(modifier, key, value)
+
+
+def new_armature(name, bone_count):
+    """Add an armature with a single chain of bones along Z."""
+    armature = bpy.data.armatures.new(name)
+    obj = bpy.data.objects.new(name, armature)
+    bpy.context.scene.collection.objects.link(obj)
+
+    bpy.context.view_layer.objects.active = obj
+    bpy.ops.object.mode_set(mode='EDIT')
+    parent = None
+    length = 2.0 / bone_count
+    for idx in range(bone_count):
+        bone = armature.edit_bones.new("Bone.{0:03d}".format(idx))
+        bone.head = (0.0, 0.0, idx * length)
+        bone.tail = (0.0, 0.0, (idx + 1) * length)
+        bone.parent = parent
+        bone.use_connect = parent is not None
+        parent = bone
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return obj
+
+
+def skin_to_chain(mesh, armature):
+    """Weight each vertex of a mesh to the bone nearest along its Y axis."""
+    bones = armature.data.bones
+    groups = [mesh.vertex_groups.new(name=bone.name) for bone in bones]
+    for vertex in mesh.data.vertices:
+        idx = min(len(bones) - 1, int((vertex.co.y + 1.0) / 2.0 * len(bones)))
+        groups[idx].add([vertex.index], 1.0, 'REPLACE')
+
+
+def new_action(armature, name, frames, seed=0):
+    """Add an action that keys the rotation of every bone, and stash it."""
+    action = bpy.data.actions.new(name)
+    action.use_fake_user = True
+
+    for bone_idx, bone in enumerate(armature.pose.bones):
+        data_path = 'pose.bones["{0}"].rotation_quaternion'.format(bone.name)
+        for axis in range(4):
+            fcurve = action.fcurves.new(data_path, index=axis, action_group=bone.name)
+            fcurve.keyframe_points.add(frames)
+            for frame in range(frames):
+                phase = (frame + seed + bone_idx) / max(1, frames) * 2.0 * math.pi
+                value = 1.0 if axis == 0 else 0.2 * math.sin(phase + axis)
+                fcurve.keyframe_points[frame].co = (frame + 1, value)
+            fcurve.update()
+
+    return action
@@ -0,0 +1,383 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import contextlib
+import hashlib
+import json
+import os
+from array import array
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+CACHE_FILENAME = ".preflight_cache.json"
+CACHE_VERSION = 1
+
+
+class ExportCache:
+    """
+    Record of the fingerprint each export group was last
+    successfully exported with, stored next to the exports.
+    """
+
+    def __init__(self, path, entries=None):
+        self.path = path
+        self.entries = entries or {}
+        self.updated = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, export_dir):
+        """Load the cache for an export directory, or start an empty one."""
+        path = os.path.join(bpy.path.abspath(export_dir), CACHE_FILENAME)
+        return cls(path, read_entries(path))
+
+    def is_current(self, group_name, fingerprint, export_path):
+        """
+        Return true if the group was last exported with this
+        fingerprint and its output is still on disk.
+        """
+        entry = self.entries.get(group_name)
+        current = (entry is not None
+                   and entry.get("fingerprint") == fingerprint
+                   and entry.get("filepath") == export_path
+                   and os.path.exists(export_path))
+
+        if current:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+        return current
+
+    def record(self, group_name, fingerprint, export_path):
+        entry = {
+            "fingerprint": fingerprint,
+            "filepath": export_path,
+        }
+        self.entries[group_name] = entry
+        self.updated[group_name] = entry
+
+    def save(self):
+        """
+        Write the groups recorded by this run into the cache file.
+        Entries written by other processes since the cache was
+        loaded are kept, so parallel workers can share one cache.
+        """
+        if not self.updated:
+            return True
+
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with cache_lock(self.path):
+                entries = read_entries(self.path)
+                entries.update(self.updated)
+
+                tmp_path = "{0}.{1}.tmp".format(self.path, os.getpid())
+                with open(tmp_path, "w") as cache_file:
+                    json.dump({"version": CACHE_VERSION, "groups": entries},
+                              cache_file, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+        except OSError:
+            return False
+
+        self.entries = entries
+        self.updated = {}
+        return True
+
+
+def read_entries(path):
+    try:
+        with open(path, "r") as cache_file:
+            data = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+    if data.get("version") != CACHE_VERSION:
+        return {}
+    return data.get("groups", {})
+
+
+@contextlib.contextmanager
+def cache_lock(path):
+    """Hold an exclusive lock on the cache file where the platform allows it."""
+    if fcntl is None:
+        yield
+        return
+
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+#
+# Fingerprinting
+#
+
+
+def fingerprint_group(group, objects, options):
+    """
+    Return a hex digest covering everything that ends up in the
+    exported file for a group: the resolved export options, object
+    transforms and data, modifier stacks, armatures and actions.
+    """
+    digest = hashlib.sha1()
+    update_json(digest, {"name": group.name, "options": options})
+
+    seen = set()
+    bake_anim = options.get("bake_anim", False)
+    for obj in sorted(filter(None, objects), key=lambda o: o.name):
+        update_object(digest, obj, seen, bake_anim)
+
+    return digest.hexdigest()
+
+
+def fingerprint_clip(armature, action, options):
+    """
+    Return a hex digest for an animation clip: one action baked
+    onto an armature. The current pose is left out, as the action
+    replaces it on every exported frame.
+    """
+    digest = hashlib.sha1()
+    update_json(digest, {
+        "armature": armature.name,
+        "action": action.name,
+        "options": options,
+        "matrix": [list(row) for row in armature.matrix_world],
+    })
+    update_armature(digest, armature, pose=False)
+    update_action(digest, action)
+    return digest.hexdigest()
+
+
+def update_json(digest, value):
+    digest.update(json.dumps(
+        value, sort_keys=True, default=_json_default).encode("utf-8"))
+
+
+def _json_default(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if hasattr(value, "name"):
+        return value.name
+    try:
+        return list(value)
+    except TypeError:
+        return repr(value)
+
+
+def update_bulk(digest, collection, attr, width, typecode="f"):
+    """Hash a bulk attribute of a bpy collection with foreach_get."""
+    values = array(typecode, [0]) * (len(collection) * width)
+    if values:
+        collection.foreach_get(attr, values)
+    digest.update(values.tobytes())
+
+
+def update_rna(digest, struct):
+    """Hash the plain RNA properties of a struct, like a modifier."""
+    values = {}
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type == 'COLLECTION':
+            continue
+        value = getattr(struct, prop.identifier, None)
+        if prop.type == 'POINTER':
+            value = getattr(value, "name", None)
+        elif getattr(prop, "is_array", False):
+            value = list(value)
+        values[prop.identifier] = value
+
+    update_json(digest, values)
+
+
+def update_object(digest, obj, seen, bake_anim=False):
+    if obj is None or obj.name in seen:
+        return
+    seen.add(obj.name)
+
+    update_json(digest, {
+        "name": obj.name,
+        "type": obj.type,
+        "parent": obj.parent.name if obj.parent else None,
+        "parent_bone": obj.parent_bone,
+        "matrix": [list(row) for row in obj.matrix_world],
+        "materials": [slot.material.name if slot.material else None
+                      for slot in obj.material_slots],
+        "vertex_groups": [vg.name for vg in obj.vertex_groups],
+        "properties": id_properties(obj),
+        "data_properties": id_properties(obj.data) if obj.data is not None else None,
+    })
+
+    for modifier in obj.modifiers:
+        update_rna(digest, modifier)
+        # Modifiers like booleans pull in geometry from other objects.
+        for prop in modifier.bl_rna.properties:
+            if prop.type == 'POINTER':
+                target = getattr(modifier, prop.identifier, None)
+                if isinstance(target, bpy.types.Object):
+                    update_object(digest, target, seen, bake_anim)
+
+    if obj.type == 'MESH':
+        update_mesh(digest, obj.data, obj.vertex_groups)
+    elif obj.type == 'ARMATURE':
+        update_armature(digest, obj)
+    elif obj.data is not None:
+        update_rna(digest, obj.data)
+
+    for slot in obj.material_slots:
+        if slot.material is not None and ("material", slot.material.name) not in seen:
+            seen.add(("material", slot.material.name))
+            update_material(digest, slot.material)
+
+    for action in object_actions(obj, bake_anim):
+        update_action(digest, action)
+
+
+def object_actions(obj, bake_anim):
+    """
+    Return the actions that end up in an export of an object: the
+    active one, and with baked animation the actions of its NLA
+    tracks, stashed actions included, which the exporter bakes too.
+    """
+    animation_data = obj.animation_data
+    if animation_data is None:
+        return []
+    actions = [animation_data.action] if animation_data.action else []
+    if bake_anim:
+        actions += [strip.action for track in animation_data.nla_tracks
+                    for strip in track.strips if strip.action]
+    return actions
+
+
+def update_material(digest, material):
+    """
+    Hash the settings of a material and its node tree that the
+    exporter writes: colors and factors, shader inputs and images.
+    """
+    update_rna(digest, material)
+    if not material.use_nodes or material.node_tree is None:
+        return
+
+    node_tree = material.node_tree
+    for node in sorted(node_tree.nodes, key=lambda n: n.name):
+        image = getattr(node, "image", None)
+        update_json(digest, {
+            "name": node.name,
+            "type": node.bl_idname,
+            "inputs": [[socket.identifier, getattr(socket, "default_value", None)]
+                       for socket in node.inputs],
+            "image": [image.name, image.filepath] if image is not None else None,
+        })
+    update_json(digest, sorted(
+        [link.from_node.name, link.from_socket.identifier,
+         link.to_node.name, link.to_socket.identifier]
+        for link in node_tree.links))
+
+
+def id_properties(datablock):
+    """Return the custom properties of a datablock as plain values."""
+    values = {}
+    for key in datablock.keys():
+        value = datablock[key]
+        if hasattr(value, "to_dict"):
+            value = value.to_dict()
+        elif hasattr(value, "to_list"):
+            value = value.to_list()
+        values[key] = value
+    return values
+
+
+def update_mesh(digest, mesh, vertex_groups):
+    update_json(digest, [mesh.name, [uv.name for uv in mesh.uv_layers]])
+    update_bulk(digest, mesh.vertices, "co", 3)
+    update_bulk(digest, mesh.polygons, "loop_total", 1, typecode="i")
+    update_bulk(digest, mesh.loops, "vertex_index", 1, typecode="i")
+    update_bulk(digest, mesh.polygons, "material_index", 1, typecode="i")
+    update_bulk(digest, mesh.polygons, "use_smooth", 1, typecode="i")
+    update_bulk(digest, mesh.edges, "use_edge_sharp", 1, typecode="i")
+    for uv_layer in mesh.uv_layers:
+        update_bulk(digest, uv_layer.data, "uv", 2)
+
+    # Shape keys, vertex colors and custom normals are exported too
+    shape_keys = mesh.shape_keys
+    if shape_keys is not None:
+        update_json(digest, [shape_keys.use_relative, [
+            [block.name, block.relative_key.name, block.value, block.slider_min,
+             block.slider_max, block.mute, block.vertex_group, block.interpolation]
+            for block in shape_keys.key_blocks]])
+        for block in shape_keys.key_blocks:
+            update_bulk(digest, block.data, "co", 3)
+
+    # Blender 3.2+ keeps vertex colors as color attributes
+    color_layers = getattr(mesh, "color_attributes", None)
+    if color_layers is None:
+        color_layers = mesh.vertex_colors
+    update_json(digest, [[layer.name, getattr(layer, "domain", "CORNER")]
+                         for layer in color_layers])
+    for layer in color_layers:
+        update_bulk(digest, layer.data, "color", 4)
+
+    update_json(digest, mesh.has_custom_normals)
+    if mesh.has_custom_normals:
+        if hasattr(mesh, "corner_normals"):
+            # Blender 4.1+
+            update_bulk(digest, mesh.corner_normals, "vector", 3)
+        else:
+            mesh.calc_normals_split()
+            update_bulk(digest, mesh.loops, "normal", 3)
+
+    if len(vertex_groups):
+        weights = array("f")
+        for vertex in mesh.vertices:
+            for elem in vertex.groups:
+                weights.append(elem.group)
+                weights.append(elem.weight)
+        digest.update(weights.tobytes())
+
+
+def update_armature(digest, obj, pose=True):
+    armature = obj.data
+    update_json(digest, [{
+        "name": bone.name,
+        "parent": bone.parent.name if bone.parent else None,
+        "deform": bone.use_deform,
+        "matrix": [list(row) for row in bone.matrix_local],
+        "tail": list(bone.tail_local),
+    } for bone in armature.bones])
+
+    if not pose:
+        return
+
+    update_json(digest, [[list(row) for row in pose_bone.matrix_basis]
+                         for pose_bone in obj.pose.bones])
+
+
+def update_action(digest, action):
+    update_json(digest, [action.name, list(action.frame_range)])
+    for fcurve in action.fcurves:
+        update_json(digest, [fcurve.data_path, fcurve.array_index])
+        update_bulk(digest, fcurve.keyframe_points, "co", 2)
+        update_bulk(digest, fcurve.keyframe_points, "handle_left", 2)
+        update_bulk(digest, fcurve.keyframe_points, "handle_right", 2)
@@ -0,0 +1,563 @@
+import gzip
+import mmap
+import struct
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Struct formats of SDNA basic types, by type name
+BASIC_TYPES = {
+    "char": "b", "uchar": "B", "int8_t": "b", "uint8_t": "B", "bool": "?",
+    "short": "h", "ushort": "H", "int16_t": "h", "uint16_t": "H",
+    "int": "i", "uint": "I", "int32_t": "i", "uint32_t": "I",
+    "float": "f", "double": "d",
+    "int64_t": "q", "uint64_t": "Q", "long": "i", "ulong": "I",
+}
+
+# IDProperty types
+IDP_STRING = 0
+IDP_INT = 1
+IDP_FLOAT = 2
+IDP_ARRAY = 5
+IDP_GROUP = 6
+IDP_ID = 7
+IDP_DOUBLE = 8
+IDP_IDPARRAY = 9
+IDP_BOOLEAN = 10
+
+IDP_ARRAY_FORMATS = {IDP_INT: "i", IDP_FLOAT: "f", IDP_DOUBLE: "d", IDP_BOOLEAN: "b"}
+
+# Object types, from DNA_object_types.h
+OBJECT_TYPES = {
+    0: 'EMPTY', 1: 'MESH', 2: 'CURVE', 3: 'SURFACE', 4: 'FONT', 5: 'META',
+    10: 'LIGHT', 11: 'CAMERA', 12: 'SPEAKER', 13: 'LIGHT_PROBE', 22: 'LATTICE',
+    25: 'ARMATURE', 26: 'GPENCIL', 27: 'CURVES', 28: 'POINTCLOUD', 29: 'VOLUME',
+    30: 'GREASEPENCIL',
+}
+
+
+class BlendFileError(Exception):
+    pass
+
+
+class Block:
+    """A file block: its header fields and where its data starts."""
+    __slots__ = ("code", "size", "address", "sdna_index", "count", "offset")
+
+    def __init__(self, code, size, address, sdna_index, count, offset):
+        self.code = code
+        self.size = size
+        self.address = address
+        self.sdna_index = sdna_index
+        self.count = count
+        self.offset = offset
+
+
+class StructType:
+    """Layout of one SDNA struct: its fields with their offsets."""
+    __slots__ = ("name", "size", "fields")
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        # field name -> (offset, type name, is pointer, item count)
+        self.fields = {}
+
+
+class BlendFile:
+    """
+    Read-only access to the blocks of a .blend file, without Blender.
+
+    Only block headers and the SDNA are parsed up front. Structs are
+    decoded field by field when they are read, so reading a few
+    datablocks from a large file touches little of it. Compressed
+    files are decompressed in memory: gzip, and zstd when Python
+    3.14's compression.zstd or the zstandard package is available.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            magic = self._file.read(4)
+            self._file.seek(0)
+            if magic.startswith(GZIP_MAGIC):
+                self.data = gzip.decompress(self._file.read())
+            elif magic == ZSTD_MAGIC:
+                self.data = decompress_zstd(self._file.read())
+            else:
+                self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._read_header()
+            self._read_blocks()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self):
+        if isinstance(getattr(self, "data", None), mmap.mmap):
+            self.data.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read_header(self):
+        head = bytes(self.data[:17])
+        if not head.startswith(b"BLENDER"):
+            raise BlendFileError("Not a .blend file: {0}".format(self.path))
+
+        if head[7:9].isdigit():
+            # BLENDER17-01v0500: header size, file format, endianness, version
+            self.header_size = int(head[7:9])
+            self.pointer_size = 8
+            self.endian = "<" if head[12:13] == b"v" else ">"
+            self.version = int(head[13:17])
+            self.bhead = struct.Struct(self.endian + "4siQqq")
+            self.bhead_fields = ("code", "sdna_index", "address", "size", "count")
+        else:
+            # BLENDER-v279: pointer size, endianness, version
+            self.header_size = 12
+            self.pointer_size = 8 if head[7:8] == b"-" else 4
+            self.endian = "<" if head[8:9] == b"v" else ">"
+            self.version = int(head[9:12])
+            self.bhead = struct.Struct(
+                self.endian + "4si" + ("Q" if self.pointer_size == 8 else "I") + "ii")
+            self.bhead_fields = ("code", "size", "address", "sdna_index", "count")
+
+        self.pointer_format = self.endian + ("Q" if self.pointer_size == 8 else "I")
+
+    def _read_blocks(self):
+        self.blocks = []
+        self.by_address = {}
+        self.by_code = {}
+
+        data = self.data
+        offset = self.header_size
+        unpack = self.bhead.unpack_from
+        head_size = self.bhead.size
+        fields = self.bhead_fields
+        end = len(data)
+        sdna_block = None
+
+        while offset + head_size <= end:
+            values = dict(zip(fields, unpack(data, offset)))
+            code = values["code"]
+            if code == b"ENDB":
+                break
+
+            block = Block(code, values["size"], values["address"],
+                          values["sdna_index"], values["count"], offset + head_size)
+            offset = block.offset + block.size
+
+            if code == b"DNA1":
+                sdna_block = block
+                continue
+            self.blocks.append(block)
+            self.by_address[block.address] = block
+            self.by_code.setdefault(code.rstrip(b"\x00"), []).append(block)
+
+        if sdna_block is None:
+            raise BlendFileError("No SDNA in {0}".format(self.path))
+        self._read_sdna(bytes(data[sdna_block.offset:sdna_block.offset + sdna_block.size]))
+
+    def _read_sdna(self, sdna):
+        endian = self.endian
+        pos = 8  # "SDNA" "NAME"
+
+        def read_int():
+            nonlocal pos
+            value = struct.unpack_from(endian + "i", sdna, pos)[0]
+            pos += 4
+            return value
+
+        def read_strings(count):
+            nonlocal pos
+            strings = []
+            for _ in range(count):
+                end = sdna.index(b"\x00", pos)
+                strings.append(sdna[pos:end].decode("utf-8", "replace"))
+                pos = end + 1
+            return strings
+
+        def align():
+            nonlocal pos
+            pos = (pos + 3) & ~3
+
+        names = read_strings(read_int())
+        align()
+        pos += 4  # "TYPE"
+        types = read_strings(read_int())
+        align()
+        pos += 4  # "TLEN"
+        lengths = struct.unpack_from(endian + "{0}h".format(len(types)), sdna, pos)
+        pos += 2 * len(types)
+        align()
+        pos += 4  # "STRC"
+
+        self.structs = []
+        self.struct_by_name = {}
+        for _ in range(read_int()):
+            type_index, field_count = struct.unpack_from(endian + "2h", sdna, pos)
+            pos += 4
+            fields = struct.unpack_from(endian + "{0}h".format(2 * field_count), sdna, pos)
+            pos += 4 * field_count
+
+            struct_type = StructType(types[type_index], lengths[type_index])
+            offset = 0
+            for idx in range(field_count):
+                field_type = types[fields[2 * idx]]
+                name = names[fields[2 * idx + 1]]
+                is_pointer = name.startswith("*") or name.startswith("(")
+                count = array_length(name)
+                size = self.pointer_size if is_pointer else lengths[fields[2 * idx]]
+                struct_type.fields[field_name(name)] = (offset, field_type, is_pointer, count)
+                offset += size * count
+
+            self.structs.append(struct_type)
+            self.struct_by_name[struct_type.name] = struct_type
+
+    #
+    # Reading structs
+    #
+
+    def view(self, block, struct_name=None, index=0):
+        """Return a view of the index-th struct stored in a block."""
+        struct_type = self.struct_by_name[struct_name] if struct_name \
+            else self.structs[block.sdna_index]
+        return StructView(self, struct_type, block.offset + index * struct_type.size)
+
+    def deref(self, address, struct_name=None):
+        """Return a view of the struct a pointer points to, or None."""
+        block = self.by_address.get(address) if address else None
+        if block is None:
+            return None
+        return self.view(block, struct_name)
+
+    def block_bytes(self, address, size=None):
+        block = self.by_address.get(address) if address else None
+        if block is None:
+            return b""
+        return bytes(self.data[block.offset:block.offset + (block.size if size is None else size)])
+
+    def iter_list(self, listbase, struct_name=None):
+        """Yield views of the items of a ListBase, following their next pointers."""
+        address = listbase["first"]
+        seen = set()
+        while address and address not in seen:
+            seen.add(address)
+            item = self.deref(address, struct_name)
+            if item is None:
+                return
+            yield item
+            address = item["next"]
+
+    def datablocks(self, code):
+        """Yield views of the ID datablocks with a two letter code, like b"OB"."""
+        for block in self.by_code.get(code, []):
+            yield self.view(block)
+
+    #
+    # ID properties
+    #
+
+    def read_idproperty(self, prop):
+        """Convert an IDProperty struct to Python values."""
+        prop_type = prop["type"]
+        data = prop["data"]
+
+        if prop_type == IDP_STRING:
+            return decode_string(self.block_bytes(data["pointer"], prop["len"]))
+        if prop_type == IDP_INT:
+            return data["val"]
+        if prop_type == IDP_BOOLEAN:
+            return bool(data["val"])
+        if prop_type == IDP_FLOAT:
+            return struct.unpack(self.endian + "f", struct.pack(self.endian + "i", data["val"]))[0]
+        if prop_type == IDP_DOUBLE:
+            return struct.unpack(self.endian + "d", struct.pack(
+                self.endian + "ii", data["val"], data["val2"]))[0]
+        if prop_type == IDP_ARRAY:
+            item_format = IDP_ARRAY_FORMATS.get(prop["subtype"])
+            if item_format is None:
+                return []
+            raw = self.block_bytes(data["pointer"])
+            count = min(prop["len"], len(raw) // struct.calcsize(item_format))
+            return list(struct.unpack_from(self.endian + item_format * count, raw))
+        if prop_type == IDP_GROUP:
+            return {child["name"]: self.read_idproperty(child)
+                    for child in self.iter_list(data["group"], "IDProperty")}
+        if prop_type == IDP_IDPARRAY:
+            block = self.by_address.get(data["pointer"]) if data["pointer"] else None
+            if block is None:
+                return []
+            return [self.read_idproperty(self.view(block, "IDProperty", idx))
+                    for idx in range(prop["len"])]
+        if prop_type == IDP_ID:
+            return IDReference(data["pointer"], self.id_name(data["pointer"]))
+        return None
+
+    def id_properties(self, id_view):
+        """Return the custom properties of a datablock as a dict."""
+        prop = self.deref(id_view["id"]["properties"], "IDProperty")
+        return self.read_idproperty(prop) if prop is not None else {}
+
+    def id_name(self, address):
+        view = self.deref(address)
+        if view is None or "id" not in view.struct_type.fields:
+            return None
+        return view["id"]["name"][2:]
+
+
+class IDReference:
+    """A pointer to a datablock, from an ID property."""
+    __slots__ = ("address", "name")
+
+    def __init__(self, address, name):
+        self.address = address
+        self.name = name
+
+    def __repr__(self):
+        return "IDReference({0!r})".format(self.name)
+
+
+class StructView:
+    """Lazy access to the fields of one struct in a file's data."""
+    __slots__ = ("blend", "struct_type", "offset")
+
+    def __init__(self, blend, struct_type, offset):
+        self.blend = blend
+        self.struct_type = struct_type
+        self.offset = offset
+
+    def __contains__(self, name):
+        return name in self.struct_type.fields
+
+    def get(self, name, default=None):
+        return self[name] if name in self.struct_type.fields else default
+
+    def __getitem__(self, name):
+        offset, field_type, is_pointer, count = self.struct_type.fields[name]
+        blend = self.blend
+        offset += self.offset
+
+        if is_pointer:
+            if count == 1:
+                return struct.unpack_from(blend.pointer_format, blend.data, offset)[0]
+            return list(struct.unpack_from(
+                blend.endian + blend.pointer_format[-1] * count, blend.data, offset))
+
+        if field_type == "char" and count > 1:
+            return decode_string(blend.data[offset:offset + count])
+
+        item_format = BASIC_TYPES.get(field_type)
+        if item_format is not None:
+            values = struct.unpack_from(blend.endian + item_format * count, blend.data, offset)
+            return values[0] if count == 1 else list(values)
+
+        nested = blend.struct_by_name.get(field_type)
+        if nested is None:
+            raise KeyError("Unknown type {0} of field {1}".format(field_type, name))
+        return StructView(blend, nested, offset)
+
+
+def field_name(name):
+    """Strip pointer, function pointer and array syntax from an SDNA field name."""
+    name = name.split("[", 1)[0]
+    return name.replace("*", "").replace("(", "").replace(")", "")
+
+
+def array_length(name):
+    """Return the number of items of an SDNA field, like 4 for mat[2][2]."""
+    if name.startswith("("):
+        return 1
+    length = 1
+    for part in name.split("[")[1:]:
+        length *= int(part.split("]", 1)[0])
+    return length
+
+
+def decode_string(raw):
+    raw = bytes(raw)
+    end = raw.find(b"\x00")
+    return (raw if end < 0 else raw[:end]).decode("utf-8", "replace")
+
+
+def decompress_zstd(raw):
+    try:
+        from compression import zstd
+        return zstd.decompress(raw)
+    except ImportError:
+        pass
+
+    try:
+        import io
+        import zstandard
+    except ImportError:
+        raise BlendFileError(
+            "Reading zstd compressed .blend files needs Python 3.14 or the zstandard package.")
+
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        io.BytesIO(raw), read_across_frames=True)
+    return reader.read()
+
+
+#
+# Preflight data
+#
+
+# Items of PreflightExportGroup.rule_object_types, in bit order
+RULE_OBJECT_TYPES = ['MESH', 'ARMATURE', 'EMPTY', 'CURVE', 'SURFACE', 'FONT', 'META']
+
+MANIFEST_NAME = ".preflight_manifest"
+MANIFEST_VERSION = 1
+
+
+def read_preflight(path):
+    """
+    Read what the planner needs from a .blend file without Blender:
+    the export groups of its active scene with their object names,
+    the base export location, and the type and rough size of every
+    object. Groups come from the export manifest the add-on saves
+    with the file when it has one, and from the scene's preflight
+    properties otherwise.
+    """
+    with BlendFile(path) as blend:
+        objects = read_objects(blend)
+        scene = active_scene(blend)
+        props = blend.id_properties(scene).get("preflight_props", {}) if scene else {}
+        manifest = read_manifest(blend)
+
+        if manifest is not None:
+            options = manifest["export_options"]
+            groups = [{
+                "name": group["name"],
+                "objects": group["objects"],
+                "export_location": group["export_location"],
+                "include_animations": bool(group["include_animations"]),
+                "apply_modifiers": bool(group["apply_modifiers"]),
+            } for group in manifest["groups"]]
+        else:
+            options = props.get("export_options", {})
+            groups = [read_group(group, objects) for group in props.get("fbx_export_groups", [])]
+
+        return {
+            "blendfile": path,
+            "version": blend.version,
+            "compressed": not isinstance(blend.data, mmap.mmap),
+            "from_manifest": manifest is not None,
+            "export_location": options.get("export_location", "//"),
+            "export_animation_clips": bool(options.get("export_animation_clips", False)),
+            "groups": groups,
+            "objects": objects,
+        }
+
+
+def active_scene(blend):
+    """
+    Return the scene Blender opens a file with: the one shown in its
+    first window, or the file's current scene when it was saved
+    without windows, like from a background process.
+    """
+    for window_manager in blend.datablocks(b"WM"):
+        for window in blend.iter_list(window_manager["windows"], "wmWindow"):
+            scene = blend.deref(window.get("scene"))
+            if scene is not None:
+                return scene
+
+    for block in blend.by_code.get(b"GLOB", []):
+        scene = blend.deref(blend.view(block).get("curscene"))
+        if scene is not None:
+            return scene
+
+    return next(blend.datablocks(b"SC"), None)
+
+
+def read_objects(blend):
+    """Return the type, modifier count and mesh size of every object, by name."""
+    meshes = {}
+    for block in blend.by_code.get(b"ME", []):
+        mesh = blend.view(block)
+        meshes[block.address] = (
+            mesh.get("verts_num", mesh.get("totvert", 0)),
+            mesh.get("faces_num", mesh.get("totpoly", 0)))
+
+    objects = {}
+    for block in blend.by_code.get(b"OB", []):
+        obj = blend.view(block)
+        vertices, polygons = meshes.get(obj["data"], (0, 0))
+        objects[obj["id"]["name"][2:]] = {
+            "type": OBJECT_TYPES.get(obj["type"], 'OTHER'),
+            "modifiers": sum(1 for _ in blend.iter_list(obj["modifiers"], "ModifierData")),
+            "vertices": vertices,
+            "polygons": polygons,
+        }
+    return objects
+
+
+def read_group(group, objects):
+    """
+    Convert an export group's ID properties to the manifest's layout.
+    Rule-based groups are matched by name and type only, since
+    collection membership and custom properties are not read, so
+    they may list more objects than an export would.
+    """
+    names = []
+    for item in group.get("obj_names", []):
+        pointer = item.get("obj_pointer")
+        name = pointer.name if isinstance(pointer, IDReference) else item.get("obj_name")
+        if name:
+            names.append(name)
+
+    if group.get("use_rules"):
+        names += sorted(rule_matches(group, objects) - set(names))
+
+    return {
+        "name": group.get("name", ""),
+        "objects": names,
+        "export_location": group.get("export_location", ""),
+        "include_animations": bool(group.get("include_animations", False)),
+        "apply_modifiers": bool(group.get("apply_modifiers", True)),
+    }
+
+
+def rule_matches(group, objects):
+    import fnmatch
+    import re
+
+    pattern = group.get("rule_name_pattern", "")
+    mask = group.get("rule_object_types", 0)
+    if not (pattern or mask or group.get("rule_collection") or group.get("rule_property")):
+        return set()
+
+    types = set(name for bit, name in enumerate(RULE_OBJECT_TYPES) if mask & (1 << bit))
+    if not pattern:
+        match_name = None
+    elif group.get("rule_name_match", 0) == 1:
+        match_name = re.compile(pattern).search
+    else:
+        match_name = re.compile(fnmatch.translate(pattern)).match
+
+    return set(name for name, obj in objects.items()
+               if (not types or obj["type"] in types)
+               and (match_name is None or match_name(name)))
+
+
+def read_manifest(blend):
+    """Return the export manifest saved in the file's Text datablock, if usable."""
+    import json
+
+    for text in blend.datablocks(b"TX"):
+        if text["id"]["name"][2:] != MANIFEST_NAME:
+            continue
+        lines = [decode_string(blend.block_bytes(line["line"]))
+                 for line in blend.iter_list(text["lines"], "TextLine")]
+        try:
+            manifest = json.loads("\n".join(lines))
+        except ValueError:
+            return None
+        return manifest if manifest.get("version") == MANIFEST_VERSION else None
+    return None
@@ -0,0 +1,112 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import preflight_planner
+from worker_pool import WorkerPool
+
+
+def main():
+    time_start = time.time()
+
+    parser = argparse.ArgumentParser(
+        description='Preflight every .blend file in a directory tree for use in Unity')
+    parser.add_argument('paths', nargs='+',
+                        help='Directories to search for .blend files, or glob patterns.')
+    parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'),
+                        help='Path to the Blender executable.')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='Number of Blender processes to export with.')
+    parser.add_argument('--use-cache', action='store_true',
+                        help='Skip export groups unchanged since their last export.')
+    parser.add_argument('--report',
+                        help='Write a JSON report of the batch to this path.')
+    parser.add_argument('--verbose', action='store_true',
+                        help="Print Blender's output from each worker.")
+    args = parser.parse_args()
+
+    blendfiles = find_blendfiles(args.paths)
+    if not blendfiles:
+        print("No .blend files found.")
+        return False
+
+    # Costliest work first, so a big file is not left running alone at the end
+    time_plan = time.time()
+    plans = [preflight_planner.plan_file(path) for path in blendfiles]
+    jobs = preflight_planner.plan_jobs(plans, args.jobs, use_cache=args.use_cache)
+    plan_seconds = time.time() - time_plan
+
+    print("Planned {0} Files as {1} Jobs in {2:.3f} sec.".format(
+        len(blendfiles), len(jobs), plan_seconds))
+    print("Preflighting {0} Files with {1} Workers.".format(
+        len(blendfiles), min(args.jobs, len(jobs))))
+
+    def on_result(result):
+        status = "FAILED" if result_failed(result) else "OK"
+        print("{0:<6} {1:>8.3f}s  {2}".format(
+            status, result["seconds"], result["blendfile"]))
+        if result.get("error"):
+            print("       {0}".format(result["error"]))
+
+    pool = WorkerPool(args.blender, min(args.jobs, len(jobs)), args.verbose)
+    try:
+        results = pool.map(jobs, on_result=on_result)
+    finally:
+        pool.stop()
+
+    # Report Performance
+    summary = summarize(results, time.time() - time_start)
+    summary["plan_seconds"] = plan_seconds
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(summary, report_file, indent=2)
+
+    print("\n------------------------------------------------------")
+    print("Files: {0} ({1} failed)  Groups: {2}".format(
+        summary["file_count"], summary["failed_files"], summary["group_count"]))
+    print("Throughput: {0:.2f} files/sec, {1:.2f} groups/sec".format(
+        summary["files_per_second"], summary["groups_per_second"]))
+    print("Preflight Batch Finished in: %.4f sec" % summary["seconds"])
+    return summary["failed_files"] == 0
+
+
+def find_blendfiles(paths):
+    """Expand directories and glob patterns to a list of .blend files."""
+    blendfiles = set()
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, "**", "*.blend"), recursive=True)
+        else:
+            matches = glob.glob(path, recursive=True)
+        blendfiles.update(os.path.abspath(match) for match in matches
+                          if match.endswith(".blend") and os.path.isfile(match))
+
+    return list(blendfiles)
+
+
+def result_failed(result):
+    return bool(result.get("error")) or any(
+        group["status"] == "failed" for group in result.get("groups", []))
+
+
+def summarize(results, seconds):
+    # A large file may have been split across several jobs
+    blendfiles = set(result["blendfile"] for result in results)
+    failed_files = set(result["blendfile"] for result in results if result_failed(result))
+    group_count = sum(len(result.get("groups", [])) for result in results)
+    return {
+        "seconds": seconds,
+        "file_count": len(blendfiles),
+        "failed_files": len(failed_files),
+        "group_count": group_count,
+        "files_per_second": len(blendfiles) / seconds if seconds else 0.0,
+        "groups_per_second": group_count / seconds if seconds else 0.0,
+        "files": sorted(results, key=lambda r: r["blendfile"]),
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,6 +1,11 @@
 import argparse
 import bpy
+import json
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import time
 
 import addon_utils
@@ -14,49 +19,434 @@ def main():
         description='Preflight a blendfile for use in Unity')
     parser.add_argument(
         '--fbx-output', help='Output path for the generated FBX.')
-    parser.add_argument('--export-animations',
-                        help='Output path for the generated FBX.')
+    parser.add_argument('--export-animations', action='store_true',
+                        help='Also export every action of each armature as an Armature@Action clip.')
+    parser.add_argument('--use-cache', action='store_true',
+                        help='Skip export groups unchanged since their last export.')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Number of background Blender processes to export groups with.')
+    parser.add_argument('--groups', nargs='+',
+                        help='Only export the export groups with these names.')
+    parser.add_argument('--clips', nargs='+',
+                        help='Only export the animation clips with these names, as Armature@Action.')
+    parser.add_argument('--report',
+                        help='Write a JSON report of the export run to this path.')
+    parser.add_argument('--partial', metavar='BLENDFILE',
+                        help='Append only the objects needed by the exported groups from this .blend file, instead of opening all of it. Needs a file saved with Save Export Manifest.')
+    parser.add_argument('--profile',
+                        help='Write a cProfile dump of each exported group to this directory.')
+    parser.add_argument('--memory-limit', type=int, metavar='MB',
+                        help='Export in low memory mode, and export groups that would go above this many MB in fresh Blender processes.')
+    parser.add_argument('--plan', nargs='?', const='', metavar='PATH',
+                        help='Print what would be exported, with estimated costs, without exporting. Also writes the plan as JSON to PATH, if given.')
 
     # Fetch Arguments
-    fbx_output = parser.parse_known_args()[0].fbx_output
-    export_animations = parser.parse_known_args()[0].export_animations
+    args = parser.parse_known_args(script_args())[0]
+    fbx_output = args.fbx_output
+    use_cache = args.use_cache
 
     # Make Sure Addons are Enabled
     if not check_addons(addons=["fbx_preflight", "io_scene_fbx"]):
         print("Preflight Export Failed.")
         return False
 
+    import fbx_preflight
+    from fbx_preflight import output
+    from fbx_preflight import report
+
+    # Workers and deferred exports started from here are part of this run
+    os.environ.setdefault(output.RUN_ENV, output.new_run_id())
+
+    partial_dir = None
+    if args.partial is not None:
+        partial_dir = load_partial(
+            args.partial, args.groups, args.clips, all_clips=args.export_animations)
+        if partial_dir is None:
+            print("No export manifest in {0}, opening the whole file.".format(args.partial))
+            bpy.ops.wm.open_mainfile(filepath=os.path.abspath(args.partial), load_ui=False)
+
+    startup_seconds = time.time() - time_start
+    export_options = bpy.context.scene.preflight_props.export_options
+
     # Set Output Settings based on CLI
-    if fbx_output is not None:
-        original_fbx_output = bpy.context.scene.preflight_props.export_location
-        bpy.context.scene.preflight_props.export_location = bpy.path.relpath(
-            fbx_output)
+    original_options = apply_overrides(
+        export_options, fbx_output=fbx_output, use_cache=use_cache,
+        options=option_overrides(args))
 
-    if export_animations is not None:
-        original_export_animations = bpy.context.scene.preflight_props.export_animations
-        bpy.context.scene.preflight_props.export_animations = bpy.path.relpath(
-            export_animations)
+    if args.plan is not None:
+        planned = write_plan(args.plan, args.groups, args.clips)
+        restore_overrides(export_options, original_options)
+        if partial_dir is not None:
+            shutil.rmtree(partial_dir, ignore_errors=True)
+        return planned
 
     # Do Export
-    bpy.ops.preflight.export_all_groups()
+    if args.jobs > 1:
+        export_report = export_parallel(args, report)
+    else:
+        export_report = export_serial(
+            args.groups, report, args.clips, profile_dir=profile_dir(args),
+            memory_handoff=True)
+
+    if export_report.count(report.DEFERRED):
+        export_report = export_deferred(args, report, export_report)
 
     # Restore Original Output Settings
-    if fbx_output is not None:
-        bpy.context.scene.preflight_props.export_location = original_fbx_output
+    restore_overrides(export_options, original_options)
 
-    if export_animations is not None:
-        bpy.context.scene.preflight_props.export_animations = bpy.path.relpath(
-            original_export_animations)
+    if partial_dir is not None:
+        export_report.blendfile = os.path.abspath(args.partial)
+        export_report.add_stats("partial_load", objects=len(bpy.data.objects))
+        shutil.rmtree(partial_dir, ignore_errors=True)
 
     # Report Performance
+    export_report.add_stats(
+        "startup", seconds=startup_seconds,
+        register_seconds=fbx_preflight.register_seconds)
+    export_report.seconds = time.time() - time_start
+    if args.report:
+        export_report.write(os.path.abspath(args.report))
+
+    print_report(export_report)
     print("\n------------------------------------------------------")
-    print("Preflight Export Finished i--n: %.4f sec" %
+    print("Preflight Export Finished in: %.4f sec" %
           (time.time() - time_start))
-    return True
+    return not export_report.failed
+
+
+def script_args():
+    """Return the arguments meant for this script, after Blender's own."""
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return sys.argv[1:]
+
+
+def apply_overrides(export_options, fbx_output=None, use_cache=False, options=None):
+    """
+    Override export options from the CLI, and return
+    the original values so they can be restored.
+    """
+    original_options = {}
+
+    for key, value in (options or {}).items():
+        if not hasattr(export_options, key):
+            continue
+        original_options[key] = getattr(export_options, key)
+        # Enum flags like object_types arrive as JSON lists
+        setattr(export_options, key, set(value) if isinstance(value, list) else value)
+
+    if fbx_output is not None:
+        original_options.setdefault(
+            "export_location", export_options.export_location)
+        export_options.export_location = bpy.path.relpath(
+            os.path.abspath(fbx_output))
+
+    if use_cache:
+        original_options.setdefault(
+            "use_export_cache", export_options.use_export_cache)
+        export_options.use_export_cache = True
+
+    return original_options
+
+
+def load_partial(blendfile, group_names=None, clip_names=None, all_clips=False):
+    """
+    Append only the objects and actions needed to export the given
+    groups and clips from a .blend file, using the export manifest
+    the add-on saves in it. The result is saved to a temporary
+    directory, which is returned, so exports run as usual. Return
+    None when the file has no manifest. With `all_clips`, every clip
+    is loaded as if the file exported animation clips.
+    """
+    from fbx_preflight import manifest
+
+    blendfile = os.path.abspath(blendfile)
+    clear_data()
+
+    with bpy.data.libraries.load(blendfile, link=False) as (data_from, data_to):
+        if manifest.MANIFEST_NAME in data_from.texts:
+            data_to.texts = [manifest.MANIFEST_NAME]
+
+    text = bpy.data.texts.get(manifest.MANIFEST_NAME)
+    plan = manifest.read_manifest(text) if text is not None else None
+    if plan is None:
+        return None
+
+    use_filter = bool(group_names or clip_names)
+    groups = [group for group in plan["groups"]
+              if not use_filter or group["name"] in (group_names or [])]
+    clips = [clip for clip in plan["clips"]
+             if clip["name"] in (clip_names or []) or
+             (not use_filter and (all_clips or plan["export_options"].get("export_animation_clips")))]
+
+    object_names = set(name for group in groups for name in group["objects"])
+    object_names.update(clip["armature"] for clip in clips)
+    action_names = set(clip["action"] for clip in clips)
+    # Groups with animation bake more than their objects' active actions
+    action_names.update(name for group in groups for name in group.get("actions", []))
+
+    with bpy.data.libraries.load(blendfile, link=False) as (data_from, data_to):
+        requested = sorted(object_names.intersection(data_from.objects))
+        data_to.objects = list(requested)
+        data_to.actions = sorted(action_names.intersection(data_from.actions))
+
+    # Appended objects come back in the order they were requested
+    scene = bpy.context.scene
+    objects = {}
+    for name, obj in zip(requested, data_to.objects):
+        if obj is not None:
+            scene.collection.objects.link(obj)
+            objects[name] = obj
+
+    manifest.restore_scene(scene, plan, objects, blendfile, groups=groups, clips=clips)
+
+    partial_dir = tempfile.mkdtemp(prefix="preflight-partial-")
+    bpy.ops.wm.save_as_mainfile(
+        filepath=os.path.join(partial_dir, os.path.basename(blendfile)),
+        check_existing=False)
+    return partial_dir
+
+
+def clear_data():
+    """Remove the data of the startup file, so appended names stay unchanged."""
+    for attr in ("objects", "meshes", "materials", "armatures", "actions", "curves",
+                 "cameras", "lights", "collections", "texts", "images"):
+        collection = getattr(bpy.data, attr, None)
+        for block in list(collection or []):
+            collection.remove(block)
+
+
+def restore_overrides(export_options, original_options):
+    for key, value in original_options.items():
+        setattr(export_options, key, value)
+
+
+def write_plan(plan_path, group_names=None, clip_names=None):
+    """Print, and optionally write, the export plan instead of exporting."""
+    from fbx_preflight import plan
+
+    plan_dir = tempfile.mkdtemp(prefix="preflight-")
+    path = os.path.abspath(plan_path) if plan_path else os.path.join(plan_dir, "plan.json")
+    try:
+        bpy.ops.preflight.plan_exports(
+            group_names=[{"name": name} for name in group_names or []],
+            clip_names=[{"name": name} for name in clip_names or []],
+            plan_path=path)
+        with open(path, "r") as plan_file:
+            print("\n".join(plan.table_lines(json.load(plan_file))))
+        return True
+    except (RuntimeError, OSError, ValueError) as e:
+        print(e)
+        return False
+    finally:
+        shutil.rmtree(plan_dir, ignore_errors=True)
+
+
+def option_overrides(args):
+    """Return the export options set by CLI flags."""
+    options = {}
+    if args.export_animations:
+        options["export_animation_clips"] = True
+    if args.memory_limit is not None:
+        options.update(low_memory=True, memory_limit=args.memory_limit)
+    return options
+
+
+def export_serial(group_names, report, clip_names=None, profile_dir="", memory_handoff=False):
+    """
+    Export groups and animation clips in this Blender process. With
+    `memory_handoff`, groups that would exceed the memory limit are
+    reported as deferred instead of exported.
+    """
+    report_dir = tempfile.mkdtemp(prefix="preflight-")
+    report_path = os.path.join(report_dir, "report.json")
+    error = ""
+
+    try:
+        try:
+            bpy.ops.preflight.export_all_groups(
+                group_names=[{"name": name} for name in group_names or []],
+                clip_names=[{"name": name} for name in clip_names or []],
+                report_path=report_path,
+                profile_dir=profile_dir or "",
+                memory_handoff=memory_handoff)
+        except RuntimeError as e:
+            # A failed group is reported as an error, after the run report
+            # is written. Without a report, nothing ran, like when poll failed.
+            error = str(e)
+            print(e)
+        return report.ExportReport.read(report_path)
+    except (OSError, ValueError) as e:
+        print(e)
+        failed = report.ExportReport(blendfile=bpy.data.filepath)
+        names = (group_names or []) + (clip_names or [])
+        for name in names or [os.path.basename(bpy.data.filepath)]:
+            failed.add_group(name, report.FAILED,
+                             error=error or "No export report was written.")
+        return failed
+    finally:
+        shutil.rmtree(report_dir, ignore_errors=True)
+
+
+def export_parallel(args, report):
+    """
+    Split the export groups and animation clips across background
+    Blender processes which each open this file and export their
+    share, then merge their reports into one.
+    """
+    from fbx_preflight import plan
+
+    # Balance the shares by each export's estimated cost
+    export_plan = plan.build_plan(bpy.context, args.groups or [], args.clips or [])
+    units = []
+    sizes = {}
+    for entry in export_plan["groups"]:
+        units.append((entry["kind"], entry["name"]))
+        sizes[units[-1]] = plan.UNIT_COST if entry["cached"] else entry["cost"]
+
+    shares = split_groups(units, sizes, args.jobs)
+
+    report_dir = tempfile.mkdtemp(prefix="preflight-")
+    workers = []
+
+    try:
+        for idx, share in enumerate(shares):
+            report_path = os.path.join(report_dir, "worker_{0}.json".format(idx))
+            command = worker_command(args, report_path, share)
+            print("Starting Worker {0} with {1} Exports.".format(idx + 1, len(share)))
+            workers.append((share, report_path, subprocess.Popen(command)))
+
+        reports = []
+        for share, report_path, process in workers:
+            returncode = process.wait()
+            try:
+                reports.append(report.ExportReport.read(report_path))
+            except (OSError, ValueError):
+                failed = report.ExportReport()
+                for _, name in share:
+                    failed.add_group(
+                        name, report.FAILED,
+                        error="Worker exited with code {0}.".format(returncode))
+                reports.append(failed)
+    finally:
+        shutil.rmtree(report_dir, ignore_errors=True)
+
+    return report.ExportReport.merge(
+        reports, blendfile=bpy.data.filepath, order=[name for _, name in units])
+
+
+def export_deferred(args, report, export_report):
+    """
+    Export the groups and clips a run deferred to stay under its
+    memory limit, each in a fresh Blender process, one at a time so
+    they do not add up. Return the run's report merged with theirs.
+    """
+    groups = bpy.context.scene.preflight_props.fbx_export_groups
+    order = [group["name"] for group in export_report.groups]
+    deferred = [group for group in export_report.groups
+                if group["status"] == report.DEFERRED]
+    export_report.groups = [group for group in export_report.groups
+                            if group["status"] != report.DEFERRED]
+
+    report_dir = tempfile.mkdtemp(prefix="preflight-")
+    reports = [export_report]
+    try:
+        for idx, group in enumerate(deferred):
+            kind = "group" if groups.get(group["name"]) is not None else "clip"
+            report_path = os.path.join(report_dir, "deferred_{0}.json".format(idx))
+            print("Exporting {0} in a Fresh Process.".format(group["name"]))
+            returncode = subprocess.call(
+                worker_command(args, report_path, [(kind, group["name"])]))
+            try:
+                reports.append(report.ExportReport.read(report_path))
+            except (OSError, ValueError):
+                failed = report.ExportReport()
+                failed.add_group(
+                    group["name"], report.FAILED, filepath=group["filepath"],
+                    error="Worker exited with code {0}.".format(returncode))
+                reports.append(failed)
+    finally:
+        shutil.rmtree(report_dir, ignore_errors=True)
+
+    return report.ExportReport.merge(
+        reports, blendfile=export_report.blendfile, order=order)
+
+
+def worker_command(args, report_path, units):
+    """
+    Return the command exporting (kind, name) units in a background
+    Blender process that opens this file, with the same overrides.
+    """
+    command = [
+        bpy.app.binary_path, "--background", bpy.data.filepath,
+        "--python", os.path.abspath(__file__), "--",
+        "--report", report_path]
+    for kind, option in (("group", "--groups"), ("clip", "--clips")):
+        names = [name for unit_kind, name in units if unit_kind == kind]
+        if names:
+            command += [option] + names
+    return command + forwarded_args(args)
+
+
+def split_groups(names, sizes, jobs):
+    """
+    Split group names into at most `jobs` shares, balanced
+    by their sizes, like the estimated cost of each group.
+    """
+    shares = [[] for _ in range(max(1, min(jobs, len(names))))]
+    loads = [0] * len(shares)
+
+    for name in sorted(names, key=lambda n: sizes.get(n, 0), reverse=True):
+        idx = loads.index(min(loads))
+        shares[idx].append(name)
+        loads[idx] += sizes.get(name, 0) or 1
+
+    return [share for share in shares if share]
+
+
+def forwarded_args(args):
+    """Return the CLI overrides that workers should also apply."""
+    forwarded = []
+    if args.fbx_output is not None:
+        forwarded += ["--fbx-output", os.path.abspath(args.fbx_output)]
+    if args.export_animations:
+        forwarded += ["--export-animations"]
+    if args.use_cache:
+        forwarded += ["--use-cache"]
+    if args.profile:
+        forwarded += ["--profile", profile_dir(args)]
+    if args.memory_limit is not None:
+        forwarded += ["--memory-limit", str(args.memory_limit)]
+    return forwarded
+
+
+def profile_dir(args):
+    return os.path.abspath(args.profile) if args.profile else ""
+
+
+def print_report(export_report):
+    print("\n------------------------------------------------------")
+    for group in export_report.groups:
+        print("{0:<9} {1:>8.3f}s  {2}".format(
+            group["status"], group["seconds"], group["name"]))
+        if group.get("error"):
+            print("          {0}".format(group["error"]))
+        if group.get("stages"):
+            print("          " + "  ".join("{0} {1:.3f}s".format(name, seconds)
+                                            for name, seconds in group["stages"].items()))
+        if group.get("counts"):
+            print("          " + "  ".join("{0} {1}".format(name, value)
+                                            for name, value in group["counts"].items()))
+
+    summary = export_report.as_dict()
+    print("Exported: {0}  Cached: {1}  Failed: {2}".format(
+        summary["exported"], summary["cached"], summary["failed"]))
 
 
 def check_addons(addons=[]):
-    enabled_addons = bpy.context.user_preferences.addons.keys()
+    preferences = getattr(bpy.context, "preferences", None) or \
+        bpy.context.user_preferences
+    enabled_addons = preferences.addons.keys()
     for addon in addons:
         if addon not in enabled_addons:
             print("Enabling Addon: {0}".format(addon))
@@ -70,4 +460,4 @@ def check_addons(addons=[]):
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+
+from worker_pool import WorkerPool
+
+
+def default_socket():
+    """
+    Return the socket path in the user's runtime directory or, without
+    one, in a directory of the temp directory only they can enter.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if not runtime_dir:
+        runtime_dir = os.path.join(tempfile.gettempdir(), "preflight-{0}".format(os.getuid()))
+    return os.path.join(runtime_dir, "preflight.sock")
+
+
+DEFAULT_SOCKET = default_socket()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Keep Blender processes warm and export .blend files on request')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                        help='Path of the Unix socket to listen on, or submit to.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser(
+        'serve', help='Run the daemon.')
+    serve_parser.add_argument('--blender', default=os.environ.get('BLENDER', 'blender'),
+                              help='Path to the Blender executable.')
+    serve_parser.add_argument('--jobs', type=int, default=2,
+                              help='Number of warm Blender processes.')
+    serve_parser.add_argument('--verbose', action='store_true',
+                              help="Print Blender's output from each worker.")
+
+    submit_parser = subparsers.add_parser(
+        'submit', help='Send an export job to a running daemon.')
+    submit_parser.add_argument('blendfile', help='The .blend file to export.')
+    submit_parser.add_argument('--groups', nargs='+',
+                               help='Only export the export groups with these names.')
+    submit_parser.add_argument('--clips', nargs='+',
+                               help='Only export the animation clips with these names, as Armature@Action.')
+    submit_parser.add_argument('--fbx-output', help='Output path for the generated FBX.')
+    submit_parser.add_argument('--use-cache', action='store_true',
+                               help='Skip export groups unchanged since their last export.')
+    submit_parser.add_argument('--profile',
+                               help='Write a cProfile dump of each exported group to this directory.')
+    submit_parser.add_argument('--option', action='append', default=[], metavar='KEY=VALUE',
+                               help='Override an export option, with a JSON value.')
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        return serve(args)
+    if args.command == 'submit':
+        return submit(args)
+
+    parser.print_help()
+    return False
+
+
+#
+# Daemon
+#
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    """
+    Read one JSON job per line and stream back a JSON event for
+    every group as it is exported, followed by the job's result.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line.decode("utf-8"))
+            except ValueError:
+                self.send({"event": "result", "error": "Invalid job."})
+                continue
+
+            # If the client hangs up, the worker still reads the job's
+            # events up to its result and only then takes the next job
+            result = self.server.pool.run(job, on_event=self.send)
+            try:
+                self.send(result)
+            except OSError:
+                return
+
+    def send(self, event):
+        self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class PreflightDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, pool):
+        self.pool = pool
+        super().__init__(socket_path, JobHandler)
+
+
+def serve(args):
+    error = check_socket_path(args.socket)
+    if error:
+        print(error)
+        return False
+
+    if os.path.exists(args.socket):
+        if socket_is_live(args.socket):
+            print("A daemon is already listening on {0}".format(args.socket))
+            return False
+        os.remove(args.socket)
+
+    pool = WorkerPool(args.blender, args.jobs, args.verbose)
+    print("Starting {0} Blender Workers...".format(len(pool.workers)))
+    pool.warm()
+
+    # Anyone who can connect exports files as this user, so the socket is theirs alone (0600)
+    umask = os.umask(0o177)
+    try:
+        server = PreflightDaemon(args.socket, pool)
+    except OSError:
+        pool.stop()
+        raise
+    finally:
+        os.umask(umask)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print("Listening on {0}".format(args.socket))
+
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        pool.stop()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+    return True
+
+
+def check_socket_path(socket_path):
+    """
+    Make sure only this user can take over the socket path, creating
+    its directory for them when it is missing. Return why the daemon
+    cannot listen there, or an empty string.
+    """
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(socket_dir):
+        try:
+            os.makedirs(socket_dir, mode=0o700)
+        except OSError as e:
+            return "Could not create {0}: {1}".format(socket_dir, e)
+
+    # The fallback directory is in a shared temp directory, where anyone could have made it first
+    if socket_dir == os.path.dirname(DEFAULT_SOCKET) and not os.environ.get("XDG_RUNTIME_DIR"):
+        dir_stat = os.lstat(socket_dir)
+        if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid():
+            return "{0} is not a directory owned by this user.".format(socket_dir)
+        if dir_stat.st_mode & 0o077:
+            return "{0} can be entered by other users.".format(socket_dir)
+
+    try:
+        socket_stat = os.lstat(socket_path)
+    except FileNotFoundError:
+        return ""
+    if socket_stat.st_uid != os.getuid():
+        return "{0} is owned by another user.".format(socket_path)
+    if not stat.S_ISSOCK(socket_stat.st_mode):
+        return "{0} exists and is not a socket.".format(socket_path)
+    return ""
+
+
+def socket_is_live(socket_path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        client.close()
+
+
+#
+# Client
+#
+
+
+def submit(args):
+    job = {
+        "blendfile": os.path.abspath(args.blendfile),
+        "groups": args.groups,
+        "clips": args.clips,
+        "use_cache": args.use_cache,
+        "options": parse_options(args.option),
+    }
+    if args.fbx_output is not None:
+        job["fbx_output"] = os.path.abspath(args.fbx_output)
+    if args.profile is not None:
+        job["profile_dir"] = os.path.abspath(args.profile)
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(args.socket)
+    except OSError as e:
+        print("Could not connect to {0}: {1}".format(args.socket, e))
+        return False
+
+    with client, client.makefile("rwb") as stream:
+        stream.write((json.dumps(job) + "\n").encode("utf-8"))
+        stream.flush()
+
+        for line in stream:
+            event = json.loads(line.decode("utf-8"))
+            if event.get("event") == "group":
+                print("{0:<9} {1:>8.3f}s  {2}".format(
+                    event["status"], event["seconds"], event["name"]))
+                if event.get("error"):
+                    print("          {0}".format(event["error"]))
+            elif event.get("event") == "result":
+                if event.get("error"):
+                    print(event["error"])
+                print("Preflight Export Finished in: %.4f sec" % event.get("seconds", 0.0))
+                return not event.get("error") and not event.get("failed")
+
+    return False
+
+
+def parse_options(pairs):
+    options = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try:
+            options[key] = json.loads(value)
+        except ValueError:
+            options[key] = value
+    return options
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,111 @@
+import math
+import os
+import struct
+
+import blend_reader
+
+# Rough costs in seconds. Only their ratios matter for balancing,
+# so they can be tuned against benchmarks/ without being exact.
+FILE_COST = 0.5
+FILE_COST_PER_MB = 0.05
+GROUP_COST = 0.05
+OBJECT_COST = 0.005
+VERTEX_COST = 0.000002
+MODIFIER_COST = 0.5
+
+
+def object_cost(obj):
+    """Estimate the cost of evaluating and writing one object."""
+    if obj is None:
+        return OBJECT_COST
+    vertices = obj["vertices"]
+    # Modifiers like subdivision multiply the geometry they evaluate
+    return OBJECT_COST + VERTEX_COST * vertices * (1 + MODIFIER_COST * obj["modifiers"])
+
+
+def plan_file(path):
+    """
+    Read a .blend file's export groups and estimate what exporting
+    each of them costs, without starting Blender. Files that cannot
+    be read are planned as one job costed by their size.
+    """
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    plan = {
+        "blendfile": path,
+        "file_cost": FILE_COST + FILE_COST_PER_MB * size_mb,
+        "groups": [],
+        "splittable": False,
+        "error": None,
+    }
+
+    try:
+        blend = blend_reader.read_preflight(path)
+    except (OSError, ValueError, KeyError, struct.error, blend_reader.BlendFileError) as e:
+        plan["error"] = str(e)
+        plan["cost"] = plan["file_cost"]
+        return plan
+
+    objects = blend["objects"]
+    for group in blend["groups"]:
+        group_objects = [objects.get(name) for name in group["objects"]]
+        plan["groups"].append({
+            "name": group["name"],
+            "objects": len(group_objects),
+            "vertices": sum(obj["vertices"] for obj in group_objects if obj),
+            "cost": GROUP_COST + sum(object_cost(obj) for obj in group_objects),
+        })
+
+    # Jobs naming their groups skip animation clips, so those files stay whole
+    plan["splittable"] = not blend["export_animation_clips"] and len(plan["groups"]) > 1
+    plan["cost"] = plan["file_cost"] + sum(group["cost"] for group in plan["groups"])
+    return plan
+
+
+def plan_jobs(plans, workers, use_cache=False):
+    """
+    Turn file plans into worker jobs, largest first. A file costing
+    more than a worker's fair share of the batch is split into jobs
+    for groups of its export groups, so one big file does not leave
+    every other worker idle while it finishes. Each split job opens
+    the file again, so files are only split when that pays off.
+    """
+    total = sum(plan["cost"] for plan in plans)
+    fair_share = total / max(1, workers)
+
+    jobs = []
+    for plan in plans:
+        shares = 1
+        if plan["splittable"] and plan["cost"] > fair_share:
+            work = plan["cost"] - plan["file_cost"]
+            shares = min(len(plan["groups"]), workers, math.ceil(plan["cost"] / fair_share))
+            # Every share should do more work than opening the file costs
+            shares = max(1, min(shares, int(work / plan["file_cost"])))
+
+        if shares <= 1:
+            jobs.append({"blendfile": plan["blendfile"], "use_cache": use_cache,
+                         "cost": plan["cost"]})
+            continue
+
+        for share in split_groups(plan["groups"], shares):
+            jobs.append({
+                "blendfile": plan["blendfile"],
+                "use_cache": use_cache,
+                "groups": [group["name"] for group in share],
+                "cost": plan["file_cost"] + sum(group["cost"] for group in share),
+            })
+
+    jobs.sort(key=lambda job: job["cost"], reverse=True)
+    return jobs
+
+
+def split_groups(groups, count):
+    """Split groups into `count` shares of about equal cost."""
+    shares = [[] for _ in range(count)]
+    loads = [0.0] * count
+
+    for group in sorted(groups, key=lambda g: g["cost"], reverse=True):
+        idx = loads.index(min(loads))
+        shares[idx].append(group)
+        loads[idx] += group["cost"]
+
+    return [share for share in shares if share]
@@ -0,0 +1,153 @@
+import bpy
+import json
+import os
+import sys
+import time
+import traceback
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import preflight_blendfile  # noqa: E402
+import worker_pool  # noqa: E402
+
+
+def main():
+    """
+    Export .blend files as they are requested on stdin, one JSON
+    job per line, until stdin is closed. Blender, the add-on and
+    the FBX exporter are only loaded once for all jobs.
+    """
+    if not preflight_blendfile.check_addons(addons=["fbx_preflight", "io_scene_fbx"]):
+        emit({"event": "error", "error": "Could not enable add-ons."})
+        return False
+
+    from fbx_preflight import report
+
+    emit({"event": "ready", "pid": os.getpid()})
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError:
+            emit(worker_pool.failed_result({}, "Invalid job: {0}".format(line)))
+            continue
+
+        emit(run_job(job, report))
+
+    return True
+
+
+# The file currently open, and its modification time when it was opened
+loaded_file = (None, None)
+
+
+def run_job(job, report):
+    """
+    Export the groups and clips of a job's .blend file in one run,
+    printing a group event as each one finishes. The file is only
+    reopened when it changed on disk since the last job, and option
+    overrides are undone after every job, so warm workers can serve
+    repeated jobs for the same file without reloading it.
+    """
+    global loaded_file
+    from fbx_preflight import output
+
+    time_start = time.time()
+    blendfile = os.path.abspath(job.get("blendfile", ""))
+
+    try:
+        mtime = os.path.getmtime(blendfile)
+        if loaded_file != (blendfile, mtime):
+            loaded_file = (None, None)
+            bpy.ops.wm.open_mainfile(filepath=blendfile, load_ui=False)
+            loaded_file = (blendfile, mtime)
+
+        export_options = bpy.context.scene.preflight_props.export_options
+        original_options = preflight_blendfile.apply_overrides(
+            export_options,
+            fbx_output=job.get("fbx_output"),
+            use_cache=job.get("use_cache", False),
+            options=job.get("options"))
+
+        # Every group of a job is part of one run of the output manifest
+        os.environ[output.RUN_ENV] = job.get("run") or output.new_run_id()
+        try:
+            reports = export_job(job, report, blendfile)
+        finally:
+            preflight_blendfile.restore_overrides(export_options, original_options)
+    except Exception as e:
+        traceback.print_exc()
+        loaded_file = (None, None)
+        return worker_pool.failed_result(job, str(e))
+
+    result = report.ExportReport.merge(reports, blendfile=blendfile).as_dict()
+    result["event"] = "result"
+    result["seconds"] = time.time() - time_start
+    return result
+
+
+def export_job(job, report, blendfile):
+    """
+    Export the groups and clips of a job, and return the reports of
+    the runs it took. They are exported in one run, so caches, the
+    scene index and the output manifest are built and saved once per
+    job. A run stops at its first failed group, so the groups and
+    clips it did not get to are exported by another run.
+    """
+    group_names, clip_names = job_names(job)
+    reported = set()
+
+    def on_group(entry):
+        reported.add(entry["name"])
+        emit(dict(entry, event="group", blendfile=blendfile))
+
+    reports = []
+    with report.listen(on_group):
+        while True:
+            groups = [name for name in group_names if name not in reported]
+            clips = [name for name in clip_names if name not in reported]
+            if not groups and not clips:
+                return reports
+
+            done = len(reported)
+            reports.append(preflight_blendfile.export_serial(
+                groups, report, clips, profile_dir=job.get("profile_dir", "")))
+            if len(reported) == done:
+                break
+
+        # A run that reported none of its groups would do the same again
+        failed = report.ExportReport(blendfile=blendfile)
+        for name in groups + clips:
+            failed.add_group(name, report.FAILED, error="Group could not be exported.")
+        reports.append(failed)
+    return reports
+
+
+def job_names(job):
+    """
+    Return the groups and animation clips of a job, as
+    (group_names, clip_names) for export_serial. Jobs without a
+    "groups" or "clips" list export every group, and every clip when
+    the file has animation clips enabled.
+    """
+    from fbx_preflight import operators
+
+    group_names = job.get("groups")
+    clip_names = job.get("clips")
+    if not group_names and not clip_names:
+        group_names = [group.name for group in
+                       bpy.context.scene.preflight_props.fbx_export_groups]
+        if bpy.context.scene.preflight_props.export_options.export_animation_clips:
+            clip_names = list(operators.clips_by_name(bpy.context))
+
+    return list(group_names or []), list(clip_names or [])
+
+
+def emit(event):
+    print(worker_pool.encode_event(event), flush=True)
+
+
+if __name__ == "__main__":
+    main()
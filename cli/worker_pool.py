@@ -0,0 +1,239 @@
+"""
+A pool of long-lived background Blender processes running
+preflight_worker.py, which export one .blend file per job.
+
+Jobs and results are exchanged as JSON, one per line: jobs are written
+to a worker's stdin, and events are printed to its stdout behind
+EVENT_PREFIX so they can be told apart from Blender's own output.
+
+This module only uses the standard library, so it can be imported by
+scripts run from a plain Python interpreter as well as inside Blender.
+"""
+
+import contextlib
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+EVENT_PREFIX = "PREFLIGHT_EVENT "
+WORKER_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "preflight_worker.py")
+
+
+class WorkerError(Exception):
+    pass
+
+
+def encode_event(event):
+    return EVENT_PREFIX + json.dumps(event)
+
+
+def decode_event(line):
+    """Return the event printed on a line of worker output, or None."""
+    if not line.startswith(EVENT_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(EVENT_PREFIX):])
+    except ValueError:
+        return None
+
+
+def failed_result(job, error):
+    return {
+        "event": "result",
+        "blendfile": job.get("blendfile", ""),
+        "seconds": 0.0,
+        "groups": [],
+        "error": error,
+    }
+
+
+class BlenderWorker:
+    """A background Blender process that exports one job at a time."""
+
+    def __init__(self, blender="blender", verbose=False):
+        self.blender = blender
+        self.verbose = verbose
+        self.process = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        command = [self.blender, "--background",
+                   "--python", WORKER_SCRIPT]
+        try:
+            self.process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                universal_newlines=True, bufsize=1)
+        except OSError as e:
+            raise WorkerError(str(e))
+
+        for event in self.events():
+            if event.get("event") == "ready":
+                return
+            if event.get("event") == "error":
+                self.stop()
+                raise WorkerError(event.get("error", "Worker failed to start."))
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def kill(self):
+        """Stop the worker at once, dropping whatever it was doing."""
+        if self.process is None:
+            return
+        self.process.kill()
+        self.process.wait()
+        self.process = None
+
+    def events(self):
+        """Yield events printed by the worker until it exits."""
+        for line in self.process.stdout:
+            event = decode_event(line)
+            if event is not None:
+                yield event
+            elif self.verbose:
+                sys.stderr.write(line)
+
+        raise WorkerError("Worker exited with code {0}.".format(
+            self.process.wait()))
+
+    def run(self, job, on_event=None):
+        """
+        Send a job to the worker and return its result event.
+        Other events are passed to `on_event` as they arrive. If
+        `on_event` fails to deliver one, like when a client hung up,
+        the rest are dropped, but the worker's output is still read up
+        to the result, so its next job does not pick up this one's.
+        """
+        if not self.alive:
+            self.start()
+
+        try:
+            self.process.stdin.write(json.dumps(job) + "\n")
+            self.process.stdin.flush()
+        except OSError as e:
+            raise WorkerError(str(e))
+
+        for event in self.events():
+            if event.get("event") == "result":
+                return event
+            if on_event is not None:
+                try:
+                    on_event(event)
+                except OSError:
+                    on_event = None
+
+
+class WorkerPool:
+    """
+    A bounded pool of BlenderWorkers. Each worker is started on
+    first use and reused for every job it picks up afterwards.
+    """
+
+    def __init__(self, blender="blender", size=1, verbose=False):
+        self.workers = [BlenderWorker(blender, verbose)
+                        for _ in range(max(1, size))]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def warm(self):
+        """Start every worker now, rather than on its first job."""
+        errors = []
+
+        def start(worker):
+            try:
+                worker.start()
+            except WorkerError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=start, args=(worker,))
+                   for worker in self.workers if not worker.alive]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if errors:
+            raise errors[0]
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """Wait for an idle worker, and hold it until the block exits."""
+        worker = self.idle.get()
+        try:
+            yield worker
+        finally:
+            self.idle.put(worker)
+
+    def run(self, job, on_event=None):
+        """
+        Run a job on the next idle worker. A worker that fails is
+        restarted straight away so the pool stays warm. A worker left
+        partway through a job is killed, as its output would be out of
+        step with the jobs sent to it next.
+        """
+        with self.checkout() as worker:
+            try:
+                return worker.run(job, on_event)
+            except WorkerError as e:
+                worker.stop()
+                try:
+                    worker.start()
+                except WorkerError:
+                    pass
+                return failed_result(job, str(e))
+            except BaseException:
+                worker.kill()
+                raise
+
+    def map(self, jobs, on_result=None):
+        """
+        Run jobs across the pool in the order given, and return
+        their results in the order they finished.
+        """
+        pending = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+
+        results = []
+        lock = threading.Lock()
+
+        def work():
+            while True:
+                try:
+                    job = pending.get_nowait()
+                except queue.Empty:
+                    return
+
+                result = self.run(job)
+                with lock:
+                    results.append(result)
+                    if on_result is not None:
+                        on_result(result)
+
+        threads = [threading.Thread(target=work) for _ in self.workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
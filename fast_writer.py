@@ -0,0 +1,524 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import hashlib
+import math
+
+from mathutils import Matrix, Vector
+
+from . import fbx_binary
+from . import mesh_data
+from . import report
+from . fbx_binary import FBXElem, elem_data, elem_prop, elem_props, fbx_name_class
+from . mesh_data import np
+
+CREATOR = "FBX Preflight"
+FILE_ID = b"\x28\xb3\x2a\xeb\xb6\x24\xcc\xc2\xbf\xc8\xb0\x2a\xa9\x2b\xfc\xf1"
+CREATION_TIME = "1970-01-01 10:00:00:000"
+
+OBJECT_TYPE_OPTIONS = {
+    'MESH': 'MESH',
+    'EMPTY': 'EMPTY',
+    'CURVE': 'OTHER',
+    'SURFACE': 'OTHER',
+    'FONT': 'OTHER',
+    'META': 'OTHER',
+}
+
+
+def can_export(objects, options):
+    """
+    Return true if the fast writer can export these objects with
+    these options. It writes static geometry and empties; armatures,
+    skinned meshes and baked animation are left to Blender's exporter,
+    which also owns the leaf bone and deform-only bone options. So are
+    meshes with shape keys or vertex colors, and custom properties
+    other than numbers and strings, which the fast writer would drop.
+    """
+    if np is None:
+        return False
+
+    object_types = options.get("object_types", set())
+    use_custom_props = options.get("use_custom_props", False)
+    for obj in objects:
+        if obj is None:
+            continue
+        if obj.type == 'ARMATURE' and 'ARMATURE' in object_types:
+            return False
+        if obj.type not in OBJECT_TYPE_OPTIONS and obj.type != 'ARMATURE':
+            return False
+        if any(modifier.type == 'ARMATURE' for modifier in obj.modifiers):
+            return False
+        if options.get("bake_anim") and obj.animation_data is not None:
+            return False
+        if obj.type == 'MESH' and has_mesh_extras(obj.data):
+            return False
+        if use_custom_props and not writes_custom_props(obj):
+            return False
+
+    return True
+
+
+def has_mesh_extras(mesh):
+    """Return true if a mesh has data the fast writer does not write."""
+    if mesh.shape_keys is not None:
+        return True
+    # Blender 3.2+ keeps vertex colors as color attributes
+    color_layers = getattr(mesh, "color_attributes", None)
+    if color_layers is None:
+        color_layers = mesh.vertex_colors
+    return len(color_layers) > 0
+
+
+def writes_custom_props(obj):
+    """
+    Return true if add_custom_props() writes every custom property
+    Blender's exporter would, for the object and its materials.
+    """
+    datablocks = [obj] + [slot.material for slot in obj.material_slots if slot.material]
+    for datablock in datablocks:
+        for key in datablock.keys():
+            if key.startswith("_"):
+                continue
+            if datablock is not obj:
+                return False
+            value = datablock[key]
+            if isinstance(value, bool) or not isinstance(value, (float, int, str)):
+                return False
+    return True
+
+
+def export(objects, filepath, depsgraph, **options):
+    """
+    Write objects to a binary FBX file, reading their geometry
+    with vectorized foreach_get calls into numpy arrays.
+
+    Honors object_types, use_mesh_modifiers, bake_space_transform,
+    axis_forward/axis_up and the scale options the same way Blender's
+    exporter does.
+    """
+    data, stats = encode(objects, depsgraph, **options)
+    with report.stage("flush"):
+        with open(filepath, "wb") as fbx_file:
+            fbx_file.write(data)
+
+    return stats
+
+
+def encode(objects, depsgraph, **options):
+    """Return the bytes of the FBX file for objects, and its stats."""
+    scene = depsgraph.scene
+    objects = [obj for obj in objects if obj is not None
+               and OBJECT_TYPE_OPTIONS.get(obj.type) in options.get("object_types", set())]
+
+    document = FBXDocument(
+        scene,
+        axis_forward=options.get("axis_forward", "-Z"),
+        axis_up=options.get("axis_up", "Y"),
+        bake_space_transform=options.get("bake_space_transform", False),
+        use_custom_props=options.get("use_custom_props", False),
+        global_scale=options.get("global_scale", 1.0),
+        apply_unit_scale=options.get("apply_unit_scale", True),
+        apply_scale_options=options.get("apply_scale_options", 'FBX_SCALE_NONE'))
+
+    exported = set(obj.name for obj in objects)
+    for obj in objects:
+        buffers = None
+        if obj.type != 'EMPTY':
+            with report.stage("evaluation"):
+                buffers = mesh_data.extract_object(
+                    obj, depsgraph, apply_modifiers=options.get("use_mesh_modifiers", True),
+                    triangles=options.get("optimize_meshes", False))
+            if buffers is not None and options.get("optimize_meshes"):
+                with report.stage("optimize"):
+                    buffers = optimize_buffers(buffers)
+        with report.stage("write"):
+            document.add_object(obj, buffers, parent_exported=(
+                obj.parent is not None and obj.parent.name in exported))
+
+    with report.stage("write"):
+        data = document.encode()
+
+    return data, document.stats
+
+
+def optimize_buffers(buffers):
+    """Optimize mesh buffers, counting vertices and indices before and after."""
+    optimized = mesh_data.optimize(buffers)
+    report.add_counts(
+        vertices_before=buffers.vertex_count, vertices_after=optimized.vertex_count,
+        indices_before=len(buffers.loop_vertices), indices_after=len(optimized.loop_vertices))
+    return optimized
+
+
+def add_custom_props(props, obj):
+    """Write the number and string custom properties of an object as FBX user properties."""
+    for key in sorted(obj.keys()):
+        if key.startswith("_"):
+            continue
+        value = obj[key]
+        name = key.encode("utf-8")
+        if isinstance(value, float):
+            elem_prop(props, name, b"double", b"Number", b"U", value)
+        elif isinstance(value, int):
+            elem_prop(props, name, b"int", b"Integer", b"U", int(value))
+        elif isinstance(value, str):
+            elem_prop(props, name, b"KString", b"", b"U", value.encode("utf-8"))
+
+
+def object_materials(obj):
+    """
+    Return the materials written for an object, each once in slot
+    order, and an array mapping its slots to their index in that
+    list, or None when it has no materials. Empty slots map to the
+    first material, like Blender's exporter does.
+    """
+    materials = []
+    for slot in obj.material_slots:
+        if slot.material is not None and slot.material not in materials:
+            materials.append(slot.material)
+    if not materials:
+        return materials, None
+
+    slot_indices = np.array([materials.index(slot.material) if slot.material is not None else 0
+                             for slot in obj.material_slots], dtype=np.int32)
+    return materials, slot_indices
+
+
+def fbx_uuid(*keys):
+    """Return a stable 63 bit id for an FBX object."""
+    digest = hashlib.sha1("\x00".join(keys).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") & ((1 << 62) - 1)
+
+
+def axis_vector(axis):
+    vector = Vector((0.0, 0.0, 0.0))
+    vector["XYZ".index(axis[-1])] = -1.0 if axis.startswith("-") else 1.0
+    return vector
+
+
+def fbx_axes(axis_forward, axis_up):
+    """
+    Return (axis, sign) pairs for the UpAxis, FrontAxis and CoordAxis
+    global settings, for a right handed system with the given axes.
+    """
+    up = axis_vector(axis_up)
+    front = -axis_vector(axis_forward)
+    coord = up.cross(front)
+
+    def axis_sign(vector):
+        idx = max(range(3), key=lambda i: abs(vector[i]))
+        return idx, 1 if vector[idx] > 0 else -1
+
+    return axis_sign(up), axis_sign(front), axis_sign(coord)
+
+
+def units_to_fbx(scene):
+    """Blender units to FBX centimeters, as Blender's exporter does."""
+    if scene.unit_settings.system == 'NONE':
+        return 1.0
+    return 100.0 * scene.unit_settings.scale_length
+
+
+def scale_settings(scene, global_scale=1.0, apply_unit_scale=True,
+                   apply_scale_options='FBX_SCALE_NONE'):
+    """
+    Return the scale applied to the geometry and the unit scale
+    written to the file, split between the two the same way
+    Blender's exporter does for its scale options.
+    """
+    unit_scale = units_to_fbx(scene) if apply_unit_scale else 100.0
+    if apply_scale_options == 'FBX_SCALE_NONE':
+        return unit_scale * global_scale, 1.0
+    if apply_scale_options == 'FBX_SCALE_UNITS':
+        return global_scale, unit_scale
+    if apply_scale_options == 'FBX_SCALE_CUSTOM':
+        return unit_scale, global_scale
+    return 1.0, unit_scale * global_scale
+
+
+class FBXDocument:
+    """Objects, connections and global settings of one exported FBX file."""
+
+    def __init__(self, scene, axis_forward="-Z", axis_up="Y", bake_space_transform=False,
+                 use_custom_props=False, global_scale=1.0, apply_unit_scale=True,
+                 apply_scale_options='FBX_SCALE_NONE'):
+        from bpy_extras.io_utils import axis_conversion
+
+        self.axes = fbx_axes(axis_forward, axis_up)
+        matrix_scale, self.unit_scale = scale_settings(
+            scene, global_scale, apply_unit_scale, apply_scale_options)
+        self.global_scale = global_scale
+        self.global_matrix = Matrix.Scale(matrix_scale, 4) @ axis_conversion(
+            to_forward=axis_forward, to_up=axis_up).to_4x4()
+        self.global_matrix_inv = self.global_matrix.inverted_safe()
+        self.bake_space_transform = bake_space_transform
+        self.use_custom_props = use_custom_props
+
+        self.objects = FBXElem(b"Objects")
+        self.connections = FBXElem(b"Connections")
+        self.counts = {}
+        self.materials = {}
+        self.stats = {"objects": 0, "vertices": 0, "polygons": 0}
+
+    def connect(self, child_id, parent_id):
+        elem = self.connections.add(b"C")
+        elem.add_string(b"OO")
+        elem.add_int64(child_id)
+        elem.add_int64(parent_id)
+
+    def count(self, object_type):
+        self.counts[object_type] = self.counts.get(object_type, 0) + 1
+
+    def local_matrix(self, obj, parent_exported):
+        if parent_exported:
+            matrix = obj.parent.matrix_world.inverted_safe() @ obj.matrix_world
+        else:
+            matrix = obj.matrix_world.copy()
+
+        if self.bake_space_transform:
+            return self.global_matrix @ matrix @ self.global_matrix_inv
+        if not parent_exported:
+            return self.global_matrix @ matrix
+        return matrix
+
+    def add_object(self, obj, buffers, parent_exported=False):
+        model_id = fbx_uuid("Model", obj.name)
+        is_mesh = buffers is not None
+
+        model = self.objects.add(b"Model")
+        model.add_int64(model_id)
+        model.add_string(fbx_name_class(obj.name, b"Model"))
+        model.add_string(b"Mesh" if is_mesh else b"Null")
+        self.count(b"Model")
+
+        location, rotation, scale = self.local_matrix(obj, parent_exported).decompose()
+        rotation = rotation.to_euler('XYZ')
+
+        elem_data(model, b"Version", 232)
+        props = elem_props(model)
+        elem_prop(props, b"Lcl Translation", b"Lcl Translation", b"", b"A", *map(float, location))
+        elem_prop(props, b"Lcl Rotation", b"Lcl Rotation", b"", b"A",
+                  *(math.degrees(angle) for angle in rotation))
+        elem_prop(props, b"Lcl Scaling", b"Lcl Scaling", b"", b"A", *map(float, scale))
+        elem_prop(props, b"DefaultAttributeIndex", b"int", b"Integer", b"", 0)
+        elem_prop(props, b"InheritType", b"enum", b"", b"", 1)
+        if self.use_custom_props:
+            add_custom_props(props, obj)
+        elem_data(model, b"MultiLayer", 0)
+        elem_data(model, b"MultiTake", 0)
+        elem_data(model, b"Shading", True)
+        elem_data(model, b"Culling", "CullingOff")
+
+        parent_id = fbx_uuid("Model", obj.parent.name) if parent_exported else 0
+        self.connect(model_id, parent_id)
+        self.stats["objects"] += 1
+
+        if is_mesh:
+            materials, slot_indices = object_materials(obj)
+            geometry_id = self.add_geometry(obj, buffers, slot_indices)
+            self.connect(geometry_id, model_id)
+            for material in materials:
+                self.connect(self.add_material(material), model_id)
+        else:
+            attribute_id = fbx_uuid("NodeAttribute", obj.name)
+            attribute = self.objects.add(b"NodeAttribute")
+            attribute.add_int64(attribute_id)
+            attribute.add_string(fbx_name_class(obj.name, b"NodeAttribute"))
+            attribute.add_string(b"Null")
+            elem_data(attribute, b"TypeFlags", "Null")
+            self.count(b"NodeAttribute")
+            self.connect(attribute_id, model_id)
+
+    def add_geometry(self, obj, buffers, slot_indices=None):
+        geometry_id = fbx_uuid("Geometry", obj.name)
+        positions = buffers.positions.astype(np.float64)
+        normals = buffers.normals.astype(np.float64)
+
+        if self.bake_space_transform:
+            matrix = np.array(self.global_matrix.to_3x3(), dtype=np.float64)
+            positions = positions @ matrix.T
+            normals = normals @ np.linalg.inv(matrix)
+            lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+            np.divide(normals, lengths, out=normals, where=lengths > 0)
+
+        # The last index of each polygon is stored as its ones' complement
+        polygon_indices = buffers.loop_vertices.astype(np.int32)
+        if len(buffers.loop_totals):
+            polygon_ends = np.cumsum(buffers.loop_totals) - 1
+            polygon_indices[polygon_ends] ^= -1
+
+        geometry = self.objects.add(b"Geometry")
+        geometry.add_int64(geometry_id)
+        geometry.add_string(fbx_name_class(obj.name, b"Geometry"))
+        geometry.add_string(b"Mesh")
+        self.count(b"Geometry")
+
+        elem_props(geometry)
+        elem_data(geometry, b"GeometryVersion", 124)
+        geometry.add(b"Vertices").add_array(b"d", np.ascontiguousarray(positions))
+        geometry.add(b"PolygonVertexIndex").add_array(b"i", polygon_indices)
+
+        normal_layer = geometry.add(b"LayerElementNormal")
+        normal_layer.add_int32(0)
+        elem_data(normal_layer, b"Version", 101)
+        elem_data(normal_layer, b"Name", "")
+        elem_data(normal_layer, b"MappingInformationType", "ByPolygonVertex")
+        elem_data(normal_layer, b"ReferenceInformationType", "Direct")
+        normal_layer.add(b"Normals").add_array(b"d", np.ascontiguousarray(normals))
+
+        for idx, (name, uvs) in enumerate(buffers.uv_layers):
+            unique_uvs, uv_index = np.unique(uvs, axis=0, return_inverse=True)
+            uv_layer = geometry.add(b"LayerElementUV")
+            uv_layer.add_int32(idx)
+            elem_data(uv_layer, b"Version", 101)
+            elem_data(uv_layer, b"Name", name)
+            elem_data(uv_layer, b"MappingInformationType", "ByPolygonVertex")
+            elem_data(uv_layer, b"ReferenceInformationType", "IndexToDirect")
+            uv_layer.add(b"UV").add_array(
+                b"d", np.ascontiguousarray(unique_uvs, dtype=np.float64))
+            uv_layer.add(b"UVIndex").add_array(
+                b"i", np.ascontiguousarray(uv_index.reshape(-1), dtype=np.int32))
+
+        has_materials = slot_indices is not None
+        if has_materials:
+            # Indices past the slots fall back to the first slot, like Blender's exporter
+            indices = buffers.material_indices
+            indices = slot_indices[np.where(indices < len(slot_indices), indices, 0)]
+            material_layer = geometry.add(b"LayerElementMaterial")
+            material_layer.add_int32(0)
+            elem_data(material_layer, b"Version", 101)
+            elem_data(material_layer, b"Name", "")
+            elem_data(material_layer, b"MappingInformationType", "ByPolygon")
+            elem_data(material_layer, b"ReferenceInformationType", "IndexToDirect")
+            material_layer.add(b"Materials").add_array(
+                b"i", np.ascontiguousarray(indices, dtype=np.int32))
+
+        layer_count = max(1, len(buffers.uv_layers))
+        for idx in range(layer_count):
+            layer = geometry.add(b"Layer")
+            layer.add_int32(idx)
+            elem_data(layer, b"Version", 100)
+            layer_types = [b"LayerElementUV"] if idx < len(buffers.uv_layers) else []
+            if idx == 0:
+                layer_types.insert(0, b"LayerElementNormal")
+                if has_materials:
+                    layer_types.append(b"LayerElementMaterial")
+            for layer_type in layer_types:
+                layer_element = layer.add(b"LayerElement")
+                elem_data(layer_element, b"Type", layer_type)
+                elem_data(layer_element, b"TypedIndex", idx if layer_type == b"LayerElementUV" else 0)
+
+        self.stats["vertices"] += buffers.vertex_count
+        self.stats["polygons"] += len(buffers.loop_totals)
+        return geometry_id
+
+    def add_material(self, material):
+        if material.name in self.materials:
+            return self.materials[material.name]
+
+        material_id = fbx_uuid("Material", material.name)
+        self.materials[material.name] = material_id
+
+        elem = self.objects.add(b"Material")
+        elem.add_int64(material_id)
+        elem.add_string(fbx_name_class(material.name, b"Material"))
+        elem.add_string(b"")
+        self.count(b"Material")
+
+        elem_data(elem, b"Version", 102)
+        elem_data(elem, b"ShadingModel", "Phong")
+        elem_data(elem, b"MultiLayer", 0)
+        props = elem_props(elem)
+        color = [float(c) for c in material.diffuse_color[:3]]
+        elem_prop(props, b"DiffuseColor", b"Color", b"", b"A", *color)
+        elem_prop(props, b"Opacity", b"double", b"Number", b"", float(material.diffuse_color[3]))
+        return material_id
+
+    def encode(self):
+        elems = []
+
+        header = FBXElem(b"FBXHeaderExtension")
+        elem_data(header, b"FBXHeaderVersion", 1003)
+        elem_data(header, b"FBXVersion", fbx_binary.FBX_VERSION)
+        elem_data(header, b"EncryptionType", 0)
+        elem_data(header, b"Creator", CREATOR)
+        elems.append(header)
+
+        file_id = FBXElem(b"FileId")
+        file_id.add_bytes(FILE_ID)
+        elems.append(file_id)
+        creation_time = FBXElem(b"CreationTime")
+        creation_time.add_string(CREATION_TIME)
+        elems.append(creation_time)
+        creator = FBXElem(b"Creator")
+        creator.add_string(CREATOR)
+        elems.append(creator)
+
+        (up, up_sign), (front, front_sign), (coord, coord_sign) = self.axes
+        global_settings = FBXElem(b"GlobalSettings")
+        elem_data(global_settings, b"Version", 1000)
+        props = elem_props(global_settings)
+        elem_prop(props, b"UpAxis", b"int", b"Integer", b"", up)
+        elem_prop(props, b"UpAxisSign", b"int", b"Integer", b"", up_sign)
+        elem_prop(props, b"FrontAxis", b"int", b"Integer", b"", front)
+        elem_prop(props, b"FrontAxisSign", b"int", b"Integer", b"", front_sign)
+        elem_prop(props, b"CoordAxis", b"int", b"Integer", b"", coord)
+        elem_prop(props, b"CoordAxisSign", b"int", b"Integer", b"", coord_sign)
+        elem_prop(props, b"OriginalUpAxis", b"int", b"Integer", b"", -1)
+        elem_prop(props, b"OriginalUpAxisSign", b"int", b"Integer", b"", 1)
+        elem_prop(props, b"UnitScaleFactor", b"double", b"Number", b"",
+                  self.unit_scale / self.global_scale)
+        elem_prop(props, b"OriginalUnitScaleFactor", b"double", b"Number", b"", self.unit_scale)
+        elems.append(global_settings)
+
+        documents = FBXElem(b"Documents")
+        elem_data(documents, b"Count", 1)
+        document = documents.add(b"Document")
+        document.add_int64(fbx_uuid("Document"))
+        document.add_string(b"Scene")
+        document.add_string(b"Scene")
+        props = elem_props(document)
+        elem_prop(props, b"SourceObject", b"object", b"", b"")
+        elem_prop(props, b"ActiveAnimStackName", b"KString", b"", b"", "")
+        document.add(b"RootNode").add_int64(0)
+        elems.append(documents)
+
+        elems.append(FBXElem(b"References"))
+
+        definitions = FBXElem(b"Definitions")
+        elem_data(definitions, b"Version", 100)
+        elem_data(definitions, b"Count", 1 + sum(self.counts.values()))
+        global_type = definitions.add(b"ObjectType")
+        global_type.add_string(b"GlobalSettings")
+        elem_data(global_type, b"Count", 1)
+        for object_type, count in sorted(self.counts.items()):
+            object_type_elem = definitions.add(b"ObjectType")
+            object_type_elem.add_string(object_type)
+            elem_data(object_type_elem, b"Count", count)
+        elems.append(definitions)
+
+        elems.append(self.objects)
+        elems.append(self.connections)
+
+        takes = FBXElem(b"Takes")
+        elem_data(takes, b"Current", "")
+        elems.append(takes)
+
+        return fbx_binary.encode(elems)
@@ -0,0 +1,202 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import struct
+import zlib
+
+FBX_VERSION = 7400
+
+HEAD_MAGIC = b"Kaydara FBX Binary\x20\x20\x00\x1a\x00"
+FOOT_ID = b"\xfa\xbc\xab\x09\xd0\xc8\xd4\x66\xb1\x76\xfb\x83\x1c\xf7\x26\x7e"
+FOOT_MAGIC = b"\xf8\x5a\x8c\x6a\xde\xf5\xd9\x7e\xec\xe9\x0c\xe3\x75\x8f\x29\x0b"
+BLOCK_SENTINEL = b"\x00" * 13
+
+# Arrays smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 128
+
+ARRAY_ITEM_SIZE = {b"f": 4, b"d": 8, b"i": 4, b"l": 8, b"b": 1}
+
+
+class FBXElem:
+    """
+    An element of a binary FBX file (version 7.4): a name, a list
+    of typed properties and child elements. Array properties are
+    taken as raw buffers, so numpy arrays are written without being
+    converted to Python lists.
+    """
+    __slots__ = ("name", "props", "types", "elems")
+
+    def __init__(self, name):
+        self.name = name
+        self.props = []
+        self.types = bytearray()
+        self.elems = []
+
+    def add(self, name):
+        """Add and return a child element."""
+        elem = FBXElem(name)
+        self.elems.append(elem)
+        return elem
+
+    def add_bool(self, value):
+        self._add(b"C", struct.pack("<?", value))
+
+    def add_int16(self, value):
+        self._add(b"Y", struct.pack("<h", value))
+
+    def add_int32(self, value):
+        self._add(b"I", struct.pack("<i", value))
+
+    def add_int64(self, value):
+        self._add(b"L", struct.pack("<q", value))
+
+    def add_float32(self, value):
+        self._add(b"F", struct.pack("<f", value))
+
+    def add_float64(self, value):
+        self._add(b"D", struct.pack("<d", value))
+
+    def add_string(self, value):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self._add(b"S", struct.pack("<I", len(value)) + value)
+
+    def add_bytes(self, value):
+        self._add(b"R", struct.pack("<I", len(value)) + bytes(value))
+
+    def add_array(self, type_code, data):
+        """
+        Add an array property from a buffer of little-endian
+        items, like a numpy array or an array.array.
+        """
+        data = bytes(memoryview(data).cast("B"))
+        count = len(data) // ARRAY_ITEM_SIZE[type_code]
+
+        if len(data) >= COMPRESS_MIN_BYTES:
+            payload = zlib.compress(data, 1)
+            encoding = 1
+        else:
+            payload = data
+            encoding = 0
+
+        self._add(type_code, struct.pack("<3I", count, encoding, len(payload)) + payload)
+
+    def _add(self, type_code, payload):
+        self.types += type_code
+        self.props.append(payload)
+
+    def encode(self, offset, is_last=False):
+        """Return the bytes of this element, starting at file offset `offset`."""
+        name = self.name.encode("utf-8") if isinstance(self.name, str) else self.name
+        props = b"".join(t.to_bytes(1, "little") + p for t, p in zip(self.types, self.props))
+
+        head_size = 13 + len(name)
+        body_offset = offset + head_size + len(props)
+
+        chunks = []
+        for idx, elem in enumerate(self.elems):
+            chunk = elem.encode(body_offset, idx == len(self.elems) - 1)
+            chunks.append(chunk)
+            body_offset += len(chunk)
+
+        if self.elems or (not self.props and not is_last):
+            chunks.append(BLOCK_SENTINEL)
+            body_offset += len(BLOCK_SENTINEL)
+
+        head = struct.pack("<3IB", body_offset, len(self.props), len(props), len(name))
+        return head + name + props + b"".join(chunks)
+
+
+#
+# Helpers for common element shapes
+#
+
+
+def elem_data(parent, name, *values):
+    """Add an element holding plain values, typed by their Python type."""
+    elem = parent.add(name)
+    for value in values:
+        if isinstance(value, bool):
+            elem.add_bool(value)
+        elif isinstance(value, int):
+            if -2 ** 31 <= value < 2 ** 31:
+                elem.add_int32(value)
+            else:
+                elem.add_int64(value)
+        elif isinstance(value, float):
+            elem.add_float64(value)
+        else:
+            elem.add_string(value)
+    return elem
+
+
+def elem_props(parent):
+    return parent.add(b"Properties70")
+
+
+def elem_prop(props, name, type_name, label, flags, *values):
+    """
+    Add a P property to a Properties70 block, like
+    P: "Lcl Translation", "Lcl Translation", "", "A", 0, 0, 0
+    """
+    elem = props.add(b"P")
+    elem.add_string(name)
+    elem.add_string(type_name)
+    elem.add_string(label)
+    elem.add_string(flags)
+    for value in values:
+        if isinstance(value, bool):
+            elem.add_int32(int(value))
+        elif isinstance(value, int):
+            elem.add_int32(value)
+        elif isinstance(value, float):
+            elem.add_float64(value)
+        else:
+            elem.add_string(value)
+    return elem
+
+
+def fbx_name_class(name, cls):
+    """FBX object names are stored as name, then \\x00\\x01, then class."""
+    return name.encode("utf-8") + b"\x00\x01" + cls
+
+
+def encode(elems, version=FBX_VERSION):
+    """Return the bytes of an FBX file containing the top level elements."""
+    chunks = [HEAD_MAGIC, struct.pack("<I", version)]
+    offset = len(HEAD_MAGIC) + 4
+
+    for idx, elem in enumerate(elems):
+        chunk = elem.encode(offset, idx == len(elems) - 1)
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    chunks.append(BLOCK_SENTINEL)
+    offset += len(BLOCK_SENTINEL)
+
+    # Footer, as written by the FBX SDK
+    chunks.append(FOOT_ID)
+    chunks.append(b"\x00" * 4)
+    offset += len(FOOT_ID) + 4
+    pad = ((offset + 15) & ~15) - offset
+    chunks.append(b"\x00" * (pad or 16))
+    chunks.append(struct.pack("<I", version))
+    chunks.append(b"\x00" * 120)
+    chunks.append(FOOT_MAGIC)
+
+    return b"".join(chunks)
@@ -19,6 +19,8 @@
 import bpy
 import re
 
+from . import rules
+
 
 def redraw_properties():
     for area in bpy.context.screen.areas:
@@ -29,7 +31,7 @@ def redraw_properties():
 def group_is_valid(group):
     if not group.name:
         return False
-    if len(group.obj_names) < 1:
+    if len(group.obj_names) < 1 and not rules.group_has_rules(group):
         return False
 
     for obj in group.obj_names:
@@ -0,0 +1,380 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import contextlib
+import hashlib
+import os
+import time
+
+from . import report
+
+# numpy is only imported where meshes are decimated, as importing it is
+# a large part of the add-on's startup cost
+
+# Hidden, next to the exports, like the export cache
+CACHE_DIR = ".preflight_lods"
+CACHE_VERSION = 1
+# Cached meshes no run has used for this many seconds are removed
+CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+# Temporary collection holding the LOD objects of the group being exported
+LOD_COLLECTION_NAME = ".preflight_lods"
+
+# Custom property holding the screen size of each LOD, exported as an
+# FBX user property for an AssetPostprocessor to set LODGroup transitions
+SCREEN_SIZE_PROPERTY = "screen_size"
+
+
+def is_enabled(group):
+    return group.use_lods
+
+
+def parse_values(text, label):
+    try:
+        return [float(value) for value in text.replace(",", " ").split()]
+    except ValueError:
+        raise ValueError("Invalid LOD {0}: {1}".format(label, text))
+
+
+def levels(group):
+    """
+    Return the (ratio, screen size) of each LOD of a group, LOD0
+    first with the full mesh. Raise ValueError for settings Unity's
+    LODGroup would not accept.
+    """
+    ratios = parse_values(group.lod_ratios, "ratios")
+    screen_sizes = parse_values(group.lod_screen_sizes, "screen sizes")
+
+    if len(screen_sizes) != len(ratios) + 1:
+        raise ValueError("LOD screen sizes need one value more than LOD ratios, for LOD0.")
+    if any(not 0.0 < ratio <= 1.0 for ratio in ratios):
+        raise ValueError("LOD ratios must be between 0 and 1.")
+    if any(not 0.0 < size <= 1.0 for size in screen_sizes) or \
+            screen_sizes != sorted(screen_sizes, reverse=True):
+        raise ValueError("LOD screen sizes must be between 0 and 1, largest first.")
+
+    return list(zip([1.0] + ratios, screen_sizes))
+
+
+def settings(group):
+    """Return the LOD settings of a group, for fingerprints and the output manifest."""
+    return {"levels": [list(level) for level in levels(group)]}
+
+
+def cache_dir(context):
+    export_location = context.scene.preflight_props.export_options.export_location
+    return os.path.join(bpy.path.abspath(export_location), CACHE_DIR)
+
+
+#
+# Decimated mesh cache
+#
+
+
+def read_arrays(mesh):
+    """Read the geometry of a mesh that decimation changes into numpy arrays."""
+    from . mesh_data import foreach_get, np
+
+    arrays = {
+        "positions": foreach_get(mesh.vertices, "co", 3, np.float32),
+        "loop_vertices": foreach_get(mesh.loops, "vertex_index", 1, np.int32),
+        "loop_starts": foreach_get(mesh.polygons, "loop_start", 1, np.int32),
+        "loop_totals": foreach_get(mesh.polygons, "loop_total", 1, np.int32),
+        "material_indices": foreach_get(mesh.polygons, "material_index", 1, np.int32),
+        "smooth": foreach_get(mesh.polygons, "use_smooth", 1, bool),
+    }
+    for layer in mesh.uv_layers:
+        arrays["uv:" + layer.name] = foreach_get(layer.data, "uv", 2, np.float32)
+    return arrays
+
+
+def mesh_hash(mesh):
+    """Return a digest of the geometry, UVs and material slots of a mesh."""
+    digest = hashlib.sha1(str(CACHE_VERSION).encode("utf-8"))
+    for name, values in sorted(read_arrays(mesh).items()):
+        digest.update(name.encode("utf-8"))
+        digest.update(values.tobytes())
+    for material in mesh.materials:
+        digest.update((material.name if material else "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def build_mesh(name, arrays, materials):
+    """Create a mesh from arrays written by read_arrays()."""
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays["positions"]))
+    mesh.vertices.foreach_set("co", arrays["positions"].ravel())
+    mesh.loops.add(len(arrays["loop_vertices"]))
+    mesh.loops.foreach_set("vertex_index", arrays["loop_vertices"])
+    mesh.polygons.add(len(arrays["loop_starts"]))
+    mesh.polygons.foreach_set("loop_start", arrays["loop_starts"])
+    try:
+        mesh.polygons.foreach_set("loop_total", arrays["loop_totals"])
+    except (AttributeError, TypeError, RuntimeError):
+        # Read-only in newer versions, where it follows from loop_start
+        pass
+    mesh.polygons.foreach_set("material_index", arrays["material_indices"])
+    mesh.polygons.foreach_set("use_smooth", arrays["smooth"])
+
+    for key in sorted(arrays):
+        if key.startswith("uv:"):
+            layer = mesh.uv_layers.new(name=key[3:])
+            layer.data.foreach_set("uv", arrays[key].ravel())
+
+    for material in materials:
+        mesh.materials.append(material)
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+class DecimationCache:
+    """
+    Decimated meshes by the hash of their source mesh and the
+    ratio, kept in memory for an export run and on disk between runs.
+    Files on disk are touched whenever a run uses them, so those of
+    meshes that changed or left the scene age out and are pruned.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.meshes = {}
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+    def path(self, key):
+        digest, ratio = key
+        return os.path.join(self.directory, "{0}_{1:.4f}.npz".format(digest, ratio))
+
+    def get(self, key, name, materials):
+        from . mesh_data import np
+
+        mesh = self.meshes.get(key)
+        if mesh is None and self.directory is not None:
+            try:
+                with np.load(self.path(key)) as arrays:
+                    mesh = build_mesh(name, dict(arrays), materials)
+                os.utime(self.path(key))
+            except (OSError, ValueError, KeyError):
+                mesh = None
+            if mesh is not None:
+                self.meshes[key] = mesh
+
+        if mesh is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return mesh
+
+    def put(self, key, mesh):
+        from . mesh_data import np
+
+        self.meshes[key] = mesh
+        if self.directory is None:
+            return
+
+        path = self.path(key)
+        tmp_path = "{0}.{1}.tmp.npz".format(path[:-len(".npz")], os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            np.savez(tmp_path, **read_arrays(mesh))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def clear(self):
+        for mesh in self.meshes.values():
+            bpy.data.meshes.remove(mesh)
+        self.meshes.clear()
+
+    def prune(self, max_age=CACHE_MAX_AGE):
+        """Remove the files on disk that no run has used for `max_age` seconds."""
+        if self.directory is None:
+            return
+        cutoff = time.time() - max_age
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+
+        for entry in entries:
+            if not entry.name.endswith(".npz"):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    self.pruned += 1
+            except OSError:
+                pass
+
+
+# Cache shared by the groups of the export run in progress, if any
+active_cache = None
+
+
+@contextlib.contextmanager
+def batch_cache(directory):
+    """Share decimated meshes between all exports inside the block."""
+    global active_cache
+    previous = active_cache
+    active_cache = DecimationCache(directory)
+    try:
+        yield active_cache
+    finally:
+        active_cache.clear()
+        active_cache.prune()
+        active_cache = previous
+
+
+#
+# LOD chains
+#
+
+
+def can_decimate(obj):
+    """Static meshes get LODs. Skinned meshes are left to their armature."""
+    return obj is not None and obj.type == 'MESH' and \
+        not any(modifier.type == 'ARMATURE' for modifier in obj.modifiers)
+
+
+def chain_names(obj, lod_levels):
+    """Return the names of the LODGroup empty and the LOD objects made for an object."""
+    return [obj.name + "_LODGroup"] + [
+        "{0}_LOD{1}".format(obj.name, idx) for idx in range(len(lod_levels))]
+
+
+def check_names(objects, lod_levels):
+    """
+    Raise ValueError if an object already has a name a LOD chain
+    needs. Blender would give the new object another name, and
+    Unity finds LODs by their names.
+    """
+    taken = sorted(name for obj in objects if can_decimate(obj)
+                   for name in chain_names(obj, lod_levels) if name in bpy.data.objects)
+    if taken:
+        raise ValueError("Cannot build LODs, as objects named {0} already exist.".format(
+            ", ".join(taken)))
+
+
+@contextlib.contextmanager
+def lod_chain(objects, lod_levels, directory=None, apply_modifiers=True):
+    """
+    Yield the objects to export in place of `objects`. Each static
+    mesh is replaced by an empty named {object}_LODGroup holding
+    {object}_LOD0 to {object}_LODn, which Unity's importer turns into
+    a LODGroup. Every mesh is evaluated once, and all the decimations
+    the cache is missing run in one depsgraph update. The temporary
+    objects are removed when the block exits. Raise ValueError if
+    the names they need are taken.
+    """
+    check_names(objects, lod_levels)
+    scene = bpy.context.scene
+    view_layer = bpy.context.view_layer
+    cache = active_cache if active_cache is not None else DecimationCache(directory)
+
+    collection = bpy.data.collections.new(LOD_COLLECTION_NAME)
+    scene.collection.children.link(collection)
+    created_objects = []
+    created_meshes = []
+
+    def new_object(name, data):
+        obj = bpy.data.objects.new(name, data)
+        collection.objects.link(obj)
+        created_objects.append(obj)
+        return obj
+
+    try:
+        exported = []
+        chains = []
+        decimators = []
+        # Objects sharing a mesh share its decimations too
+        queued = set()
+
+        with report.stage("evaluation"):
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+            for obj in objects:
+                if not can_decimate(obj):
+                    exported.append(obj)
+                    continue
+
+                if apply_modifiers:
+                    source = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph))
+                    created_meshes.append(source)
+                else:
+                    source = obj.data
+                digest = mesh_hash(source)
+
+                meshes = [source]
+                for idx, (ratio, _) in enumerate(lod_levels[1:], 1):
+                    key = (digest, ratio)
+                    if key in queued:
+                        meshes.append(key)
+                        continue
+
+                    name = "{0}_LOD{1}".format(obj.name, idx)
+                    mesh = cache.get(key, name, source.materials)
+                    if mesh is None:
+                        decimator = new_object(name + "_decimate", source)
+                        modifier = decimator.modifiers.new("Decimate", 'DECIMATE')
+                        modifier.ratio = ratio
+                        decimators.append((key, decimator))
+                        queued.add(key)
+                    meshes.append(key if mesh is None else mesh)
+                chains.append((obj, meshes))
+
+        with report.stage("lod"):
+            if decimators:
+                view_layer.update()
+                depsgraph = bpy.context.evaluated_depsgraph_get()
+                for key, decimator in decimators:
+                    cache.put(key, bpy.data.meshes.new_from_object(
+                        decimator.evaluated_get(depsgraph)))
+
+            for obj, meshes in chains:
+                names = chain_names(obj, lod_levels)
+                root = new_object(names[0], None)
+                root.matrix_world = obj.matrix_world.copy()
+                exported.append(root)
+
+                for idx, mesh in enumerate(meshes):
+                    if isinstance(mesh, tuple):
+                        mesh = cache.meshes[mesh]
+                    child = new_object(names[idx + 1], mesh)
+                    child.parent = root
+                    child[SCREEN_SIZE_PROPERTY] = lod_levels[idx][1]
+                    for slot, source_slot in zip(child.material_slots, obj.material_slots):
+                        if source_slot.link == 'OBJECT':
+                            slot.link = 'OBJECT'
+                            slot.material = source_slot.material
+                    exported.append(child)
+
+            view_layer.update()
+
+        report.add_counts(lods=len(chains) * (len(lod_levels) - 1),
+                          decimated=len(decimators))
+        yield exported
+    finally:
+        for obj in created_objects:
+            bpy.data.objects.remove(obj)
+        bpy.data.collections.remove(collection)
+        for mesh in created_meshes:
+            bpy.data.meshes.remove(mesh)
+        if cache is not active_cache:
+            cache.clear()
+            cache.prune()
@@ -0,0 +1,259 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import hashlib
+import json
+import os
+import traceback
+from bpy.app.handlers import persistent
+
+from . import cache
+from . import operators
+from . import rules
+
+# Text datablock the manifest is saved in
+MANIFEST_NAME = ".preflight_manifest"
+MANIFEST_VERSION = 1
+# Scene property marking a scene restored from a manifest, which only
+# holds the groups and clips it was loaded for
+PARTIAL_PROPERTY = "preflight_partial"
+
+# Summary of what the manifest was last written from, so saves that
+# change nothing it describes skip rebuilding it
+written_inputs = None
+
+
+def build_manifest(scene):
+    """
+    Describe the export groups of a scene with their objects
+    resolved to names, along with the export options and the
+    animation clips, so the export can be planned without
+    loading the rest of the file.
+    """
+    props = scene.preflight_props
+    context = bpy.context
+
+    options = {}
+    for key, value in props.export_options.as_dict().items():
+        options[key] = sorted(value) if isinstance(value, set) else value
+
+    clips = operators.animation_clips(context)
+    armature_actions = {}
+    for armature, action in clips:
+        armature_actions.setdefault(armature.name, []).append(action.name)
+
+    groups = []
+    with rules.scene_index(scene):
+        for group in props.fbx_export_groups:
+            objects = operators.objects_for_group(group, context)
+            entry = {
+                "name": group.name,
+                "include_animations": group.include_animations,
+                "apply_modifiers": group.apply_modifiers,
+                "export_location": group.export_location,
+                "use_lods": group.use_lods,
+                "lod_ratios": group.lod_ratios,
+                "lod_screen_sizes": group.lod_screen_sizes,
+                "shard_mode": group.shard_mode,
+                "shard_cell_size": group.shard_cell_size,
+                "shard_max_objects": group.shard_max_objects,
+                "objects": [obj.name for obj in objects if obj is not None],
+            }
+            if group.include_animations:
+                entry["actions"] = group_actions(objects, armature_actions)
+            groups.append(entry)
+
+    clips = [{
+        "name": operators.clip_name(armature, action),
+        "armature": armature.name,
+        "action": action.name,
+    } for armature, action in clips]
+
+    return {
+        "version": MANIFEST_VERSION,
+        "scene": scene.name,
+        "export_options": options,
+        "groups": groups,
+        "clips": clips,
+    }
+
+
+def group_actions(objects, armature_actions):
+    """
+    Return the names of the actions Blender's exporter bakes for a
+    group with animation: those assigned to its objects or in their
+    NLA tracks, stashed ones included, and every other action that
+    animates bones of its armatures.
+    """
+    names = set()
+    for obj in objects:
+        if obj is None:
+            continue
+        names.update(action.name for action in cache.object_actions(obj, True))
+        names.update(armature_actions.get(obj.name, ()))
+    return sorted(names)
+
+
+def manifest_inputs(scene):
+    """
+    Return a digest of what the manifest is built from: the export
+    options and groups, the objects rule-based groups pick from, the
+    armatures and the actions. It is much cheaper than the manifest
+    itself, which matches rules and every action against every
+    armature.
+    """
+    props = scene.preflight_props
+    digest = hashlib.sha1()
+    cache.update_json(digest, [bpy.data.filepath, scene.name,
+                               props.export_options.as_dict()])
+
+    uses_rules = False
+    for group in props.fbx_export_groups:
+        cache.update_rna(digest, group)
+        cache.update_json(digest, [item.obj_pointer.name if item.obj_pointer else None
+                                   for item in group.obj_names])
+        if rules.group_has_rules(group):
+            uses_rules = True
+            if group.rule_collection is not None:
+                cache.update_json(digest, [obj.name for obj in group.rule_collection.all_objects])
+            if group.rule_property:
+                cache.update_json(digest, [[obj.name, str(obj.get(group.rule_property))]
+                                           for obj in scene.objects if group.rule_property in obj])
+
+    if uses_rules:
+        cache.update_json(digest, [[obj.name, obj.type] for obj in scene.objects])
+
+    cache.update_json(digest, [[obj.name, obj.data.bones.keys()]
+                               for obj in scene.objects if obj.type == 'ARMATURE'])
+    cache.update_json(digest, [[obj.name, [action.name for action in cache.object_actions(obj, True)]]
+                               for obj in scene.objects if obj.animation_data is not None])
+    cache.update_json(digest, [[action.name, len(action.fcurves)] for action in bpy.data.actions])
+    return digest.hexdigest()
+
+
+def write_manifest(scene):
+    """
+    Save the manifest of a scene in the file, unless nothing it is
+    built from changed since it was last written.
+    """
+    global written_inputs
+    inputs = manifest_inputs(scene)
+    text = bpy.data.texts.get(MANIFEST_NAME)
+    if text is not None and inputs == written_inputs:
+        return
+
+    text = text or bpy.data.texts.new(MANIFEST_NAME)
+    text.from_string(json.dumps(build_manifest(scene), indent=1, sort_keys=True))
+    written_inputs = inputs
+
+
+def read_manifest(text):
+    """Return the manifest stored in a Text datablock, or None if it is unusable."""
+    try:
+        manifest = json.loads(text.as_string())
+    except ValueError:
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def restore_scene(scene, manifest, objects, source_file, groups=None, clips=None):
+    """
+    Recreate export options and groups in a scene from a manifest,
+    pointing at the objects appended from the source file. Relative
+    export locations stay relative to the source file. The scene is
+    marked as partial, so exports from it leave the files of groups
+    and clips it does not hold alone.
+    """
+    scene[PARTIAL_PROPERTY] = True
+    props = scene.preflight_props
+    export_options = props.export_options
+
+    for key, value in manifest["export_options"].items():
+        if hasattr(export_options, key):
+            setattr(export_options, key, set(value) if isinstance(value, list) else value)
+
+    export_options.export_location = bpy.path.abspath(
+        export_options.export_location, start=os.path.dirname(source_file))
+    export_options.export_animation_clips = bool(clips)
+
+    props.fbx_export_groups.clear()
+    for entry in groups if groups is not None else manifest["groups"]:
+        group = props.fbx_export_groups.add()
+        group.name = entry["name"]
+        group.include_animations = entry["include_animations"]
+        group.apply_modifiers = entry["apply_modifiers"]
+        group.export_location = entry["export_location"]
+        group.use_lods = entry.get("use_lods", False)
+        group.lod_ratios = entry.get("lod_ratios", "0.5 0.25")
+        group.lod_screen_sizes = entry.get("lod_screen_sizes", "0.6 0.3 0.1")
+        group.shard_mode = entry.get("shard_mode", 'NONE')
+        group.shard_cell_size = entry.get("shard_cell_size", 100.0)
+        group.shard_max_objects = entry.get("shard_max_objects", 256)
+        for name in entry["objects"]:
+            item = group.obj_names.add()
+            item.obj_pointer = objects.get(name)
+
+
+#
+# Handlers
+#
+
+
+@persistent
+def on_save_pre(*args):
+    # Never let the manifest get in the way of saving the file
+    try:
+        scene = bpy.context.scene
+        if scene is None:
+            return
+        if wants_manifest(scene):
+            write_manifest(scene)
+        else:
+            remove_manifest()
+    except Exception:
+        traceback.print_exc()
+
+
+def wants_manifest(scene):
+    """Whether saving the file should store the manifest of a scene."""
+    props = scene.preflight_props
+    export_options = props.export_options
+    return export_options.save_manifest and bool(
+        props.fbx_export_groups or export_options.export_animation_clips)
+
+
+def remove_manifest():
+    """Remove a manifest left from earlier saves, as it would describe the file wrongly."""
+    global written_inputs
+    text = bpy.data.texts.get(MANIFEST_NAME)
+    if text is not None:
+        bpy.data.texts.remove(text)
+    written_inputs = None
+
+
+def register():
+    if on_save_pre not in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.append(on_save_pre)
+
+
+def unregister():
+    if on_save_pre in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(on_save_pre)
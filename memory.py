@@ -0,0 +1,217 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import gc
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import ctypes
+    from ctypes import wintypes
+except ImportError:
+    ctypes = None
+
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+# Working set of an export per stored vertex, exporter intermediates
+# included, assumed until a run has measured its own. Blender's FBX
+# exporter peaks at several hundred bytes per vertex of a plain mesh,
+# so this errs on the high side.
+VERTEX_BYTES = 1024
+
+
+def proc_status_bytes(field):
+    """Read a size like VmRSS from /proc/self/status, in bytes."""
+    try:
+        with open(PROC_STATUS) as status_file:
+            for line in status_file:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def windows_memory_counters():
+    if ctypes is None or sys.platform != "win32":
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(
+            process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+
+def current_rss():
+    """Return the resident set size of this process in bytes, or None if unknown."""
+    rss = proc_status_bytes("VmRSS")
+    if rss is not None:
+        return rss
+
+    counters = windows_memory_counters()
+    if counters is not None:
+        return counters.WorkingSetSize
+    return None
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in bytes,
+    since the last reset_peak() where the platform supports it.
+    """
+    peak = proc_status_bytes("VmHWM")
+    if peak is not None:
+        return peak
+
+    counters = windows_memory_counters()
+    if counters is not None:
+        return counters.PeakWorkingSetSize
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+def reset_peak():
+    """
+    Start measuring the peak resident set size again from the
+    current one. Only Linux supports this. Elsewhere the peak covers
+    the whole process, so it is only accurate for the largest group.
+    """
+    try:
+        with open(PROC_CLEAR_REFS, "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class GroupMemory:
+    """Peak memory of one export, and the meshes it leaves behind."""
+
+    def __init__(self, track_meshes=False):
+        # Whether the peak covers this export only
+        self.exact = reset_peak()
+        self.rss_start = current_rss()
+        # Listing every mesh is only worth it when they are freed
+        self.meshes = set(mesh.as_pointer() for mesh in bpy.data.meshes) \
+            if track_meshes else None
+
+    def peak(self):
+        peak = peak_rss()
+        if peak is None or self.rss_start is None:
+            return peak
+        return max(peak, self.rss_start)
+
+    def growth(self):
+        """Return how far the export took memory above where it started, if it can be measured."""
+        peak = self.peak()
+        if not self.exact or peak is None or self.rss_start is None:
+            return None
+        return peak - self.rss_start
+
+    def free(self):
+        """
+        Remove the meshes the export created and left without users,
+        like meshes converted from curves and text, and collect
+        Python garbage. Return the number of meshes removed.
+        """
+        if self.meshes is None:
+            gc.collect()
+            return 0
+
+        orphans = [mesh for mesh in bpy.data.meshes
+                   if mesh.users == 0 and mesh.as_pointer() not in self.meshes]
+        for mesh in orphans:
+            bpy.data.meshes.remove(mesh)
+        gc.collect()
+        return len(orphans)
+
+
+def count_vertices(objects):
+    """
+    Count the vertices of the meshes of objects, to estimate the
+    memory their export needs. Meshes are counted as stored, without
+    evaluating modifiers, so estimating stays cheap.
+    """
+    return sum(len(obj.data.vertices) for obj in objects
+               if obj is not None and obj.type == 'MESH')
+
+
+class VertexCost:
+    """
+    Memory an export needs per stored vertex, measured from the
+    groups a run has exported so far. Groups are weighed by their
+    vertex counts, so the fixed cost of small exports does not
+    inflate the estimate of large ones. Until a group is measured,
+    or where the peak of a single export cannot be measured,
+    `default` is assumed.
+    """
+
+    def __init__(self, default=VERTEX_BYTES):
+        self.default = default
+        self.vertices = 0
+        self.growth = 0
+
+    def measure(self, vertices, growth):
+        if vertices and growth is not None:
+            self.vertices += vertices
+            self.growth += max(growth, 0)
+
+    @property
+    def bytes_per_vertex(self):
+        if not self.vertices:
+            return self.default
+        return self.growth / self.vertices
+
+    def estimate(self, vertices):
+        """Estimate the bytes an export of `vertices` stored vertices needs."""
+        return int(vertices * self.bytes_per_vertex)
+
+
+def fits(estimate, limit):
+    """Whether an export of `estimate` bytes stays under the limit, given the current RSS."""
+    if not limit:
+        return True
+    rss = current_rss()
+    return rss is None or rss + estimate <= limit
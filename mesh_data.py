@@ -0,0 +1,458 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import contextlib
+import hashlib
+from collections import OrderedDict
+
+from . import cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class MeshBuffers:
+    """
+    Geometry of one mesh as flat numpy arrays, with
+    loops ordered polygon by polygon. Triangles are Blender's
+    triangulation of the polygons, as loop indices, with the
+    polygon each one belongs to. They are None unless they were
+    asked for, as only optimize() needs them.
+    """
+    __slots__ = ("positions", "loop_vertices", "loop_totals", "normals",
+                 "uv_layers", "material_indices", "triangles", "triangle_polygons")
+
+    def __init__(self, positions, loop_vertices, loop_totals, normals,
+                 uv_layers, material_indices, triangles, triangle_polygons):
+        self.positions = positions
+        self.loop_vertices = loop_vertices
+        self.loop_totals = loop_totals
+        self.normals = normals
+        self.uv_layers = uv_layers
+        self.material_indices = material_indices
+        self.triangles = triangles
+        self.triangle_polygons = triangle_polygons
+
+    @property
+    def vertex_count(self):
+        return len(self.positions)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.arrays())
+
+    def arrays(self):
+        yield self.positions
+        yield self.loop_vertices
+        yield self.loop_totals
+        yield self.normals
+        yield self.material_indices
+        if self.triangles is not None:
+            yield self.triangles
+            yield self.triangle_polygons
+        for _, uvs in self.uv_layers:
+            yield uvs
+
+
+def foreach_get(collection, attr, width, dtype):
+    """Read an attribute of every item of a bpy collection into one array."""
+    values = np.empty(len(collection) * width, dtype=dtype)
+    if len(values):
+        collection.foreach_get(attr, values)
+    return values.reshape(-1, width) if width > 1 else values
+
+
+def loop_normals(mesh):
+    if hasattr(mesh, "corner_normals"):
+        # Blender 4.1+
+        return foreach_get(mesh.corner_normals, "vector", 3, np.float32)
+
+    mesh.calc_normals_split()
+    return foreach_get(mesh.loops, "normal", 3, np.float32)
+
+
+def extract_mesh(mesh, triangles=False):
+    """
+    Read the geometry of a mesh with bulk foreach_get calls, and
+    with `triangles`, its triangulation.
+    """
+    loop_starts = foreach_get(mesh.polygons, "loop_start", 1, np.int32)
+    loop_totals = foreach_get(mesh.polygons, "loop_total", 1, np.int32)
+
+    # Loops are almost always stored polygon by polygon already,
+    # otherwise gather them into that order.
+    offsets = np.zeros(len(loop_totals), dtype=np.int64)
+    np.cumsum(loop_totals[:-1], out=offsets[1:])
+    loop_order = None
+    if not np.array_equal(loop_starts, offsets):
+        loop_order = (np.repeat(loop_starts - offsets, loop_totals)
+                      + np.arange(int(loop_totals.sum())))
+
+    def loops(values):
+        return values if loop_order is None else values[loop_order]
+
+    uv_layers = [(layer.name, loops(foreach_get(layer.data, "uv", 2, np.float32)))
+                 for layer in mesh.uv_layers]
+
+    loop_triangles = triangle_polygons = None
+    if triangles:
+        # Blender's own triangulation handles concave polygons
+        if hasattr(mesh, "calc_loop_triangles"):
+            mesh.calc_loop_triangles()
+        loop_triangles = foreach_get(mesh.loop_triangles, "loops", 3, np.int32)
+        triangle_polygons = foreach_get(mesh.loop_triangles, "polygon_index", 1, np.int32)
+        if loop_order is not None:
+            reordered = np.empty(len(loop_order), dtype=np.int32)
+            reordered[loop_order] = np.arange(len(loop_order), dtype=np.int32)
+            loop_triangles = reordered[loop_triangles]
+
+    return MeshBuffers(
+        positions=foreach_get(mesh.vertices, "co", 3, np.float32),
+        loop_vertices=loops(foreach_get(mesh.loops, "vertex_index", 1, np.int32)),
+        loop_totals=loop_totals,
+        normals=loops(loop_normals(mesh)),
+        uv_layers=uv_layers,
+        material_indices=foreach_get(mesh.polygons, "material_index", 1, np.int32),
+        triangles=loop_triangles,
+        triangle_polygons=triangle_polygons,
+    )
+
+
+# Entries of the post-transform vertex cache triangles are ordered for.
+# Orders for a small cache stay good on larger ones, not the reverse.
+VERTEX_CACHE_SIZE = 16
+
+
+def optimize(buffers):
+    """
+    Return new MeshBuffers for GPU-friendly output. Loops with the
+    same position, normal and UVs are welded into one vertex, and
+    polygons are split into Blender's triangles. Triangles are sorted
+    by material, and each material's triangles are ordered for the
+    vertex cache with Tipsify, then by cluster to reduce overdraw.
+    Vertices are renumbered in order of first use. Each loop keeps
+    its own normal and UVs, so shading is unchanged. Meshes without
+    polygons are returned as is. Buffers must have been extracted
+    with their triangles.
+    """
+    if not len(buffers.loop_totals):
+        return buffers
+
+    # Adding zero turns -0.0 into 0.0, so both weld and write the same
+    zero = np.float32(0.0)
+    positions = buffers.positions[buffers.loop_vertices] + zero
+    normals = buffers.normals + zero
+    uv_layers = [(name, uvs + zero) for name, uvs in buffers.uv_layers]
+
+    # Comparing loops as raw bytes is much faster than np.unique(axis=0)
+    rows = np.ascontiguousarray(np.hstack(
+        [positions, normals] + [uvs for _, uvs in uv_layers]), dtype=np.float32)
+    rows = rows.view(np.dtype((np.void, rows.itemsize * rows.shape[1]))).reshape(-1)
+    _, first_loops, loop_vertices = np.unique(rows, return_index=True, return_inverse=True)
+    loop_vertices = loop_vertices.reshape(-1)
+
+    triangles = buffers.triangles
+    triangle_polygons = buffers.triangle_polygons
+
+    # Welding can collapse triangles
+    corners = loop_vertices[triangles]
+    keep = (corners[:, 0] != corners[:, 1]) & (corners[:, 1] != corners[:, 2]) & \
+        (corners[:, 0] != corners[:, 2])
+    triangles = triangles[keep]
+    material_indices = buffers.material_indices[triangle_polygons[keep]]
+
+    # Sorting along a Morton curve first gives Tipsify a spatially
+    # coherent order to fall back on when it runs out of neighbours
+    corner_positions = positions[triangles]
+    centers = corner_positions.mean(axis=1)
+    order = np.lexsort((morton_codes(centers), material_indices))
+    triangles = triangles[order]
+    material_indices = material_indices[order]
+    centers = centers[order]
+    # Twice the area, along the face normal
+    face_normals = np.cross(corner_positions[order, 1] - corner_positions[order, 0],
+                            corner_positions[order, 2] - corner_positions[order, 0])
+
+    ends = np.append(np.flatnonzero(np.diff(material_indices)) + 1, len(triangles))
+    starts = np.append(0, ends[:-1])
+    order = np.concatenate([
+        start + order_triangles(loop_vertices[triangles[start:end]],
+                                face_normals[start:end], centers[start:end])
+        for start, end in zip(starts, ends)])
+    loops = triangles[order].reshape(-1)
+
+    # Renumber vertices by first use, so vertices are fetched in order
+    vertices = loop_vertices[loops]
+    used, first_use = np.unique(vertices, return_index=True)
+    used = used[np.argsort(first_use)]
+    renumber = np.empty(len(first_loops), dtype=np.int32)
+    renumber[used] = np.arange(len(used), dtype=np.int32)
+
+    return MeshBuffers(
+        positions=positions[first_loops[used]],
+        loop_vertices=renumber[vertices],
+        loop_totals=np.full(len(order), 3, dtype=np.int32),
+        normals=normals[loops],
+        uv_layers=[(name, uvs[loops]) for name, uvs in uv_layers],
+        material_indices=material_indices[order],
+        triangles=np.arange(len(order) * 3, dtype=np.int32).reshape(-1, 3),
+        triangle_polygons=np.arange(len(order), dtype=np.int32),
+    )
+
+
+def order_triangles(corners, face_normals, centers):
+    """
+    Return the order to draw triangles in, given their vertices: for
+    the vertex cache, then with clusters that face outwards first, as
+    they are the likeliest to hide the rest from any direction.
+    """
+    vertices, corners = np.unique(corners, return_inverse=True)
+    order, cluster_starts = tipsify(corners.reshape(-1, 3), len(vertices), VERTEX_CACHE_SIZE)
+    return sort_clusters(order, cluster_starts, face_normals, centers)
+
+
+def tipsify(corners, vertex_count, cache_size):
+    """
+    Order triangles for a vertex cache of `cache_size` entries with
+    Tipsify, from "Fast Triangle Reordering for Vertex Locality and
+    Reduced Overdraw" (Sander, Nehab and Barczak, 2007). It emits
+    every triangle around a fanning vertex, then moves to the
+    neighbour still in cache with the most triangles left. Return the
+    order, and where clusters start: where no neighbour qualified and
+    the cache went cold. Vertices are picked up in index order when
+    nothing else is left, so an order given by the indices helps.
+    """
+    flat = corners.reshape(-1)
+    counts = np.bincount(flat, minlength=vertex_count)
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    # Plain lists are much faster than numpy for one item at a time
+    adjacency = (np.argsort(flat, kind="stable") // 3).tolist()
+    offsets = offsets.tolist()
+    triangles = corners.tolist()
+    live = counts.tolist()
+
+    cache_time = [0] * vertex_count
+    emitted = [False] * len(triangles)
+    dead_ends = []
+    order = []
+    cluster_starts = []
+    time = cache_size + 1
+    cursor = 0
+    fanning = 0
+    cold = True
+    while fanning >= 0:
+        if cold:
+            cluster_starts.append(len(order))
+
+        candidates = []
+        for triangle in adjacency[offsets[fanning]:offsets[fanning + 1]]:
+            if emitted[triangle]:
+                continue
+            emitted[triangle] = True
+            order.append(triangle)
+            for vertex in triangles[triangle]:
+                dead_ends.append(vertex)
+                candidates.append(vertex)
+                live[vertex] -= 1
+                if time - cache_time[vertex] > cache_size:
+                    cache_time[vertex] = time
+                    time += 1
+
+        # Prefer the vertex that stays longest in cache while its fan is emitted
+        fanning = -1
+        best = -1
+        for vertex in candidates:
+            if not live[vertex]:
+                continue
+            priority = 0
+            if time - cache_time[vertex] + 2 * live[vertex] <= cache_size:
+                priority = time - cache_time[vertex]
+            if priority > best:
+                best = priority
+                fanning = vertex
+
+        cold = fanning < 0
+        while fanning < 0 and dead_ends:
+            vertex = dead_ends.pop()
+            if live[vertex]:
+                fanning = vertex
+        while fanning < 0 and cursor < vertex_count:
+            if live[cursor]:
+                fanning = cursor
+            cursor += 1
+
+    return np.array(order, dtype=np.int64), np.array(cluster_starts, dtype=np.int64)
+
+
+def sort_clusters(order, cluster_starts, face_normals, centers):
+    """
+    Sort clusters of triangles by how far they face away from the
+    center of the mesh: the dot product of the offset of their
+    center, weighed by area, with their average normal. Triangles
+    keep their order within a cluster.
+    """
+    if len(cluster_starts) < 2:
+        return order
+
+    face_normals = face_normals[order]
+    areas = np.linalg.norm(face_normals, axis=1)
+    weighted_centers = centers[order] * areas[:, np.newaxis]
+    center = weighted_centers.sum(axis=0) / max(areas.sum(), 1e-12)
+
+    cluster_areas = np.maximum(np.add.reduceat(areas, cluster_starts), 1e-12)
+    cluster_centers = np.add.reduceat(weighted_centers, cluster_starts) / cluster_areas[:, np.newaxis]
+    cluster_normals = np.add.reduceat(face_normals, cluster_starts)
+    cluster_normals /= np.maximum(np.linalg.norm(cluster_normals, axis=1), 1e-12)[:, np.newaxis]
+    outwards = ((cluster_centers - center) * cluster_normals).sum(axis=1)
+
+    cluster_ends = np.append(cluster_starts[1:], len(order))
+    return np.concatenate([order[cluster_starts[idx]:cluster_ends[idx]]
+                           for idx in np.argsort(-outwards, kind="stable")])
+
+
+def morton_codes(points, bits=10):
+    """Return the Morton code of points quantized to 2**bits steps on each axis of their bounds."""
+    lower = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lower, 1e-12)
+    cells = ((points - lower) / extent * ((1 << bits) - 1)).astype(np.uint32)
+
+    def spread(values):
+        values = (values | (values << 16)) & 0x030000FF
+        values = (values | (values << 8)) & 0x0300F00F
+        values = (values | (values << 4)) & 0x030C30C3
+        return (values | (values << 2)) & 0x09249249
+
+    return spread(cells[:, 0]) | (spread(cells[:, 1]) << 1) | (spread(cells[:, 2]) << 2)
+
+
+class EvaluatedMeshCache:
+    """
+    Least recently used cache of evaluated MeshBuffers, keyed
+    by object and the state of its modifier stack, and bounded
+    by the total size of the cached arrays.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        buffers = self.entries.get(key)
+        if buffers is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return buffers
+
+    def put(self, key, buffers):
+        size = buffers.nbytes
+        if size > self.budget_bytes:
+            return
+
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key).nbytes
+        self.entries[key] = buffers
+        self.nbytes += size
+
+        while self.nbytes > self.budget_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+
+# Cache shared by the groups of the export run in progress, if any
+active_cache = None
+
+
+@contextlib.contextmanager
+def batch_cache(budget_bytes):
+    """Share evaluated meshes between all exports inside the block."""
+    global active_cache
+    previous = active_cache
+    active_cache = EvaluatedMeshCache(budget_bytes)
+    try:
+        yield active_cache
+    finally:
+        active_cache.clear()
+        active_cache = previous
+
+
+def modifier_state(obj):
+    """
+    Return a digest of everything that changes the evaluated mesh of
+    an object apart from its own mesh data, which does not change
+    during an export run: its modifier stack, and the transforms of
+    objects the modifiers reference.
+    """
+    digest = hashlib.sha1()
+    cache.update_json(digest, [obj.type, obj.data.name if obj.data else None])
+    for modifier in obj.modifiers:
+        cache.update_rna(digest, modifier)
+        for prop in modifier.bl_rna.properties:
+            target = getattr(modifier, prop.identifier, None) if prop.type == 'POINTER' else None
+            if isinstance(target, bpy.types.Object):
+                cache.update_json(digest, [list(row) for row in target.matrix_world])
+    return digest.hexdigest()
+
+
+def extract_object(obj, depsgraph, apply_modifiers=True, triangles=False):
+    """
+    Read the geometry of an object into MeshBuffers, with its
+    modifiers applied or not, and with `triangles`, its
+    triangulation. Non-mesh geometry like curves and text is always
+    converted through the depsgraph.
+
+    Inside batch_cache(), evaluated meshes are reused by every
+    group that exports the same object.
+    """
+    if obj.type == 'MESH' and not apply_modifiers:
+        return extract_mesh(obj.data, triangles)
+
+    if active_cache is None:
+        return evaluate_object(obj, depsgraph, triangles)
+
+    key = (obj.name, modifier_state(obj), triangles)
+    buffers = active_cache.get(key)
+    if buffers is None:
+        buffers = evaluate_object(obj, depsgraph, triangles)
+        if buffers is not None:
+            active_cache.put(key, buffers)
+    return buffers
+
+
+def evaluate_object(obj, depsgraph, triangles=False):
+    obj_eval = obj.evaluated_get(depsgraph)
+    mesh = obj_eval.to_mesh()
+    try:
+        if mesh is None:
+            return None
+        return extract_mesh(mesh, triangles)
+    finally:
+        obj_eval.to_mesh_clear()
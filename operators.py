@@ -17,12 +17,29 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import bpy
+import cProfile
+import contextlib
+import functools
+import math
 import os
 import re
+import time
 
+from . import cache
 from . import helpers
+from . import lods
+from . import memory
+from . import output
+from . import report
+from . import rules
+from . import shard
+from . import validity
+from . import watch
 from . properties import PreflightExportGroup
 
+# Temporary collection used to pass a group's objects to the exporter
+EXPORT_COLLECTION_NAME = ".preflight_export"
+
 
 class PF_OT_add_selection_to_preflight_group(bpy.types.Operator):
     bl_idname = "preflight.add_selection_to_group"
@@ -33,12 +50,13 @@ class PF_OT_add_selection_to_preflight_group(bpy.types.Operator):
 
     def execute(self, context):
         if self.group_idx is not None:
+            group_names = context.scene.preflight_props.fbx_export_groups[
+                self.group_idx].obj_names
             for idx, obj in enumerate(context.selected_objects):
-                group_names = context.scene.preflight_props.fbx_export_groups[
-                    self.group_idx].obj_names
                 item = group_names.add()
                 item.obj_pointer = obj
 
+            validity.invalidate()
             helpers.redraw_properties()
         else:
             message = 'Group Index is not Set'
@@ -78,6 +96,7 @@ class PF_OT_create_preflight_group_from_selection(bpy.types.Operator):
                 item = new_group.obj_names.add()
                 item.obj_pointer = obj
 
+            validity.invalidate()
             helpers.redraw_properties()
         else:
             message = 'Group Name is not Set'
@@ -98,6 +117,7 @@ class PF_OT_add_preflight_object_operator(bpy.types.Operator):
         if self.group_idx is not None:
             context.scene.preflight_props.fbx_export_groups[
                 self.group_idx].obj_names.add()
+            validity.invalidate()
             helpers.redraw_properties()
 
         return {'FINISHED'}
@@ -115,6 +135,7 @@ class PF_OT_remove_preflight_object_operator(bpy.types.Operator):
         if self.group_idx is not None and self.object_idx is not None:
             context.scene.preflight_props.fbx_export_groups[
                 self.group_idx].obj_names.remove(self.object_idx)
+            validity.invalidate()
             helpers.redraw_properties()
 
         return {'FINISHED'}
@@ -140,6 +161,7 @@ class PF_OT_add_preflight_export_group_operator(bpy.types.Operator):
         groups = context.scene.preflight_props.fbx_export_groups
         new_group = groups.add()
         new_group.name = self.group_name
+        validity.invalidate()
         helpers.redraw_properties()
         return {'FINISHED'}
 
@@ -155,40 +177,13 @@ class PF_OT_remove_preflight_export_group_operator(bpy.types.Operator):
         if self.group_idx is not None:
             context.scene.preflight_props.fbx_export_groups.remove(
                 self.group_idx)
+            validity.invalidate()
             helpers.redraw_properties()
         return {'FINISHED'}
 
 
-class PF_OT_export_mesh_group_operator(bpy.types.Operator):
-    bl_idname = "preflight.export_single_group"
-    bl_label = "Export Single Group"
-    bl_description = "Export a single group to the chosen export destination."
-
-    group_idx: bpy.props.IntProperty()
-
-    def execute(self, context):
-        # SANITY CHECK
-        if not bpy.data.is_saved:
-            self.report({'ERROR'}, "File must be saved before exporting.")
-            return {'CANCELLED'}
-
-        if self.group_idx is None:
-            self.report({'ERROR', "Must export a valid group."})
-            return {'CANCELLED'}
-
-        group = context.scene.preflight_props.fbx_export_groups[self.group_idx]
-
-        # DO GROUP EXPORT
-        try:
-            self.export_group(group, context)
-            self.report(
-                {'INFO'}, "Exported Group {0} Successfully.".format(group.name))
-            return {'FINISHED'}
-        except Exception as e:
-            print(e)
-            self.report(
-                {'ERROR'}, "There was an error while exporting: {0}.".format(group.name))
-            return {'CANCELLED'}
+class ExportObjectsMixin:
+    """Shared by operators that pass a set of objects to an exporter."""
 
     def select_objects(self, objects, append_selection=False):
         """
@@ -219,24 +214,132 @@ class PF_OT_export_mesh_group_operator(bpy.types.Operator):
 
         return hidden_states
 
-    def export_objects(self, objects, filepath, **kwargs):
-        # Unhide all objects and store their original hidden state
-        original_hide_values = self.toggle_hide_for_objects(
-            objects, hide_state=False)
+    def export_objects(self, objects, filepath, backend='FBX', **kwargs):
+        # Use the fast writer for groups it supports. It is only
+        # imported once selected, to keep add-on startup light.
+        writer = load_fast_writer() if backend == 'FAST' else None
+        if output.active_writer is not None:
+            return self.export_objects_behind(objects, filepath, writer, **kwargs)
+
+        # Write next to the destination, which is only replaced when
+        # the bytes differ, so unchanged files keep their mtime.
+        with output.staged_write(filepath) as staged:
+            if writer is not None and writer.can_export(objects, kwargs):
+                stats = writer.export(
+                    objects, staged.path, bpy.context.evaluated_depsgraph_get(),
+                    **fast_writer_options(kwargs))
+                report.add_counts(vertices=stats["vertices"], polygons=stats["polygons"])
+            elif exporter_supports_active_collection():
+                self.export_objects_in_collection(objects, staged.path, **kwargs)
+            else:
+                self.export_selected_objects(objects, staged.path, **kwargs)
 
-        # Select Objects
-        self.select_objects(objects)
+        if staged.changed is False:
+            report.add_counts(unchanged=1)
+        if os.path.exists(filepath):
+            report.add_counts(bytes=os.path.getsize(filepath))
+
+    def export_objects_behind(self, objects, filepath, writer, **kwargs):
+        """
+        Export objects and leave writing the file to the active
+        write-behind pool. Its outcome is counted once the job is done.
+        """
+        if writer is not None and writer.can_export(objects, kwargs):
+            data, stats = writer.encode(
+                objects, bpy.context.evaluated_depsgraph_get(), **fast_writer_options(kwargs))
+            report.add_counts(vertices=stats["vertices"], polygons=stats["polygons"])
+            output.active_writer.write(filepath, data)
+            return
+
+        staged = output.StagedFile(filepath)
+        os.makedirs(os.path.dirname(staged.path), exist_ok=True)
+        try:
+            if exporter_supports_active_collection():
+                self.export_objects_in_collection(objects, staged.path, **kwargs)
+            else:
+                self.export_selected_objects(objects, staged.path, **kwargs)
+        except BaseException:
+            staged.discard()
+            raise
+        if os.path.exists(staged.path):
+            output.active_writer.commit(staged)
+
+    def export_selected_objects(self, objects, filepath, **kwargs):
+        """
+        Export objects by selecting them, for exporters that can
+        only limit the export to the selection.
+        """
+        with report.stage("visibility"):
+            # Unhide all objects and store their original hidden state
+            original_hide_values = self.toggle_hide_for_objects(
+                objects, hide_state=False)
+
+            # Select Objects
+            self.select_objects(objects)
+
+        with report.stage("evaluation"):
+            count_evaluated_objects(objects)
 
         # Do Export
-        export_opts = kwargs
-        export_opts['filepath'] = filepath
-        bpy.ops.export_scene.fbx(**export_opts)
+        with report.stage("write"):
+            export_opts = kwargs
+            export_opts['filepath'] = filepath
+            bpy.ops.export_scene.fbx(**export_opts)
 
-        # Reset to original hide states
-        self.toggle_hide_for_objects(objects, values=original_hide_values)
+        with report.stage("visibility"):
+            # Reset to original hide states
+            self.toggle_hide_for_objects(objects, values=original_hide_values)
 
-        # Deselect Objects
-        bpy.ops.object.select_all(action='DESELECT')
+            # Deselect Objects
+            bpy.ops.object.select_all(action='DESELECT')
+
+    def export_objects_in_collection(self, objects, filepath, **kwargs):
+        """
+        Export objects by linking them into a temporary collection
+        that is made active for the exporter, so the selection and
+        the rest of the scene are left untouched.
+        """
+        for obj in objects:
+            if obj is None:
+                message = error_message_for_obj_name()
+                self.report({'ERROR'}, message)
+                raise ValueError(message)
+
+        objects = list({obj.name: obj for obj in objects}.values())
+        view_layer = bpy.context.view_layer
+        original_active = view_layer.active_layer_collection
+        collection = bpy.data.collections.new(EXPORT_COLLECTION_NAME)
+        bpy.context.scene.collection.children.link(collection)
+
+        # Objects disabled in viewports are not evaluated, so their
+        # modifiers would not be applied by the exporter.
+        disabled_objects = [obj for obj in objects if obj.hide_viewport]
+
+        try:
+            with report.stage("visibility"):
+                for obj in objects:
+                    collection.objects.link(obj)
+                for obj in disabled_objects:
+                    obj.hide_viewport = False
+
+                view_layer.active_layer_collection = \
+                    view_layer.layer_collection.children[collection.name]
+
+            with report.stage("evaluation"):
+                count_evaluated_objects(objects)
+
+            with report.stage("write"):
+                export_opts = dict(kwargs)
+                export_opts['filepath'] = filepath
+                export_opts['use_selection'] = False
+                export_opts['use_active_collection'] = True
+                bpy.ops.export_scene.fbx(**export_opts)
+        finally:
+            with report.stage("visibility"):
+                for obj in disabled_objects:
+                    obj.hide_viewport = True
+                view_layer.active_layer_collection = original_active
+                bpy.data.collections.remove(collection)
 
     def export_group(self, group, context):
         """
@@ -244,32 +347,132 @@ class PF_OT_export_mesh_group_operator(bpy.types.Operator):
         included objects.
         """
 
-        # Deselect all objects
-        bpy.ops.object.select_all(action='DESELECT')
+        with report.stage("validation"):
+            # Validate that we have objects
+            message = rules.rule_error(group)
+            if message:
+                self.report({'WARNING'}, message)
+                raise ValueError(message)
+
+            export_objects = objects_for_group(group, context)
+            if len(export_objects) < 1:
+                message = "Must have at least 1 mesh to export group."
+                self.report({'WARNING'}, message)
+                raise ValueError(message)
 
-        # Validate that we have objects
-        if len(group.obj_names) < 1:
-            message = "Must have at least 1 mesh to export group."
-            self.report({'WARNING'}, message)
-            raise ValueError(message)
+            # Directories are created where the file is staged, on the
+            # I/O threads for a write-behind export
+            export_path = export_path_for_group(group, context)
 
-        # Validate export path
-        export_dir = context.scene.preflight_props.export_options.export_location
-        export_path = export_path_for_string(
-            group.name, export_dir, subdir=group.export_location)
-        if not ensure_export_path(export_path):
-            raise ValueError("Invalid Export Path")
+            export_options = options_for_group(group, context)
+            backend = context.scene.preflight_props.export_options.export_backend
+            if lods.is_enabled(group):
+                lods.levels(group)
 
         # Export files
-        export_objects = [context.scene.objects.get(
-            obj.obj_pointer.name) for obj in group.obj_names]
 
-        export_options = context.scene.preflight_props.export_options.get_options_dict(
-            bake_anim=group.include_animations,
-            use_mesh_modifiers=group.apply_modifiers
-        )
+        if shard.is_sharded(group):
+            self.export_shards(group, export_objects, export_path,
+                               backend=backend, **export_options)
+        else:
+            self.export_group_objects(group, export_objects, export_path,
+                                      backend=backend, **export_options)
+
+    def export_group_objects(self, group, objects, filepath, backend='FBX', **kwargs):
+        """Export objects of a group, as LOD chains if the group generates LODs."""
+        if not lods.is_enabled(group):
+            return self.export_objects(objects, filepath, backend=backend, **kwargs)
 
-        self.export_objects(export_objects, export_path, **export_options)
+        with lods.lod_chain(objects, lods.levels(group), lods.cache_dir(bpy.context),
+                            apply_modifiers=kwargs.get("use_mesh_modifiers", True)) as lod_objects:
+            # Screen sizes are custom properties of the LOD objects
+            self.export_objects(lod_objects, filepath, backend=backend,
+                                **dict(kwargs, use_custom_props=True))
+
+    def export_shards(self, group, objects, index_path, backend='FBX', **kwargs):
+        """
+        Export a sharded group as one file per cell of its grid or
+        octree, then write the index listing the cells and their bounds.
+        """
+        for obj in objects:
+            if obj is None:
+                message = error_message_for_obj_name()
+                self.report({'ERROR'}, message)
+                raise ValueError(message)
+
+        objects = list({obj.name: obj for obj in objects}.values())
+        with report.stage("shard"):
+            cells = shard.build_cells(objects, group)
+
+        for cell in cells:
+            self.export_group_objects(group, [objects[idx] for idx in cell.members],
+                                      shard.cell_path(index_path, cell.name),
+                                      backend=backend, **kwargs)
+
+        with report.stage("flush"):
+            output.write_output(
+                index_path, shard.encode_index(group, cells, objects, index_path, kwargs))
+        report.add_counts(cells=len(cells))
+
+    def export_clip(self, context, armature, action):
+        """
+        Export an armature with only one action assigned, baked
+        over the frame range of that action.
+        """
+        with report.stage("validation"):
+            export_path = export_path_for_clip(armature, action, context)
+
+        scene = context.scene
+        animation_data = armature.animation_data or armature.animation_data_create()
+        original_action = animation_data.action
+        original_use_nla = animation_data.use_nla
+        original_range = (scene.frame_start, scene.frame_end)
+
+        try:
+            animation_data.action = action
+            animation_data.use_nla = False
+            frame_start, frame_end = action.frame_range
+            scene.frame_start = int(frame_start)
+            scene.frame_end = max(int(math.ceil(frame_end)), scene.frame_start)
+
+            self.export_objects([armature], export_path,
+                                **options_for_clip(context))
+        finally:
+            scene.frame_start, scene.frame_end = original_range
+            animation_data.use_nla = original_use_nla
+            animation_data.action = original_action
+
+
+class PF_OT_export_mesh_group_operator(ExportObjectsMixin, bpy.types.Operator):
+    bl_idname = "preflight.export_single_group"
+    bl_label = "Export Single Group"
+    bl_description = "Export a single group to the chosen export destination."
+
+    group_idx: bpy.props.IntProperty()
+
+    def execute(self, context):
+        # SANITY CHECK
+        if not bpy.data.is_saved:
+            self.report({'ERROR'}, "File must be saved before exporting.")
+            return {'CANCELLED'}
+
+        if self.group_idx is None:
+            self.report({'ERROR', "Must export a valid group."})
+            return {'CANCELLED'}
+
+        group = context.scene.preflight_props.fbx_export_groups[self.group_idx]
+
+        # DO GROUP EXPORT
+        try:
+            self.export_group(group, context)
+            self.report(
+                {'INFO'}, "Exported Group {0} Successfully.".format(group.name))
+            return {'FINISHED'}
+        except Exception as e:
+            print(e)
+            self.report(
+                {'ERROR'}, "There was an error while exporting: {0}.".format(group.name))
+            return {'CANCELLED'}
 
     def export_animations(self, context):
         """
@@ -285,70 +488,588 @@ class PF_OT_export_mesh_group_operator(bpy.types.Operator):
             export_dir = context.scene.preflight_props.export_options.export_location
             export_path = export_path_for_string(
                 obj.name, export_dir, suffix="@animations")
-            if not ensure_export_path(export_path):
-                raise ValueError("Invalid Export Path")
             self.export_objects([obj], export_path, **export_options)
 
 
-class PF_OT_export_mesh_groups_operator(bpy.types.Operator):
+class PF_OT_export_animation_clip_operator(ExportObjectsMixin, bpy.types.Operator):
+    bl_idname = "preflight.export_animation_clip"
+    bl_label = "Export Animation Clip"
+    bl_description = "Export a single action of an armature to its own clip file."
+
+    clip_name: bpy.props.StringProperty(
+        description="Name of the clip to export, as Armature@Action.")
+
+    def execute(self, context):
+        # SANITY CHECK
+        if not bpy.data.is_saved:
+            self.report({'ERROR'}, "File must be saved before exporting.")
+            return {'CANCELLED'}
+
+        clip = animation_clip_for_name(context, self.clip_name)
+        if clip is None:
+            self.report({'ERROR'}, "Unknown animation clip: {0}.".format(self.clip_name))
+            return {'CANCELLED'}
+
+        # DO CLIP EXPORT
+        try:
+            self.export_clip(context, *clip)
+            self.report(
+                {'INFO'}, "Exported Clip {0} Successfully.".format(self.clip_name))
+            return {'FINISHED'}
+        except Exception as e:
+            print(e)
+            self.report(
+                {'ERROR'}, "There was an error while exporting: {0}.".format(self.clip_name))
+            return {'CANCELLED'}
+
+
+class ExportUnit:
+    """A group or clip of an export run, until its files are written."""
+
+    def __init__(self, count, name, export_path, time_start):
+        self.count = count
+        self.name = name
+        self.export_path = export_path
+        self.time_start = time_start
+        self.timings = report.GroupTimings()
+        self.status = report.EXPORTED
+        self.fingerprint = None
+        self.description = {}
+        # Time spent on the main thread, before its files were written
+        self.seconds = 0.0
+        self.futures = []
+
+
+class PF_OT_export_mesh_groups_operator(ExportObjectsMixin, bpy.types.Operator):
     bl_idname = "preflight.export_all_groups"
     bl_label = "Export All Groups"
     bl_description = "Export all export groups to the chosen export destination."
 
+    group_names: bpy.props.CollectionProperty(
+        type=bpy.types.PropertyGroup,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Only export the groups with these names. Exports all groups when empty.")
+    clip_names: bpy.props.CollectionProperty(
+        type=bpy.types.PropertyGroup,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Only export the animation clips with these names, as Armature@Action.")
+    report_path: bpy.props.StringProperty(
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Write a JSON report of the export run to this path.")
+    profile_dir: bpy.props.StringProperty(
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Write a cProfile dump of each exported group to this directory.")
+    memory_handoff: bpy.props.BoolProperty(
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Report groups that would exceed the memory limit as deferred, for the caller to export in a fresh process.")
+
     @classmethod
     def poll(cls, context):
         """
         Poll for ability to perform export. Only return
-        true if there is at least 1 group, and all objects
-        in export groups are set.
+        true if all objects in export groups are set. Files
+        without groups may still export animation clips,
+        which begin() checks for.
         """
+        return validity.for_scene(context.scene).exportable or \
+            not context.scene.preflight_props.fbx_export_groups
 
-        groups = context.scene.preflight_props.fbx_export_groups
-
-        if len(groups) < 1:
-            return False
+    def invoke(self, context, event):
+        """
+        Export from the UI one group per timer tick, so progress is
+        drawn between groups and Esc cancels the rest of the batch.
+        """
+        with self.closing_on_error(context):
+            if not self.begin(context):
+                return {'CANCELLED'}
 
-        for group in groups:
-            if len(group.obj_names) < 1:
-                return False
+        window_manager = context.window_manager
+        window_manager.progress_begin(0, len(self.export_units))
+        self.timer = window_manager.event_timer_add(0.001, window=context.window)
+        window_manager.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC' and event.value == 'PRESS':
+            self.cancelled = True
+            with self.closing_on_error(context):
+                return self.end(context)
+
+        if event.type == 'TIMER':
+            with self.closing_on_error(context):
+                if not self.step(context):
+                    return self.end(context)
+            self.show_progress(context)
+            return {'RUNNING_MODAL'}
+
+        # Let the view be navigated, but keep edits out of a running batch
+        if event.type in NAVIGATION_EVENTS:
+            return {'PASS_THROUGH'}
+        return {'RUNNING_MODAL'}
 
-            for obj in group.obj_names:
-                if not obj.obj_pointer:
-                    return False
+    def execute(self, context):
+        with self.closing_on_error(context):
+            if not self.begin(context):
+                return {'CANCELLED'}
 
-        return True
+            while self.step(context):
+                pass
+            return self.end(context)
 
-    def execute(self, context):
+    @contextlib.contextmanager
+    def closing_on_error(self, context):
+        """
+        Close the caches, I/O threads and scene index the batch holds
+        open, and stop drawing its progress, if the block raises.
+        Otherwise only end() closes them.
+        """
+        try:
+            yield
+        except BaseException:
+            exit_stack = getattr(self, "exit_stack", None)
+            if exit_stack is not None:
+                exit_stack.close()
+            self.remove_progress(context)
+            raise
+
+    def begin(self, context):
+        """Check the scene and set up the export run. Return false if it cannot run."""
         # SETUP
         groups = context.scene.preflight_props.fbx_export_groups
 
         # SAFETY CHECK
+        if not bpy.data.is_saved:
+            self.report({'ERROR'}, "File must be saved before exporting.")
+            return False
+
         if not helpers.groups_are_unique(groups):
             self.report(
                 {'WARNING'}, "Cannot export with duplicate group names.")
-            return {'CANCELLED'}
+            return False
+
+        # Clips are looked up by name for every export and plan of the run
+        self.exit_stack = contextlib.ExitStack()
+        self.exit_stack.enter_context(clip_index(context))
+        selected_groups, selected_clips = export_selection(
+            context, [item.name for item in self.group_names],
+            [item.name for item in self.clip_names])
 
-        if len(groups) < 1:
+        if not selected_groups and not selected_clips:
+            self.exit_stack.close()
             self.report(
-                {'WARNING'}, "Must have at least 1 export group to export files.")
-            return {'CANCELLED'}
+                {'WARNING'}, "Must have at least 1 export group or animation clip to export files.")
+            return False
 
-        # DO GROUP EXPORT
-        for group_idx, group in enumerate(groups):
-            try:
-                bpy.ops.preflight.export_single_group(group_idx=group_idx)
-                # self.export_group(group, context)
-                self.report({'INFO'}, "Exported Group {0} of {1} Successfully.".format(
-                    group_idx+1, len(groups)))
-            except Exception as e:
-                print(e)
-                self.report(
-                    {'ERROR'}, "There was an error while exporting: {0}.".format(group.name))
-                return {'CANCELLED'}
+        # Groups and clips are exported by calling the export logic
+        # directly, not through nested operators, which would each pay
+        # for an operator dispatch.
+        self.export_units = []
+        for group_idx, group in selected_groups:
+            self.export_units.append((
+                group.name,
+                export_path_for_group(group, context),
+                functools.partial(fingerprint_for_group, group, context),
+                functools.partial(self.export_group, group, context),
+                functools.partial(describe_group, group, context)))
+
+        for armature, action in selected_clips:
+            self.export_units.append((
+                clip_name(armature, action),
+                export_path_for_clip(armature, action, context),
+                functools.partial(fingerprint_for_clip, armature, action, context),
+                functools.partial(self.export_clip, context, armature, action),
+                functools.partial(describe_clip, armature, action, context)))
+
+        export_options = context.scene.preflight_props.export_options
+        self.export_cache = None
+        if export_options.use_export_cache:
+            self.export_cache = cache.ExportCache.load(
+                export_options.export_location)
+
+        self.output_manifest = output.OutputManifest.load(export_options.export_location)
+        self.export_report = report.ExportReport(blendfile=bpy.data.filepath)
+        self.time_start = time.time()
+        self.position = 0
+        self.cancelled = False
+        self.error = None
+
+        # Units left to export, by index, in the order to export them
+        self.queue = list(range(len(self.export_units)))
+        self.memory_limit = 0
+        self.vertex_cost = memory.VertexCost(export_options.memory_per_vertex)
+        self.deferred = set()
+        self.exported = 0
+
+        # Rule-based groups resolve against one index for the whole batch
+        scene_index = self.exit_stack.enter_context(rules.scene_index(context.scene))
+        self.export_report.add_stats(
+            "scene_index", seconds=scene_index.seconds, objects=len(scene_index.objects))
+        if export_options.low_memory:
+            self.order_for_memory(context, selected_groups, selected_clips)
+
+        # Caches last for the whole batch, across modal steps
+        mesh_cache_budget = export_options.mesh_cache_size * 1024 * 1024
+        self.mesh_cache = self.exit_stack.enter_context(
+            load_mesh_data().batch_cache(mesh_cache_budget))
+        # Files are written in the background while the next group is evaluated
+        self.pending_units = []
+        self.writer = self.exit_stack.enter_context(output.write_behind(
+            export_options.io_threads, export_options.io_queue_size * 1024 * 1024))
+        self.lod_cache = self.exit_stack.enter_context(
+            lods.batch_cache(lods.cache_dir(context)))
+        return True
+
+    def step(self, context):
+        """Export the next group or clip. Return false once the batch is over."""
+        self.complete_units()
+        if self.cancelled or self.error or not self.queue:
+            return False
+
+        index = self.queue.pop(0)
+        if not self.has_memory_for(index):
+            return True
+
+        count = self.position
+        self.position += 1
+        name, export_path, fingerprint_unit, export_unit, describe_unit = self.export_units[index]
+        export_cache = self.export_cache
+        low_memory = context.scene.preflight_props.export_options.low_memory
+
+        unit = ExportUnit(count, name, export_path, time.time())
+        timings = unit.timings
+        try:
+            if export_cache is not None:
+                with timings.stage("fingerprint"):
+                    unit.fingerprint = fingerprint_unit()
+                if export_cache.is_current(name, unit.fingerprint, export_path):
+                    unit.status = report.CACHED
+                    unit.description = describe_unit()
+                    self.pending_units.append(unit)
+                    return True
+
+            group_memory = memory.GroupMemory(track_meshes=low_memory)
+            with report.record_timings(timings):
+                self.run_export(name, export_unit)
+            self.exported += 1
+
+            unit.description = describe_unit()
+            peak = group_memory.peak()
+            if peak is not None:
+                timings.counts["peak_rss"] = peak
+            if low_memory:
+                self.vertex_cost.measure(self.vertices[index], group_memory.growth())
+                self.mesh_cache.clear()
+                self.lod_cache.clear()
+                self.export_report.add_stats("memory", freed_meshes=group_memory.free())
+            if self.writer is not None:
+                unit.futures = self.writer.take_unit_futures()
+        except Exception as e:
+            print(e)
+            self.error = e
+            # Earlier groups still being written are reported first
+            self.complete_units(wait=True)
+            self.export_report.add_group(
+                name, report.FAILED, time.time() - unit.time_start,
+                export_path, error=str(e), timings=timings)
+            return False
+
+        unit.seconds = time.time() - unit.time_start
+        self.pending_units.append(unit)
+        return True
+
+    def order_for_memory(self, context, groups, clips):
+        """
+        Count the vertices of each unit's meshes, and export the
+        largest first. This does not lower the peak of a run that
+        frees everything between groups, as each group starts from
+        the same memory. Memory that stays behind adds to the groups
+        after it, so the largest group is exported before any has
+        built up. Measuring the largest groups first also calibrates
+        the memory estimates of the rest for the limit.
+        """
+        export_options = context.scene.preflight_props.export_options
+        self.vertices = [memory.count_vertices(objects_for_group(group, context))
+                         for _, group in groups]
+        self.vertices += [memory.count_vertices([armature]) for armature, _ in clips]
+        self.queue.sort(key=lambda index: self.vertices[index], reverse=True)
+        self.memory_limit = export_options.memory_limit * 1024 * 1024
+
+    def has_memory_for(self, index):
+        """
+        Check a unit fits under the memory limit. Units that do not
+        are moved to the end of the run, once everything else is
+        freed. If they still do not fit, they are left to a fresh
+        process when `memory_handoff` is set, or exported anyway.
+        """
+        if not self.memory_limit or memory.fits(
+                self.vertex_cost.estimate(self.vertices[index]), self.memory_limit):
+            return True
+
+        name, export_path = self.export_units[index][:2]
+        if index not in self.deferred and self.queue:
+            self.deferred.add(index)
+            self.queue.append(index)
+            return False
+
+        # A process that exported nothing yet is as fresh as it gets
+        if self.memory_handoff and self.exported:
+            unit = ExportUnit(self.position, name, export_path, time.time())
+            unit.status = report.DEFERRED
+            self.position += 1
+            self.pending_units.append(unit)
+            return False
+
+        self.report({'WARNING'}, "Exporting {0} may exceed the memory limit.".format(name))
+        return True
+
+    def complete_units(self, wait=False):
+        """
+        Record the groups whose files are written, in export order.
+        With `wait`, wait for the ones still being written.
+        """
+        while self.pending_units:
+            unit = self.pending_units[0]
+            if not wait and not all(future.done() for future in unit.futures):
+                return
+            self.pending_units.pop(0)
+            self.complete_unit(unit)
+
+    def complete_unit(self, unit):
+        export_report = self.export_report
+        timings = unit.timings
+        total = len(self.export_units)
+
+        if unit.status == report.DEFERRED:
+            export_report.add_group(
+                unit.name, report.DEFERRED, 0.0, unit.export_path,
+                error="Left to a fresh process, to stay under the memory limit.")
+            return
+
+        if unit.status == report.CACHED:
+            with timings.stage("manifest"):
+                self.record_outputs(unit, 0.0, cached=True)
+            export_report.add_group(
+                unit.name, report.CACHED, time.time() - unit.time_start,
+                unit.export_path, timings=timings)
+            self.report({'INFO'}, "Skipped Unchanged {0} ({1} of {2}).".format(
+                unit.name, unit.count+1, total))
+            return
+
+        seconds = unit.seconds
+        try:
+            for future in unit.futures:
+                written = future.result()
+                timings.stages["flush"] = timings.stages.get("flush", 0.0) + written["seconds"]
+                timings.add_counts(bytes=written["bytes"])
+                if not written["changed"]:
+                    timings.add_counts(unchanged=1)
+                seconds += written["seconds"]
+        except Exception as e:
+            print(e)
+            self.error = e
+            export_report.add_group(
+                unit.name, report.FAILED, seconds, unit.export_path,
+                error=str(e), timings=timings)
+            return
+
+        if self.export_cache is not None:
+            self.export_cache.record(unit.name, unit.fingerprint, unit.export_path)
+
+        with timings.stage("manifest"):
+            self.record_outputs(unit, seconds)
+        export_report.add_group(
+            unit.name, report.EXPORTED, seconds, unit.export_path, timings=timings)
+        self.report({'INFO'}, "Exported {0} ({1} of {2}) Successfully.".format(
+            unit.name, unit.count+1, total))
+
+    def record_outputs(self, unit, seconds, cached=False):
+        """Add the files of a unit to the output manifest, cells of sharded groups included."""
+        description = dict(unit.description)
+        for path, objects in shard.outputs(unit.export_path, description.pop("objects", ())):
+            self.output_manifest.record(
+                unit.name, path, seconds, objects=objects, cached=cached, **description)
+
+    def show_progress(self, context):
+        """Update the progress bar and show the estimated time left in the status bar."""
+        done = self.position
+        total = len(self.export_units)
+        context.window_manager.progress_update(done)
+
+        elapsed = time.time() - self.time_start
+        remaining = elapsed / done * (total - done) if done else 0.0
+        context.workspace.status_text_set(
+            "Preflight: Exported {0} of {1}, about {2:.0f}s left. Press Esc to cancel.".format(
+                done, total, remaining))
+
+    def end(self, context):
+        # Files already handed to the I/O threads are written, even when cancelled
+        if self.writer is not None:
+            self.writer.drain()
+        self.complete_units(wait=True)
+        if self.writer is not None:
+            self.export_report.add_stats("io", **self.writer.stats())
+        self.add_memory_stats()
+        self.exit_stack.close()
+        self.remove_progress(context)
 
         # FINISH
+        self.finish(context)
+        export_cache = self.export_cache
+        export_report = self.export_report
+
+        if self.error is not None:
+            name = export_report.failed[0]["name"]
+            self.report(
+                {'ERROR'}, "There was an error while exporting: {0}.".format(name))
+            return {'CANCELLED'}
+
+        if self.cancelled:
+            self.report({'WARNING'}, "Export Cancelled after {0} of {1} Files.".format(
+                len(export_report.groups), len(self.export_units)))
+            return {'CANCELLED'}
+
+        if context.scene.preflight_props.export_options.watch_exports and \
+                not (self.group_names or self.clip_names):
+            # Everything was just exported, so re-export on save starts clean
+            watch.snapshot(context)
+
+        if export_cache is not None:
+            self.report({'INFO'}, "Export Cache: {0} hits, {1} misses.".format(
+                export_cache.hits, export_cache.misses))
+
+        if self.mesh_cache.hits:
+            self.report({'INFO'}, "Evaluated Mesh Cache: {0} hits, {1} misses.".format(
+                self.mesh_cache.hits, self.mesh_cache.misses))
+
+        unchanged = export_report.stats["output"]["unchanged"]
+        if unchanged:
+            self.report({'INFO'}, "Left {0} Unchanged Files Untouched.".format(unchanged))
+
+        deferred = export_report.count(report.DEFERRED)
+        if deferred:
+            self.report({'INFO'}, "Deferred {0} Groups to a Fresh Process.".format(deferred))
+
         self.report(
-            {'INFO'}, "Exported {0} Groups Successfully.".format(len(groups)))
+            {'INFO'}, "Exported {0} Files Successfully.".format(len(self.export_units) - deferred))
+        return {'FINISHED'}
+
+    def remove_progress(self, context):
+        if getattr(self, "timer", None) is not None:
+            context.window_manager.event_timer_remove(self.timer)
+            context.window_manager.progress_end()
+            context.workspace.status_text_set(None)
+            self.timer = None
+
+    def add_memory_stats(self):
+        peaks = [group["counts"]["peak_rss"] for group in self.export_report.groups
+                 if "peak_rss" in group.get("counts", {})]
+        if peaks or self.memory_limit:
+            self.export_report.add_stats(
+                "memory", peak_rss=max(peaks, default=0), limit=self.memory_limit,
+                deferred=self.export_report.count(report.DEFERRED))
+
+    def run_export(self, name, export_unit):
+        """Run one export, under cProfile when a profile directory is set."""
+        if not self.profile_dir:
+            return export_unit()
+
+        profile_dir = bpy.path.abspath(self.profile_dir)
+        if not os.path.exists(profile_dir):
+            os.makedirs(profile_dir)
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(export_unit)
+        finally:
+            profiler.dump_stats(os.path.join(
+                profile_dir, bpy.path.clean_name(name) + ".prof"))
+
+    def finish(self, context):
+        """
+        Persist the export cache and the output manifest, and write
+        the run report, if requested.
+        """
+        export_cache = self.export_cache
+        output_manifest = self.output_manifest
+        mesh_cache = self.mesh_cache
+        export_report = self.export_report
+
+        expected = set(expected_outputs(context))
+        expected.update((unit[0], unit[1]) for unit in self.export_units)
+        # A run limited to some groups and clips, or to those a partial
+        # load brought in, only orphans their files
+        from . import manifest
+        scope = None
+        if self.group_names or self.clip_names or context.scene.get(manifest.PARTIAL_PROPERTY):
+            scope = set(unit[0] for unit in self.export_units)
+        statuses = [entry["status"] for entry in output_manifest.updated.values()]
+        if output_manifest.save(expected, scope):
+            export_report.add_stats(
+                "output_manifest", new=statuses.count(output.NEW),
+                changed=statuses.count(output.CHANGED),
+                unchanged=statuses.count(output.UNCHANGED),
+                orphaned=output_manifest.orphaned)
+
+        if export_cache is not None:
+            export_cache.save()
+            export_report.add_stats(
+                "export_cache", hits=export_cache.hits, misses=export_cache.misses)
+
+        # Only the fast exporter reads evaluated meshes through the cache
+        if context.scene.preflight_props.export_options.export_backend == 'FAST':
+            export_report.add_stats(
+                "mesh_cache", hits=mesh_cache.hits, misses=mesh_cache.misses)
+        if self.lod_cache.hits or self.lod_cache.misses or self.lod_cache.pruned:
+            export_report.add_stats(
+                "lod_cache", hits=self.lod_cache.hits, misses=self.lod_cache.misses,
+                pruned=self.lod_cache.pruned)
+
+        unchanged = len([group for group in export_report.groups
+                         if group.get("counts", {}).get("unchanged")])
+        export_report.add_stats(
+            "output", written=export_report.count(report.EXPORTED) - unchanged,
+            unchanged=unchanged)
+
+        export_report.seconds = time.time() - self.time_start
+        if self.report_path:
+            export_report.write(bpy.path.abspath(self.report_path))
+
+
+class PF_OT_plan_exports_operator(bpy.types.Operator):
+    bl_idname = "preflight.plan_exports"
+    bl_label = "Plan Export"
+    bl_description = "List what Export All Groups would write, with estimated costs, without exporting anything."
+
+    group_names: bpy.props.CollectionProperty(
+        type=bpy.types.PropertyGroup,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Only plan the groups with these names. Plans all groups when empty.")
+    clip_names: bpy.props.CollectionProperty(
+        type=bpy.types.PropertyGroup,
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Only plan the animation clips with these names, as Armature@Action.")
+    plan_path: bpy.props.StringProperty(
+        options={'HIDDEN', 'SKIP_SAVE'},
+        description="Write the plan as JSON to this path.")
+
+    @classmethod
+    def poll(cls, context):
+        return validity.for_scene(context.scene).exportable
+
+    def execute(self, context):
+        from . import plan
+
+        export_plan = plan.build_plan(
+            context, [item.name for item in self.group_names],
+            [item.name for item in self.clip_names])
+
+        if self.plan_path:
+            plan.write_plan(export_plan, bpy.path.abspath(self.plan_path))
+
+        counts = [entry["counts"] for entry in export_plan["groups"]]
+        self.report({'INFO'}, "Planned {0} Exports: {1} vertices, {2} bones, about {3:.1f} sec.".format(
+            len(counts), sum(c["vertices"] for c in counts), sum(c["bones"] for c in counts),
+            export_plan["cost"]))
         return {'FINISHED'}
 
 
@@ -381,18 +1102,261 @@ class PF_OT_export_group_move_slot(bpy.types.Operator):
         elif self.direction == "DOWN":
             context.scene.preflight_props.fbx_export_groups.move(
                 self.group_idx,  self.group_idx + 1)
+        validity.invalidate()
         return {'FINISHED'}
 
 
-def ensure_export_path(export_path):
+# Events passed through while a modal export runs, to look around the scene
+NAVIGATION_EVENTS = {
+    'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+    'TRACKPADPAN', 'TRACKPADZOOM', 'NDOF_MOTION',
+}
+
+
+def export_selection(context, group_names=(), clip_names=()):
+    """
+    Return the export groups, as (index, group) pairs, and the
+    animation clips, as (armature, action) pairs, that an export run
+    covers. An explicit list of groups or clips limits it to them.
+    """
+    only_names = set(group_names)
+    only_clips = set(clip_names)
+    use_filter = bool(only_names or only_clips)
+
+    groups = [(group_idx, group) for group_idx, group
+              in enumerate(context.scene.preflight_props.fbx_export_groups)
+              if not use_filter or group.name in only_names]
+
+    clips = []
+    export_options = context.scene.preflight_props.export_options
+    if export_options.export_animation_clips or only_clips:
+        clips = [clip for name, clip in clips_by_name(context).items()
+                 if not use_filter or name in only_clips]
+
+    return groups, clips
+
+
+def objects_for_group(group, context):
+    """
+    Return the scene objects referenced by an export group, followed
+    by the objects matched by its rules, if any.
+    """
+    objects = [context.scene.objects.get(obj.obj_pointer.name)
+               for obj in group.obj_names]
+    if not rules.group_has_rules(group):
+        return objects
+
+    with report.stage("resolve"):
+        listed = set(obj.name for obj in objects if obj is not None)
+        matched = rules.index_for_scene(context.scene).resolve(group)
+        return objects + [obj for obj in matched if obj.name not in listed]
+
+
+def options_for_group(group, context):
+    """Return the exporter options resolved for an export group."""
+    return context.scene.preflight_props.export_options.get_options_dict(
+        bake_anim=group.include_animations,
+        use_mesh_modifiers=group.apply_modifiers
+    )
+
+
+def export_path_for_group(group, context):
+    """Return the path an export group is written to."""
+    export_dir = context.scene.preflight_props.export_options.export_location
+    export_path = export_path_for_string(
+        group.name, export_dir, subdir=group.export_location)
+    # Sharded groups write their cells next to an index file
+    return shard.index_path(export_path) if shard.is_sharded(group) else export_path
+
+
+def fingerprint_for_group(group, context):
+    """Return the cache fingerprint for an export group."""
+    return cache.fingerprint_group(
+        group, objects_for_group(group, context), group_settings(group, context))
+
+
+def group_settings(group, context):
+    """
+    Return the exporter options of a group, with its shard and LOD
+    settings and the exporter that writes it.
+    """
+    options = options_for_group(group, context)
+    if shard.is_sharded(group):
+        options["shard"] = shard.settings(group)
+    if lods.is_enabled(group):
+        options["lods"] = lods.settings(group)
+    export_options = context.scene.preflight_props.export_options
+    options["export_backend"] = export_options.export_backend
+    if export_options.export_backend == 'FAST' and export_options.optimize_meshes:
+        options["optimize_meshes"] = True
+    return options
+
+
+def fast_writer_options(kwargs):
+    """Add the options only the fast writer takes, which Blender's exporter would reject."""
+    export_options = bpy.context.scene.preflight_props.export_options
+    return dict(kwargs, optimize_meshes=export_options.optimize_meshes)
+
+
+def describe_group(group, context):
+    """Return the source objects and options of a group, for the output manifest."""
+    return {
+        "kind": "group",
+        "objects": [obj.name for obj in objects_for_group(group, context) if obj is not None],
+        "options": group_settings(group, context),
+    }
+
+
+# F-Curve data paths of pose bone channels
+BONE_PATH_PATTERN = re.compile(r'^pose\.bones\["(.+?)"\]')
+
+
+def animation_clips(context):
+    """
+    Return the (armature, action) pairs exported as animation
+    clips: every action that animates bones of an armature in the
+    scene, whether it is assigned, in an NLA track or only stashed.
+    """
+    armatures = sorted((obj for obj in context.scene.objects if obj.type == 'ARMATURE'),
+                       key=lambda obj: obj.name)
+    actions = sorted(bpy.data.actions, key=lambda action: action.name)
+
+    action_bones = {}
+    for action in actions:
+        action_bones[action.name] = set(
+            match.group(1) for match in
+            (BONE_PATH_PATTERN.match(fcurve.data_path) for fcurve in action.fcurves)
+            if match)
+
+    clips = []
+    for armature in armatures:
+        bone_names = set(armature.data.bones.keys())
+        for action in actions:
+            if action_bones[action.name] & bone_names:
+                clips.append((armature, action))
+    return clips
+
+
+# Clips of the export run in progress by name, if any
+active_clips = None
+
+
+@contextlib.contextmanager
+def clip_index(context):
+    """Find the animation clips of the scene once for everything exported inside the block."""
+    global active_clips
+    previous = active_clips
+    active_clips = clips_by_name(context)
     try:
-        export_dir = os.path.dirname(export_path)
-        if not os.path.exists(export_dir):
-            os.makedirs(export_dir)
-    except:
-        return False
+        yield active_clips
+    finally:
+        active_clips = previous
 
-    return True
+
+def clips_by_name(context):
+    """Return the animation clips of the scene, as (armature, action) pairs by name."""
+    if active_clips is not None:
+        return active_clips
+    return {clip_name(armature, action): (armature, action)
+            for armature, action in animation_clips(context)}
+
+
+def animation_clip_for_name(context, name):
+    return clips_by_name(context).get(name)
+
+
+def clip_name(armature, action):
+    return "{0}@{1}".format(armature.name, action.name)
+
+
+def options_for_clip(context):
+    """Return the exporter options for a single baked action."""
+    options = context.scene.preflight_props.export_options.get_options_dict(
+        object_types={'ARMATURE'},
+        bake_anim=True
+    )
+    options.update(
+        bake_anim_use_all_actions=False,
+        bake_anim_use_nla_strips=False
+    )
+    return options
+
+
+def export_path_for_clip(armature, action, context):
+    """
+    Return the path of an animation clip, named Armature@Action.fbx
+    so game engines pick it up as an animation of the armature.
+    """
+    export_dir = context.scene.preflight_props.export_options.export_location
+    filename = "{0}@{1}.fbx".format(
+        bpy.path.clean_name(armature.name), bpy.path.clean_name(action.name))
+    return bpy.path.abspath(os.path.join(export_dir, filename))
+
+
+def describe_clip(armature, action, context):
+    """Return the source objects and options of a clip, for the output manifest."""
+    return {
+        "kind": "clip",
+        "objects": [armature.name, action.name],
+        "options": options_for_clip(context),
+    }
+
+
+def expected_outputs(context):
+    """
+    Return (name, path) pairs for every file a full export of the
+    scene writes. Files listed in the output manifest under other
+    names or paths are orphaned.
+    """
+    groups, clips = export_selection(context)
+    outputs = [(group.name, path) for _, group in groups
+               for path, _ in shard.outputs(export_path_for_group(group, context))]
+    outputs += [(clip_name(armature, action), export_path_for_clip(armature, action, context))
+                for armature, action in clips]
+    return outputs
+
+
+def fingerprint_for_clip(armature, action, context):
+    """Return the cache fingerprint for an animation clip."""
+    return cache.fingerprint_clip(armature, action, options_for_clip(context))
+
+
+def count_evaluated_objects(objects):
+    """
+    Evaluate the depsgraph ahead of the exporter, so modifier
+    evaluation is timed on its own, and count the vertices and
+    bones that will be exported.
+    """
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    vertices = 0
+    bones = 0
+    for obj in filter(None, objects):
+        if obj.type == 'MESH':
+            vertices += len(obj.evaluated_get(depsgraph).data.vertices)
+        elif obj.type == 'ARMATURE':
+            bones += len(obj.data.bones)
+
+    report.add_counts(vertices=vertices, bones=bones)
+
+
+def load_fast_writer():
+    from . import fast_writer
+    return fast_writer
+
+
+def load_mesh_data():
+    # Imports numpy, so only once an export runs
+    from . import mesh_data
+    return mesh_data
+
+
+def exporter_supports_active_collection():
+    """
+    Return true if Blender's FBX exporter can limit the export to
+    the active collection, which it can since Blender 2.91.
+    """
+    properties = bpy.ops.export_scene.fbx.get_rna_type().properties
+    return "use_active_collection" in properties.keys()
 
 
 def filename_for_string(s, suffix=""):
@@ -0,0 +1,530 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
+import itertools
+import json
+import os
+import struct
+import time
+
+from . import cache
+from . import report
+
+# Hidden, so game engines do not import files while they are staged
+STAGING_DIR = ".preflight-staging"
+# Staged files are named {name}.{token}{ext}, with a token unique to
+# the process and the export. Tokens have a fixed width, so the one
+# Blender's exporter records in the document URL can be reset in place.
+STAGING_TOKEN_FILLER = "0" * 16
+staging_counter = itertools.count()
+
+MANIFEST_FILENAME = ".preflight_outputs.json"
+MANIFEST_VERSION = 1
+# Environment variable that processes exporting as part of one run,
+# like parallel workers, share their run id through
+RUN_ENV = "PREFLIGHT_RUN"
+
+# Status of an output file compared with the previous manifest
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+HEAD_MAGIC = b"Kaydara FBX Binary\x20\x20\x00\x1a\x00"
+
+# Written in place of the export time, to match the fixed CreationTime
+# both exporters write
+CREATION_TIMESTAMP = {
+    b"Year": 1970, b"Month": 1, b"Day": 1, b"Hour": 10,
+    b"Minute": 0, b"Second": 0, b"Millisecond": 0,
+}
+
+
+class StagedFile:
+    """A file exported next to its destination, then moved into place if it changed."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.token = staging_token()
+        self.path = staging_path(filepath, self.token)
+        self.changed = None
+        self.sealed = False
+
+    def seal(self, staged_file, durable=False):
+        """
+        Normalize the staged file through a handle open for writing,
+        and with `durable`, sync it to disk. Windows can only sync
+        handles that can write.
+        """
+        normalize_fbx(staged_file, self.token)
+        if durable:
+            staged_file.flush()
+            os.fsync(staged_file.fileno())
+        self.sealed = True
+
+    def commit(self, durable=False):
+        """
+        Move the staged file over its destination unless both have
+        the same contents, in which case the destination is left
+        untouched, mtime included. Return true if it was replaced.
+        With `durable`, the file is synced to disk before the rename.
+        """
+        if not self.sealed:
+            with open(self.path, "r+b") as staged_file:
+                self.seal(staged_file, durable)
+
+        if files_match(self.path, self.filepath):
+            os.remove(self.path)
+            self.changed = False
+        else:
+            os.replace(self.path, self.filepath)
+            self.changed = True
+        return self.changed
+
+    def discard(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@contextlib.contextmanager
+def staged_write(filepath):
+    """
+    Yield a StagedFile whose path an exporter should write to.
+    When the block succeeds, the file replaces `filepath` in one
+    rename, only if its contents differ. A failed export leaves
+    `filepath` as it was.
+    """
+    staged = StagedFile(filepath)
+    os.makedirs(os.path.dirname(staged.path), exist_ok=True)
+
+    try:
+        yield staged
+    except BaseException:
+        staged.discard()
+        raise
+
+    if os.path.exists(staged.path):
+        with report.stage("flush"):
+            staged.commit()
+
+
+def write_output(filepath, data):
+    """Write bytes to an output file, on the I/O threads while a write-behind pool is active."""
+    if active_writer is not None:
+        return active_writer.write(filepath, data)
+
+    with staged_write(filepath) as staged:
+        with open(staged.path, "wb") as output_file:
+            output_file.write(data)
+
+
+class WriteBehind:
+    """
+    A bounded pool of I/O threads that finishes exports in the
+    background: directory creation, writing, fsync, comparison with
+    the previous file and the rename into place. The main thread
+    moves on to evaluating the next group meanwhile. Submitting
+    blocks while too many jobs or bytes are in flight, and the time
+    spent blocked is counted. Jobs never touch bpy.
+    """
+
+    def __init__(self, threads=2, max_bytes=256 * 1024 * 1024, max_pending=None):
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, threads), thread_name_prefix="preflight-io")
+        self.threads = max(1, threads)
+        self.max_bytes = max_bytes
+        self.max_pending = max_pending or 2 * self.threads
+        self.pending = collections.deque()
+        self.pending_bytes = 0
+        self.unit_futures = []
+        self.blocked_seconds = 0.0
+        self.jobs = 0
+        self.bytes = 0
+
+    def write(self, filepath, data):
+        """Write encoded file contents to `filepath` in the background."""
+        return self.submit(len(data), write_file, filepath, data)
+
+    def commit(self, staged):
+        """Commit a file an exporter wrote to its staging path, in the background."""
+        return self.submit(os.path.getsize(staged.path), commit_file, staged)
+
+    def submit(self, size, function, *args):
+        """Run function(*args) on an I/O thread, once there is room for `size` bytes."""
+        self.wait_for_room(size)
+        future = self.executor.submit(function, *args)
+        self.pending.append((future, size))
+        self.pending_bytes += size
+        self.unit_futures.append(future)
+        self.jobs += 1
+        self.bytes += size
+        return future
+
+    def take_unit_futures(self):
+        """Return the jobs submitted since the last call, for one group."""
+        futures, self.unit_futures = self.unit_futures, []
+        return futures
+
+    def prune(self):
+        while self.pending and self.pending[0][0].done():
+            self.pending_bytes -= self.pending.popleft()[1]
+
+    def wait_for_room(self, size):
+        self.prune()
+        if not self.pending or (len(self.pending) < self.max_pending
+                                and self.pending_bytes + size <= self.max_bytes):
+            return
+
+        # Oldest jobs finish first, so wait on them in order
+        time_start = time.perf_counter()
+        while self.pending and (len(self.pending) >= self.max_pending
+                                or self.pending_bytes + size > self.max_bytes):
+            future, future_size = self.pending.popleft()
+            concurrent.futures.wait([future])
+            self.pending_bytes -= future_size
+        self.blocked_seconds += time.perf_counter() - time_start
+
+    def drain(self):
+        """Wait for every job in flight."""
+        time_start = time.perf_counter()
+        concurrent.futures.wait([future for future, _ in self.pending])
+        self.pending.clear()
+        self.pending_bytes = 0
+        self.blocked_seconds += time.perf_counter() - time_start
+
+    def close(self):
+        self.drain()
+        self.executor.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            "threads": self.threads,
+            "jobs": self.jobs,
+            "bytes": self.bytes,
+            "blocked_seconds": self.blocked_seconds,
+        }
+
+
+# Write-behind pool of the export run in progress, if any
+active_writer = None
+
+
+@contextlib.contextmanager
+def write_behind(threads=2, max_bytes=256 * 1024 * 1024):
+    """Finish the exports made inside the block on background I/O threads."""
+    global active_writer
+    previous = active_writer
+    active_writer = WriteBehind(threads, max_bytes) if threads > 0 else None
+    try:
+        yield active_writer
+    finally:
+        if active_writer is not None:
+            active_writer.close()
+        active_writer = previous
+
+
+def write_file(filepath, data):
+    """I/O job: write encoded bytes through a staged file. Return the outcome."""
+    time_start = time.perf_counter()
+    staged = StagedFile(filepath)
+    os.makedirs(os.path.dirname(staged.path), exist_ok=True)
+    with open(staged.path, "w+b") as staged_file:
+        staged_file.write(data)
+        staged.seal(staged_file, durable=True)
+    return finish_job(staged, time_start)
+
+
+def commit_file(staged):
+    """I/O job: sync and commit a file an exporter already staged."""
+    return finish_job(staged, time.perf_counter())
+
+
+def finish_job(staged, time_start):
+    try:
+        changed = staged.commit(durable=True)
+    except BaseException:
+        staged.discard()
+        raise
+    return {
+        "changed": changed,
+        "bytes": os.path.getsize(staged.filepath),
+        "seconds": time.perf_counter() - time_start,
+    }
+
+
+def staging_token():
+    """Return a token no other export staging a file right now uses."""
+    return "{0:08x}{1:08x}".format(os.getpid() & 0xffffffff, next(staging_counter) & 0xffffffff)
+
+
+def staging_path(filepath, token):
+    """
+    Return where an export to `filepath` is staged. It stays on the
+    same file system, so the staged file is renamed into place
+    atomically.
+
+    The staging directory is shared by every process exporting to
+    the same location, like parallel workers, the daemon and watch
+    mode, so it is never removed: one process could not tell whether
+    another is about to stage a file in it. The token keeps two
+    exports of the same file, from different processes or threads,
+    from writing over each other's staged file.
+    """
+    export_dir, filename = os.path.split(filepath)
+    name, ext = os.path.splitext(filename)
+    return os.path.join(export_dir, STAGING_DIR, "{0}.{1}{2}".format(name, token, ext))
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(path, "rb") as digest_file:
+        for chunk in iter(lambda: digest_file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_match(path, other_path):
+    """Return true if two files have the same size and hash."""
+    if not os.path.exists(other_path):
+        return False
+    if os.path.getsize(path) != os.path.getsize(other_path):
+        return False
+    return file_digest(path) == file_digest(other_path)
+
+
+def normalize_fbx(fbx_file, token=None):
+    """
+    Overwrite the CreationTimeStamp of a binary FBX file, open for
+    reading and writing, with a fixed time, so exporting unchanged
+    data gives the same bytes. Blender's exporter stamps the current
+    time there. It also records the path it wrote to as the document
+    URL, where the staging token is reset to a fixed one. Both have
+    a fixed size, so they are patched in place.
+    """
+    fbx_file.seek(0)
+    head = fbx_file.read(len(HEAD_MAGIC) + 4)
+    if not head.startswith(HEAD_MAGIC):
+        return False
+    version = struct.unpack_from("<I", head, len(HEAD_MAGIC))[0]
+    elem_head = struct.Struct("<3QB" if version >= 7500 else "<3IB")
+
+    # FBXHeaderExtension is the first element of the file
+    header = read_elem(fbx_file, elem_head, len(head))
+    if header is None or header[0] != b"FBXHeaderExtension":
+        return False
+
+    patched = False
+    if token:
+        fbx_file.seek(len(head))
+        header_bytes = fbx_file.read(header[3] - len(head))
+        token_bytes = token.encode("ascii")
+        if token_bytes in header_bytes:
+            fbx_file.seek(len(head))
+            fbx_file.write(header_bytes.replace(
+                token_bytes, STAGING_TOKEN_FILLER.encode("ascii")))
+            patched = True
+    for elem in walk_children(fbx_file, elem_head, header):
+        if elem[0] != b"CreationTimeStamp":
+            continue
+        for name, props_offset, _, _ in walk_children(fbx_file, elem_head, elem):
+            value = CREATION_TIMESTAMP.get(name)
+            if value is None:
+                continue
+            fbx_file.seek(props_offset)
+            if fbx_file.read(1) == b"I":
+                fbx_file.write(struct.pack("<i", value))
+                patched = True
+    return patched
+
+
+def read_elem(fbx_file, elem_head, offset):
+    """Return the name, properties offset, children offset and end offset of an element."""
+    fbx_file.seek(offset)
+    data = fbx_file.read(elem_head.size)
+    if len(data) < elem_head.size:
+        return None
+    end_offset, _, props_size, name_size = elem_head.unpack(data)
+    if end_offset == 0:
+        return None
+    name = fbx_file.read(name_size)
+    props_offset = offset + elem_head.size + name_size
+    return name, props_offset, props_offset + props_size, end_offset
+
+
+def walk_children(fbx_file, elem_head, elem):
+    """Yield the children of an element, as read_elem returns them."""
+    offset = elem[2]
+    while offset < elem[3]:
+        child = read_elem(fbx_file, elem_head, offset)
+        if child is None:
+            return
+        yield child
+        offset = child[3]
+
+
+class OutputManifest:
+    """
+    Every file the exports of a scene produced, stored next to them
+    with its group, source objects, options, size, content hash and
+    export time, so downstream tools can process only what changed.
+    Files listed by earlier runs that no group produces any more are
+    kept apart as orphaned.
+
+    Each entry records the run that last exported it. Statuses only
+    describe that run, so entries a run did not export are reset to
+    unchanged.
+    """
+
+    def __init__(self, path, files=None, run=None):
+        self.path = path
+        self.export_dir = os.path.dirname(path)
+        self.previous = files or {}
+        self.updated = {}
+        self.orphaned = 0
+        self.run = run or os.environ.get(RUN_ENV) or new_run_id()
+
+    @classmethod
+    def load(cls, export_dir):
+        path = os.path.join(bpy.path.abspath(export_dir), MANIFEST_FILENAME)
+        return cls(path, read_manifest(path).get("files", {}))
+
+    def key(self, filepath):
+        """
+        Return a file's path relative to the export location, with
+        forward slashes. Files on another drive keep their absolute path.
+        """
+        try:
+            key = os.path.relpath(filepath, self.export_dir)
+        except ValueError:
+            key = os.path.abspath(filepath)
+        return key.replace(os.sep, "/")
+
+    def record(self, name, filepath, seconds, kind="group", objects=(), options=None,
+               cached=False):
+        """Add an output of this run, hashing it unless the cache skipped it unchanged."""
+        key = self.key(filepath)
+        previous = self.previous.get(key)
+        stat = os.stat(filepath)
+
+        if cached and previous is not None and previous.get("size") == stat.st_size \
+                and previous.get("mtime_ns") == stat.st_mtime_ns:
+            digest = previous["sha1"]
+            seconds = previous.get("seconds", seconds)
+        else:
+            digest = file_digest(filepath)
+
+        if previous is None:
+            status = NEW
+        elif previous.get("sha1") != digest:
+            status = CHANGED
+        else:
+            status = UNCHANGED
+
+        self.updated[key] = {
+            "name": name,
+            "kind": kind,
+            "objects": list(objects),
+            "options": json_options(options or {}),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha1": digest,
+            "seconds": seconds,
+            "status": status,
+            "run": self.run,
+        }
+        return self.updated[key]
+
+    def save(self, expected, scope=None):
+        """
+        Merge the outputs of this run into the manifest file. Files
+        that no export would write now, from `expected` pairs of
+        (name, path), move to the orphaned list. Entries written by
+        other processes since the manifest was loaded are kept, so
+        parallel workers can share one manifest, and those not
+        exported in this run become unchanged.
+
+        `scope`, when given, names the groups and clips the run
+        covered. Files of any other group or clip are left alone, as
+        a filtered or partial run cannot tell whether they are still
+        produced.
+        """
+        expected = set((name, self.key(filepath)) for name, filepath in expected)
+
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            with cache.cache_lock(self.path):
+                data = read_manifest(self.path)
+                files = data.get("files", {})
+                orphaned = data.get("orphaned", {})
+                files.update(self.updated)
+                for entry in files.values():
+                    if entry.get("run") != self.run:
+                        entry["status"] = UNCHANGED
+
+                for key in list(files):
+                    if scope is not None and files[key]["name"] not in scope:
+                        continue
+                    if (files[key]["name"], key) not in expected:
+                        orphaned[key] = files.pop(key)
+                for key in list(orphaned):
+                    entry = orphaned[key]
+                    if key in files or not os.path.exists(os.path.join(self.export_dir, key)):
+                        del orphaned[key]
+                    else:
+                        entry["status"] = "orphaned"
+
+                tmp_path = "{0}.{1}.tmp".format(self.path, os.getpid())
+                with open(tmp_path, "w") as manifest_file:
+                    json.dump({"version": MANIFEST_VERSION, "run": self.run,
+                               "files": files, "orphaned": orphaned},
+                              manifest_file, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.path)
+        except OSError:
+            return False
+
+        self.previous = files
+        self.updated = {}
+        self.orphaned = len(orphaned)
+        return True
+
+
+def new_run_id():
+    """Return an id for an export run, from its start time and process."""
+    return "{0}-{1}".format(time.strftime("%Y%m%dT%H%M%S"), os.getpid())
+
+
+def read_manifest(path):
+    try:
+        with open(path, "r") as manifest_file:
+            data = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data
+
+
+def json_options(options):
+    """Return exporter options with enum flag sets as sorted lists."""
+    return {key: sorted(value) if isinstance(value, set) else value
+            for key, value in options.items()}
@@ -17,7 +17,8 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import bpy
-from . import helpers
+from . import rules
+from . import validity
 
 LARGE_BUTTON_SCALE_Y = 1.5
 
@@ -63,7 +64,7 @@ class PF_PT_preflight_panel(bpy.types.Panel):
         group_box = layout.box()
 
         # Header Row
-        self.layout_header(group_box, group, group_idx)
+        self.layout_header(group_box, group, group_idx, context)
 
         if group.is_collapsed is False:
             # Mesh Collection
@@ -88,6 +89,36 @@ class PF_PT_preflight_panel(bpy.types.Panel):
             options_column.separator()
             options_column.prop(group, "include_animations")
             options_column.prop(group, "apply_modifiers")
+            options_column.prop(group, "use_lods")
+            if group.use_lods:
+                lods_column = options_column.column(align=True)
+                lods_column.prop(group, "lod_ratios")
+                lods_column.prop(group, "lod_screen_sizes")
+            options_column.prop(group, "shard_mode")
+            if group.shard_mode == 'GRID':
+                options_column.prop(group, "shard_cell_size")
+            elif group.shard_mode == 'OCTREE':
+                options_column.prop(group, "shard_max_objects")
+            options_column.separator()
+            self.layout_rules(options_column, group)
+
+    def layout_rules(self, layout, group):
+        layout.prop(group, "use_rules")
+        if not group.use_rules:
+            return
+
+        rules_column = layout.column(align=True)
+        rules_column.prop(group, "rule_collection")
+        name_row = rules_column.row(align=True)
+        name_row.prop(group, "rule_name_pattern")
+        name_row.prop(group, "rule_name_match", text="")
+        error = rules.rule_error(group)
+        if error:
+            rules_column.label(text=error, icon='ERROR')
+        rules_column.prop(group, "rule_object_types")
+        property_row = rules_column.row(align=True)
+        property_row.prop(group, "rule_property")
+        property_row.prop(group, "rule_property_value")
 
     def layout_object_list(self, layout, group, group_idx):
         obj_list_row = layout.row()
@@ -105,7 +136,7 @@ class PF_PT_preflight_panel(bpy.types.Panel):
         remove_obj_button.group_idx = group_idx
         remove_obj_button.object_idx = group.obj_idx
 
-    def layout_header(self, layout, group, group_idx):
+    def layout_header(self, layout, group, group_idx, context):
         header_row = layout.row()
 
         collapse_icon = "TRIA_RIGHT" if group.is_collapsed else "TRIA_DOWN"
@@ -116,7 +147,7 @@ class PF_PT_preflight_panel(bpy.types.Panel):
             icon_only=True,
             emboss=False)
 
-        header_row.alert = not helpers.group_is_valid(group)
+        header_row.alert = not validity.group_is_valid(context.scene, group_idx)
         header_row.prop(group, "name", text="")
         header_row.alert = False
 
@@ -162,5 +193,21 @@ class PF_PT_preflight_export_options_panel(bpy.types.Panel):
         layout.prop(export_options, "axis_forward")
         layout.separator()
         layout.prop(export_options, "use_anim")
+        layout.prop(export_options, "export_animation_clips")
+        layout.prop(export_options, "use_export_cache")
+        layout.prop(export_options, "watch_exports")
+        layout.prop(export_options, "save_manifest")
+        layout.prop(export_options, "export_backend")
+        if export_options.export_backend == 'FAST':
+            layout.prop(export_options, "mesh_cache_size")
+            layout.prop(export_options, "optimize_meshes")
+        layout.prop(export_options, "low_memory")
+        if export_options.low_memory:
+            layout.prop(export_options, "memory_limit")
+            if export_options.memory_limit:
+                layout.prop(export_options, "memory_per_vertex")
+        layout.prop(export_options, "io_threads")
+        if export_options.io_threads:
+            layout.prop(export_options, "io_queue_size")
         layout.separator()
         layout.operator("preflight.reset_export_options")
@@ -0,0 +1,191 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import json
+import os
+
+from . import cache
+from . import operators
+from . import output
+from . import rules
+
+PLAN_VERSION = 1
+
+# Rough costs in seconds. Only their ratios matter for balancing work,
+# so they can be tuned against benchmarks/ without being exact.
+UNIT_COST = 0.05
+OBJECT_COST = 0.005
+VERTEX_COST = 0.000002
+BONE_FRAME_COST = 0.00005
+KEYFRAME_COST = 0.00001
+
+# Object types the exporter's "OTHER" option converts to meshes
+OTHER_TYPES = {'CURVE', 'SURFACE', 'FONT', 'META'}
+
+
+def build_plan(context, group_names=(), clip_names=()):
+    """
+    Describe what export_all_groups would do with the same groups
+    and clips, without writing anything: the path and options of
+    each export, its objects, and the vertices, polygons, bones and
+    keyframes it would write, with an estimate of its cost.
+    """
+    scene = context.scene
+    export_options = scene.preflight_props.export_options
+    groups, clips = operators.export_selection(context, group_names, clip_names)
+
+    export_cache = None
+    if export_options.use_export_cache:
+        export_cache = cache.ExportCache.load(export_options.export_location)
+
+    depsgraph = context.evaluated_depsgraph_get()
+    entries = []
+
+    with rules.scene_index(scene):
+        for _, group in groups:
+            objects = operators.objects_for_group(group, context)
+            options = operators.options_for_group(group, context)
+            export_path = operators.export_path_for_group(group, context)
+            fingerprint = operators.fingerprint_for_group(group, context) \
+                if export_cache is not None else None
+
+            entry = plan_entry("group", group.name, export_path, options,
+                               objects, depsgraph, frames=scene_frames(scene))
+            entry["cached"] = export_cache is not None and \
+                export_cache.is_current(group.name, fingerprint, export_path)
+            entries.append(entry)
+
+        for armature, action in clips:
+            name = operators.clip_name(armature, action)
+            options = operators.options_for_clip(context)
+            export_path = operators.export_path_for_clip(armature, action, context)
+            fingerprint = operators.fingerprint_for_clip(armature, action, context) \
+                if export_cache is not None else None
+
+            frame_start, frame_end = action.frame_range
+            entry = plan_entry("clip", name, export_path, options, [armature], depsgraph,
+                               frames=int(frame_end - frame_start) + 1, actions=[action])
+            entry["cached"] = export_cache is not None and \
+                export_cache.is_current(name, fingerprint, export_path)
+            entries.append(entry)
+
+    return {
+        "version": PLAN_VERSION,
+        "blendfile": bpy.data.filepath,
+        "export_location": bpy.path.abspath(export_options.export_location),
+        "cost": sum(entry["cost"] for entry in entries if not entry["cached"]),
+        "groups": entries,
+    }
+
+
+def plan_entry(kind, name, export_path, options, objects, depsgraph, frames=1, actions=None):
+    """Count what one export would write, and estimate its cost."""
+    object_types = options.get("object_types", {'MESH', 'ARMATURE', 'EMPTY', 'OTHER'})
+    use_modifiers = options.get("use_mesh_modifiers", True)
+    bake_anim = options.get("bake_anim", False)
+
+    missing = len([obj for obj in objects if obj is None])
+    exported = [obj for obj in objects
+                if obj is not None and export_type(obj) in object_types]
+
+    counts = {"objects": len(exported), "vertices": 0, "polygons": 0,
+              "bones": 0, "keyframes": 0}
+    evaluated_vertices = 0
+
+    for obj in exported:
+        if obj.type == 'MESH':
+            mesh = obj.data
+            if use_modifiers and obj.modifiers:
+                mesh = obj.evaluated_get(depsgraph).data
+            counts["vertices"] += len(mesh.vertices)
+            counts["polygons"] += len(mesh.polygons)
+            evaluated_vertices += len(mesh.vertices)
+        elif obj.type == 'ARMATURE':
+            counts["bones"] += len(obj.data.bones)
+
+    if bake_anim:
+        if actions is None:
+            actions = set(action for obj in exported for action in object_actions(obj))
+        counts["keyframes"] = sum(len(fcurve.keyframe_points)
+                                  for action in actions for fcurve in action.fcurves)
+
+    cost = UNIT_COST + OBJECT_COST * len(exported) + VERTEX_COST * evaluated_vertices
+    if bake_anim:
+        # Baking samples every bone on every frame, whatever the keyframes
+        cost += BONE_FRAME_COST * counts["bones"] * frames
+        cost += KEYFRAME_COST * counts["keyframes"]
+
+    return {
+        "kind": kind,
+        "name": name,
+        "export_path": export_path,
+        "options": output.json_options(options),
+        "objects": [obj.name for obj in exported],
+        "missing": missing,
+        "counts": counts,
+        "cost": cost,
+    }
+
+
+def export_type(obj):
+    return 'OTHER' if obj.type in OTHER_TYPES else obj.type
+
+
+def object_actions(obj):
+    """Return the actions the exporter bakes for an object."""
+    animation_data = obj.animation_data
+    if animation_data is None:
+        return []
+    actions = [animation_data.action] if animation_data.action else []
+    actions += [strip.action for track in animation_data.nla_tracks
+                for strip in track.strips if strip.action]
+    return actions
+
+
+def scene_frames(scene):
+    return scene.frame_end - scene.frame_start + 1
+
+
+def write_plan(plan, path):
+    export_dir = os.path.dirname(path)
+    if export_dir and not os.path.exists(export_dir):
+        os.makedirs(export_dir)
+
+    with open(path, "w") as plan_file:
+        json.dump(plan, plan_file, indent=2, sort_keys=True)
+
+
+def table_lines(plan):
+    """Format a plan as a table, costliest exports first."""
+    lines = ["{0:>8} {1:>10} {2:>10} {3:>6} {4:>8}  {5:<6} {6}".format(
+        "Cost", "Vertices", "Polygons", "Bones", "Keys", "Kind", "Name")]
+
+    for entry in sorted(plan["groups"], key=lambda e: e["cost"], reverse=True):
+        counts = entry["counts"]
+        lines.append("{0:>7.3f}s {1:>10} {2:>10} {3:>6} {4:>8}  {5:<6} {6}{7}".format(
+            entry["cost"], counts["vertices"], counts["polygons"], counts["bones"],
+            counts["keyframes"], entry["kind"], entry["name"],
+            " (cached)" if entry["cached"] else ""))
+        lines.append("{0:>48}-> {1}".format("", entry["export_path"]))
+        if entry["missing"]:
+            lines.append("{0:>48}{1} missing objects".format("", entry["missing"]))
+
+    lines.append("Estimated: {0:.3f}s for {1} exports".format(
+        plan["cost"], len([e for e in plan["groups"] if not e["cached"]])))
+    return lines
@@ -18,6 +18,9 @@
 
 import bpy
 
+from . import validity
+from . import watch
+
 #
 # Custom Property Groups
 #
@@ -29,7 +32,8 @@ class PreflightMeshGroup(bpy.types.PropertyGroup):
     obj_pointer: bpy.props.PointerProperty(
         name="Object Pointer",
         type=bpy.types.Object,
-        description="Object to Export")
+        description="Object to Export",
+        update=validity.invalidate)
 
     obj_name: bpy.props.StringProperty(
         name="Object Name",
@@ -47,7 +51,8 @@ class PreflightExportGroup(bpy.types.PropertyGroup):
     name: bpy.props.StringProperty(
         name="Export Group Name",
         description="File name for this export group. Will be converted to camel case. Duplicate names will cause an error.",
-        default="")
+        default="",
+        update=validity.invalidate)
     include_animations: bpy.props.BoolProperty(
         name="Include Animations",
         description="Include animations along with the armatures in this export group.",
@@ -59,12 +64,99 @@ class PreflightExportGroup(bpy.types.PropertyGroup):
     obj_names: bpy.props.CollectionProperty(type=PreflightMeshGroup)
     obj_idx: bpy.props.IntProperty(name="Object Index", default=0)
 
+    rule_name_match_enum = [
+        ('GLOB', "Glob", "Match names with wildcards, like SM_*"),
+        ('REGEX', "Regex", "Match names with a regular expression"),
+    ]
+
+    rule_object_types_enum = [
+        ('MESH', "Mesh", ""),
+        ('ARMATURE', "Armature", ""),
+        ('EMPTY', "Empty", ""),
+        ('CURVE', "Curve", ""),
+        ('SURFACE', "Surface", ""),
+        ('FONT', "Text", ""),
+        ('META', "Metaball", ""),
+    ]
+
+    use_rules: bpy.props.BoolProperty(
+        name="Add Objects by Rules",
+        description="Also export the scene objects matching all of the rules below, resolved at export time.",
+        default=False,
+        update=validity.invalidate)
+    rule_collection: bpy.props.PointerProperty(
+        name="Collection",
+        type=bpy.types.Collection,
+        description="Only match objects in this collection or its children.",
+        update=validity.invalidate)
+    rule_name_pattern: bpy.props.StringProperty(
+        name="Name",
+        description="Only match objects with names matching this pattern.",
+        default="",
+        update=validity.invalidate)
+    rule_name_match: bpy.props.EnumProperty(
+        name="Name Match",
+        items=rule_name_match_enum,
+        default='GLOB')
+    rule_object_types: bpy.props.EnumProperty(
+        name="Object Types",
+        description="Only match objects of these types. Matches all types when none are set.",
+        items=rule_object_types_enum,
+        default=set(),
+        options={'ENUM_FLAG'},
+        update=validity.invalidate)
+    rule_property: bpy.props.StringProperty(
+        name="Custom Property",
+        description="Only match objects with this custom property.",
+        default="",
+        update=validity.invalidate)
+    rule_property_value: bpy.props.StringProperty(
+        name="Value",
+        description="Only match objects whose custom property has this value. Matches any value when empty.",
+        default="")
+
     export_location: bpy.props.StringProperty(
         name="Export To",
         description="Choose an export location. Relative to the base export location set in the Export Options.",
         default="",
         maxlen=1024)
 
+    use_lods: bpy.props.BoolProperty(
+        name="Generate LODs",
+        description="Export each static mesh as a chain of decimated LOD0 to LODn meshes, which Unity imports as a LODGroup.",
+        default=False)
+    lod_ratios: bpy.props.StringProperty(
+        name="LOD Ratios",
+        description="Decimation ratio of LOD1 onwards, separated by spaces.",
+        default="0.5 0.25")
+    lod_screen_sizes: bpy.props.StringProperty(
+        name="Screen Sizes",
+        description="Screen size below which each LOD, from LOD0, is replaced by the next one. One more value than the ratios, largest first.",
+        default="0.6 0.3 0.1")
+
+    shard_mode_enum = [
+        ('NONE', "None", "Export the group to one file"),
+        ('GRID', "Grid", "Export one file per cell of a regular grid"),
+        ('OCTREE', "Octree", "Export one file per octree cell, split until each cell holds few enough objects"),
+    ]
+
+    shard_mode: bpy.props.EnumProperty(
+        name="Shards",
+        description="Split the group by the world space bounds of its objects into cells exported to their own files, listed in an index file.",
+        items=shard_mode_enum,
+        default='NONE')
+    shard_cell_size: bpy.props.FloatProperty(
+        name="Cell Size",
+        description="Size of the grid cells. Objects belong to the cell holding the center of their bounding box.",
+        default=100.0,
+        min=0.001,
+        subtype='DISTANCE')
+    shard_max_objects: bpy.props.IntProperty(
+        name="Objects per Cell",
+        description="Split octree cells holding more objects than this.",
+        default=256,
+        min=1)
+
 
 class PreflightExportOptionsGroup(bpy.types.PropertyGroup):
     allowed_keys = [
@@ -76,7 +168,9 @@ class PreflightExportOptionsGroup(bpy.types.PropertyGroup):
         "secondary_bone_axis",
         "use_armature_deform_only",
         "bake_anim",
-        "use_mesh_modifiers"
+        "use_mesh_modifiers",
+        "axis_forward",
+        "axis_up"
     ]
 
     axis_enum = [
@@ -95,6 +189,12 @@ class PreflightExportOptionsGroup(bpy.types.PropertyGroup):
         ('OTHER', "Other", "Other geometry types, like curve, metaball, etc. (converted to meshes)")
     ]
 
+    export_backend_enum = [
+        ('FBX', "Blender FBX", "Export with Blender's FBX exporter"),
+        ('FAST', "Fast Static Meshes",
+         "Write static meshes and empties directly from bulk mesh data. Groups with armatures, skinning or baked animation use Blender's FBX exporter"),
+    ]
+
     def as_dict(self):
         return {key: getattr(self, key) for key in dict(self).keys()}
 
@@ -134,6 +234,73 @@ class PreflightExportOptionsGroup(bpy.types.PropertyGroup):
         description="DEPRECATED",
         default=False)
 
+    export_backend: bpy.props.EnumProperty(
+        name="Exporter",
+        items=export_backend_enum,
+        default='FBX')
+
+    mesh_cache_size: bpy.props.IntProperty(
+        name="Mesh Cache (MB)",
+        description="Memory budget for evaluated meshes shared between the groups of one export run. Used by the fast exporter.",
+        default=1024,
+        min=0)
+
+    optimize_meshes: bpy.props.BoolProperty(
+        name="Optimize Meshes",
+        description="Weld loops with the same position, normal and UVs, triangulate, and order triangles for the GPU vertex cache and overdraw before writing. Used by the fast exporter.",
+        default=False)
+
+    low_memory: bpy.props.BoolProperty(
+        name="Low Memory",
+        description="Free evaluated meshes after each group, to keep the peak memory of large files down, and export the largest groups first.",
+        default=False)
+
+    memory_limit: bpy.props.IntProperty(
+        name="Memory Limit (MB)",
+        description="In low memory mode, move groups that would take the export above this much memory to the end of the run, after everything else is freed. 0 for no limit.",
+        default=0,
+        min=0)
+
+    memory_per_vertex: bpy.props.IntProperty(
+        name="Memory per Vertex (bytes)",
+        description="Memory an export is assumed to need per mesh vertex, until the run has measured the groups it exported. Only used to check groups against the memory limit.",
+        default=1024,
+        min=1)
+
+    io_threads: bpy.props.IntProperty(
+        name="I/O Threads",
+        description="Threads that write, sync and move exported files into place while the next group is evaluated. 0 writes each file before moving on.",
+        default=0,
+        min=0,
+        max=16)
+
+    io_queue_size: bpy.props.IntProperty(
+        name="I/O Queue (MB)",
+        description="Most exported data waiting to be written at once. Evaluating the next group waits for writes beyond it.",
+        default=256,
+        min=1)
+
+    use_export_cache: bpy.props.BoolProperty(
+        name="Skip Unchanged Groups",
+        description="Keep a cache of exported groups next to the exports, and skip groups that have not changed since their last successful export.",
+        default=False)
+
+    export_animation_clips: bpy.props.BoolProperty(
+        name="Export Animation Clips",
+        description="Export every action of each armature to its own Armature@Action.fbx file, after the export groups.",
+        default=False)
+
+    save_manifest: bpy.props.BoolProperty(
+        name="Save Export Manifest",
+        description="Store a manifest of the export groups in the file each time it is saved, as a Text datablock, so the command line can load only the objects the exported groups need.",
+        default=False)
+
+    watch_exports: bpy.props.BoolProperty(
+        name="Re-export on Save",
+        description="Track edits to the objects of export groups, and re-export the affected groups in a background Blender each time the file is saved.",
+        default=False,
+        update=watch.on_toggle)
+
     export_location: bpy.props.StringProperty(
         name="Export To",
         description="Choose an export location. Relative location prefixed with '//'.",
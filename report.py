@@ -0,0 +1,209 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import contextlib
+import json
+import os
+import time
+
+# Group result statuses
+EXPORTED = "exported"
+CACHED = "cached"
+FAILED = "failed"
+# Left for a fresh process, to stay under the memory limit
+DEFERRED = "deferred"
+
+# Stages of the export pipeline, in the order they run
+STAGES = ("fingerprint", "validation", "resolve", "visibility", "evaluation", "write", "flush")
+
+
+class ExportReport:
+    """
+    Results of an export run: one entry per export group
+    with its status, output path and timing.
+
+    Reports are plain JSON so runs from several Blender
+    processes can be merged into one.
+    """
+
+    def __init__(self, blendfile="", groups=None, seconds=0.0, stats=None):
+        self.blendfile = blendfile
+        self.groups = groups or []
+        self.seconds = seconds
+        self.stats = stats or {}
+
+    def add_stats(self, name, **values):
+        """Add run-wide counters, like cache hits, under a name."""
+        stats = self.stats.setdefault(name, {})
+        for key, value in values.items():
+            stats[key] = stats.get(key, 0) + value
+
+    def add_group(self, name, status, seconds=0.0, filepath="", error="", timings=None):
+        entry = {
+            "name": name,
+            "status": status,
+            "seconds": seconds,
+            "filepath": filepath,
+        }
+        if error:
+            entry["error"] = error
+        if timings is not None:
+            entry.update(timings.as_dict())
+
+        self.groups.append(entry)
+        if active_listener is not None:
+            active_listener(entry)
+        return entry
+
+    def count(self, status):
+        return len([g for g in self.groups if g["status"] == status])
+
+    @property
+    def failed(self):
+        return [g for g in self.groups if g["status"] == FAILED]
+
+    def as_dict(self):
+        return {
+            "blendfile": self.blendfile,
+            "seconds": self.seconds,
+            "exported": self.count(EXPORTED),
+            "cached": self.count(CACHED),
+            "failed": self.count(FAILED),
+            "deferred": self.count(DEFERRED),
+            "stats": self.stats,
+            "groups": self.groups,
+        }
+
+    def write(self, path):
+        export_dir = os.path.dirname(path)
+        if export_dir and not os.path.exists(export_dir):
+            os.makedirs(export_dir)
+
+        with open(path, "w") as report_file:
+            json.dump(self.as_dict(), report_file, indent=2)
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "r") as report_file:
+            data = json.load(report_file)
+
+        return cls(data.get("blendfile", ""), data.get("groups", []),
+                   data.get("seconds", 0.0), data.get("stats", {}))
+
+    @classmethod
+    def merge(cls, reports, blendfile="", seconds=0.0, order=None):
+        """
+        Merge reports into one. Groups are sorted to match
+        `order` (a list of group names) when given.
+        """
+        groups = [group for report in reports for group in report.groups]
+        if order is not None:
+            position = {name: idx for idx, name in enumerate(order)}
+            groups.sort(key=lambda g: position.get(g["name"], len(position)))
+
+        merged = cls(blendfile, groups, seconds)
+        for report in reports:
+            for name, values in report.stats.items():
+                merged.add_stats(name, **values)
+        return merged
+
+
+class GroupTimings:
+    """
+    Wall time spent in each stage of the export pipeline for one
+    group, and counts describing its output, like file size and
+    the number of vertices and bones.
+
+    A stage started inside another, like resolving the objects of a
+    rule-based group during validation, is only counted in the inner
+    one, so stage times add up to at most the group's time.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.counts = {}
+        # Time spent in nested stages, for each stage running
+        self.nested = []
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        self.nested.append(0.0)
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            nested = self.nested.pop()
+            self.stages[name] = self.stages.get(name, 0.0) + seconds - nested
+            if self.nested:
+                self.nested[-1] += seconds
+
+    def add_counts(self, **values):
+        for key, value in values.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def as_dict(self):
+        order = list(STAGES) + sorted(set(self.stages) - set(STAGES))
+        return {
+            "stages": {name: self.stages[name] for name in order if name in self.stages},
+            "counts": dict(self.counts),
+        }
+
+
+# Timings of the group being exported, if they are being recorded
+active_timings = None
+
+
+@contextlib.contextmanager
+def record_timings(timings=None):
+    """Collect the stages and counts of everything exported inside the block."""
+    global active_timings
+    previous = active_timings
+    active_timings = timings if timings is not None else GroupTimings()
+    try:
+        yield active_timings
+    finally:
+        active_timings = previous
+
+
+def stage(name):
+    """Time a pipeline stage of the group being recorded, if any."""
+    if active_timings is None:
+        return contextlib.nullcontext()
+    return active_timings.stage(name)
+
+
+def add_counts(**values):
+    if active_timings is not None:
+        active_timings.add_counts(**values)
+
+
+# Called with every group added to a report, if groups are being listened to
+active_listener = None
+
+
+@contextlib.contextmanager
+def listen(callback):
+    """Call `callback` with the entry of every group added to a report inside the block."""
+    global active_listener
+    previous = active_listener
+    active_listener = callback
+    try:
+        yield
+    finally:
+        active_listener = previous
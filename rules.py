@@ -0,0 +1,160 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import contextlib
+import fnmatch
+import re
+import time
+
+
+def group_has_rules(group):
+    """Return true if a group selects any objects by rules."""
+    return group.use_rules and bool(
+        group.rule_collection
+        or group.rule_name_pattern
+        or group.rule_object_types
+        or group.rule_property)
+
+
+class SceneIndex:
+    """
+    Objects of a scene indexed by name and type, with the members of
+    collections and the objects carrying a custom property indexed on
+    first use. Built once per export run, so every rule-based group
+    resolves against it without rescanning the scene.
+    """
+
+    def __init__(self, scene):
+        time_start = time.perf_counter()
+        self.scene_pointer = scene.as_pointer()
+        self.objects = list(scene.objects)
+        self.names = {obj.name: obj for obj in self.objects}
+
+        self.by_type = {}
+        for obj in self.objects:
+            self.by_type.setdefault(obj.type, []).append(obj)
+
+        self.by_collection = {}
+        self.by_property = {}
+        self.seconds = time.perf_counter() - time_start
+
+    def in_collection(self, collection):
+        """Return the scene objects in a collection or its children."""
+        members = self.by_collection.get(collection.name)
+        if members is None:
+            names = self.names
+            members = [obj for obj in collection.all_objects if obj.name in names]
+            self.by_collection[collection.name] = members
+        return members
+
+    def with_property(self, name):
+        """Return the scene objects that have a custom property."""
+        members = self.by_property.get(name)
+        if members is None:
+            members = [obj for obj in self.objects if name in obj]
+            self.by_property[name] = members
+        return members
+
+    def resolve(self, group):
+        """
+        Return the objects matched by all the rules of a group. The
+        most selective indexed rule gives the candidates, which the
+        remaining rules then filter.
+        """
+        if not group_has_rules(group):
+            return []
+
+        types = set(group.rule_object_types)
+        if group.rule_collection is not None:
+            candidates = self.in_collection(group.rule_collection)
+        elif group.rule_property:
+            candidates = self.with_property(group.rule_property)
+        elif types:
+            candidates = [obj for obj_type in sorted(types)
+                          for obj in self.by_type.get(obj_type, [])]
+        else:
+            candidates = self.objects
+
+        match_name = name_matcher(group.rule_name_pattern, group.rule_name_match)
+        prop = group.rule_property
+        value = group.rule_property_value
+
+        matched = []
+        for obj in candidates:
+            if types and obj.type not in types:
+                continue
+            if match_name is not None and not match_name(obj.name):
+                continue
+            if prop:
+                if prop not in obj:
+                    continue
+                if value and str(obj[prop]) != value:
+                    continue
+            matched.append(obj)
+
+        return sorted(matched, key=lambda obj: obj.name)
+
+
+def name_matcher(pattern, match_type='GLOB'):
+    """
+    Return a function matching object names against a glob, like
+    "SM_*", or a regular expression searched anywhere in the name.
+    An invalid regular expression matches no names, and rule_error()
+    tells why.
+    """
+    if not pattern:
+        return None
+    if match_type == 'REGEX':
+        try:
+            return re.compile(pattern).search
+        except re.error:
+            return lambda name: None
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+def rule_error(group):
+    """Return why the rules of a group cannot match anything as written, or an empty string."""
+    if not group.use_rules or not group.rule_name_pattern or group.rule_name_match != 'REGEX':
+        return ""
+    try:
+        re.compile(group.rule_name_pattern)
+    except re.error as e:
+        return "Invalid name pattern: {0}.".format(e)
+    return ""
+
+
+# Index shared by the groups of the export run in progress, if any
+active_index = None
+
+
+@contextlib.contextmanager
+def scene_index(scene):
+    """Resolve every rule-based group inside the block through one index."""
+    global active_index
+    previous = active_index
+    active_index = SceneIndex(scene)
+    try:
+        yield active_index
+    finally:
+        active_index = previous
+
+
+def index_for_scene(scene):
+    if active_index is not None and active_index.scene_pointer == scene.as_pointer():
+        return active_index
+    return SceneIndex(scene)
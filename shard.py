@@ -0,0 +1,199 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import json
+import os
+
+# numpy is only imported where cells are built, as importing it is a
+# large part of the add-on's startup cost
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".cells.json"
+
+# Octree cells stop splitting at this depth, even when they hold
+# more objects than allowed, like many objects stacked in one spot
+MAX_OCTREE_DEPTH = 8
+
+
+class Cell:
+    """A cell of a sharded group: its bounds, and the objects it holds by index."""
+
+    def __init__(self, name, bounds_min, bounds_max, members):
+        self.name = name
+        self.bounds_min = bounds_min
+        self.bounds_max = bounds_max
+        self.members = members
+
+
+def is_sharded(group):
+    return group.shard_mode != 'NONE'
+
+
+def settings(group):
+    """Return the shard settings of a group, for fingerprints and the output manifest."""
+    if group.shard_mode == 'GRID':
+        return {"mode": 'GRID', "cell_size": group.shard_cell_size}
+    return {"mode": group.shard_mode, "max_objects": group.shard_max_objects}
+
+
+def index_path(export_path):
+    """Return the index file of a sharded group exported to `export_path`."""
+    return os.path.splitext(export_path)[0] + INDEX_SUFFIX
+
+
+def cell_path(path, cell_name):
+    """Return the file of a cell, next to the index at `path`."""
+    return "{0}_{1}.fbx".format(path[:-len(INDEX_SUFFIX)], cell_name)
+
+
+def world_bounds(objects):
+    """
+    Return the world space bounding boxes of objects as two (n, 3)
+    arrays of minimum and maximum corners. Bounding boxes and
+    matrices of every object in the file are read in bulk, which
+    stays fast for groups of 100k objects.
+    """
+    from . mesh_data import foreach_get, np
+
+    rows = {obj.as_pointer(): idx for idx, obj in enumerate(bpy.data.objects)}
+    rows = np.array([rows[obj.as_pointer()] for obj in objects], dtype=np.int64)
+
+    matrices = foreach_get(bpy.data.objects, "matrix_world", 16, np.float32)
+    corners = foreach_get(bpy.data.objects, "bound_box", 24, np.float32)
+    matrices = matrices[rows].astype(np.float64).reshape(-1, 4, 4)
+    corners = corners[rows].astype(np.float64).reshape(-1, 8, 3)
+
+    # Matrices are stored column by column, so rows of points are
+    # multiplied by them as they are, and translation is the last row
+    world = corners @ matrices[:, :3, :3] + matrices[:, 3:, :3]
+    return world.min(axis=1), world.max(axis=1)
+
+
+def build_cells(objects, group):
+    """Split objects into the cells of a group's grid or octree, by their bounding box centers."""
+    bounds_min, bounds_max = world_bounds(objects)
+    centers = (bounds_min + bounds_max) * 0.5
+
+    if group.shard_mode == 'GRID':
+        cells = grid_cells(centers, group.shard_cell_size)
+    else:
+        cells = octree_cells(centers, group.shard_max_objects)
+
+    for cell in cells:
+        cell.content_min = bounds_min[cell.members].min(axis=0)
+        cell.content_max = bounds_max[cell.members].max(axis=0)
+    return sorted(cells, key=lambda cell: cell.name)
+
+
+def grid_cells(centers, cell_size):
+    from . mesh_data import np
+
+    coords = np.floor(centers / cell_size).astype(np.int64)
+    keys, inverse = np.unique(coords, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    order = np.argsort(inverse, kind="stable")
+    splits = np.cumsum(np.bincount(inverse, minlength=len(keys)))[:-1]
+    return [Cell("{0}_{1}_{2}".format(*key), key * cell_size, (key + 1) * cell_size, members)
+            for key, members in zip(keys, np.split(order, splits))]
+
+
+def octree_cells(centers, max_objects):
+    """
+    Split a cube around the centers into octants until each holds at
+    most `max_objects`. Cells are named by the octants leading to
+    them, so neighbouring cells share a prefix.
+    """
+    from . mesh_data import np
+
+    origin = centers.min(axis=0)
+    size = max(float((centers.max(axis=0) - origin).max()), 1e-6)
+    octant_bits = np.array([1, 2, 4])
+
+    cells = []
+    stack = [("0", origin, size, np.arange(len(centers)))]
+    while stack:
+        name, origin, size, members = stack.pop()
+        if len(members) <= max_objects or len(name) > MAX_OCTREE_DEPTH:
+            cells.append(Cell(name, origin, origin + size, members))
+            continue
+
+        half = size * 0.5
+        octants = ((centers[members] >= origin + half) * octant_bits).sum(axis=1)
+        for octant in range(8):
+            child_members = members[octants == octant]
+            if len(child_members):
+                offset = ((octant >> np.arange(3)) & 1) * half
+                stack.append((name + str(octant), origin + offset, half, child_members))
+    return cells
+
+
+def encode_index(group, cells, objects, path, options):
+    """
+    Return the index of a sharded group as JSON bytes. It lists
+    the bounds of every cell, in Blender world space with Z up, and
+    its file relative to the index, so a runtime can stream cells.
+    """
+    def bounds(lower, upper):
+        return {"min": [round(float(v), 6) for v in lower],
+                "max": [round(float(v), 6) for v in upper]}
+
+    index = dict(settings(group), **{
+        "version": INDEX_VERSION,
+        "group": group.name,
+        # Both exporters default to Blender's FBX axes
+        "axis_forward": options.get("axis_forward", "-Z"),
+        "axis_up": options.get("axis_up", "Y"),
+        "cells": [{
+            "name": cell.name,
+            "file": os.path.basename(cell_path(path, cell.name)),
+            "bounds": bounds(cell.bounds_min, cell.bounds_max),
+            "content_bounds": bounds(cell.content_min, cell.content_max),
+            "objects": sorted(objects[idx].name for idx in cell.members),
+        } for cell in cells],
+    })
+    return json.dumps(index, indent=1, sort_keys=True).encode("utf-8")
+
+
+def read_index(path):
+    try:
+        with open(path, "r") as index_file:
+            index = json.load(index_file)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+
+def outputs(export_path, objects=()):
+    """
+    Return (path, objects) for every file an export to `export_path`
+    wrote: the file itself, and the cells its index lists if it is
+    the index of a sharded group.
+    """
+    files = [(export_path, list(objects))]
+    if not export_path.endswith(INDEX_SUFFIX):
+        return files
+
+    index = read_index(export_path) or {}
+    export_dir = os.path.dirname(export_path)
+    files += [(os.path.join(export_dir, cell["file"]), cell["objects"])
+              for cell in index.get("cells", [])]
+    return files
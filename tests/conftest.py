@@ -0,0 +1,82 @@
+"""
+Test setup for the parts of the add-on that run without Blender.
+
+Outside Blender, bpy is replaced by the few parts of its API the
+add-on touches when its modules are imported: base classes to derive
+operators and property groups from, property definitions and handler
+decorators. Nothing is registered, so only pure Python and numpy code
+can be tested, along with code given plain stand-ins for bpy data.
+
+The add-on's modules are imported as the fbx_preflight package, as
+Blender names it when installed.
+"""
+
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TypesStandIn(types.ModuleType):
+    """bpy.types, with an empty class for every type asked for."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        cls = type(name, (), {})
+        setattr(self, name, cls)
+        return cls
+
+
+class PropsStandIn(types.ModuleType):
+    """bpy.props, with every property definition returned as is."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda **kwargs: (name, kwargs)
+
+
+def blender_stand_in():
+    bpy = types.ModuleType("bpy")
+    bpy.types = TypesStandIn("bpy.types")
+    bpy.props = PropsStandIn("bpy.props")
+    bpy.path = types.SimpleNamespace(
+        abspath=lambda path, start=None: os.path.abspath(path),
+        relpath=lambda path, start=None: os.path.relpath(path, start),
+        clean_name=lambda name: name)
+
+    handlers = types.ModuleType("bpy.app.handlers")
+    handlers.persistent = lambda function: function
+    handlers.save_pre = []
+    handlers.load_post = []
+    handlers.depsgraph_update_post = []
+    bpy.app = types.ModuleType("bpy.app")
+    bpy.app.handlers = handlers
+    bpy.app.background = True
+    bpy.app.version = (4, 2, 0)
+
+    bpy.utils = types.ModuleType("bpy.utils")
+    bpy.utils.register_class = bpy.utils.unregister_class = lambda cls: None
+
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Matrix = mathutils.Vector = None
+
+    return {"bpy": bpy, "bpy.types": bpy.types, "bpy.props": bpy.props,
+            "bpy.app": bpy.app, "bpy.app.handlers": handlers,
+            "bpy.utils": bpy.utils, "mathutils": mathutils}
+
+
+try:
+    import bpy  # noqa: F401
+except ImportError:
+    sys.modules.update(blender_stand_in())
+
+if "fbx_preflight" not in sys.modules:
+    package = types.ModuleType("fbx_preflight")
+    package.__path__ = [ROOT]
+    sys.modules["fbx_preflight"] = package
+
+# The CLI scripts import each other as top-level modules
+sys.path.insert(0, os.path.join(ROOT, "cli"))
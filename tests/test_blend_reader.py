@@ -0,0 +1,33 @@
+import os
+import struct
+
+import blend_reader
+
+TEST_BLEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "Preflight Test.blend")
+
+
+def reader(endian):
+    """A BlendFile that only knows its byte order, for decoding values."""
+    blend = blend_reader.BlendFile.__new__(blend_reader.BlendFile)
+    blend.endian = endian
+    return blend
+
+
+def test_float_and_double_properties_follow_the_file_byte_order():
+    for endian in "<>":
+        val = struct.unpack(endian + "i", struct.pack(endian + "f", 1.5))[0]
+        prop = {"type": blend_reader.IDP_FLOAT, "data": {"val": val}}
+        assert reader(endian).read_idproperty(prop) == 1.5
+
+        val, val2 = struct.unpack(endian + "ii", struct.pack(endian + "d", -0.25))
+        prop = {"type": blend_reader.IDP_DOUBLE, "data": {"val": val, "val2": val2}}
+        assert reader(endian).read_idproperty(prop) == -0.25
+
+
+def test_read_preflight_reads_the_groups_of_the_test_file():
+    preflight = blend_reader.read_preflight(TEST_BLEND)
+    assert preflight["export_location"] == "//preflight"
+    assert [group["name"] for group in preflight["groups"]] == ["Export Group 1"]
+    for group in preflight["groups"]:
+        assert set(group["objects"]) <= set(preflight["objects"])
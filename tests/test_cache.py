@@ -0,0 +1,131 @@
+from types import SimpleNamespace
+
+from fbx_preflight import cache
+
+
+class Collection(list):
+    """A bpy collection of items with plain attributes."""
+
+    def foreach_get(self, attr, values):
+        flat = []
+        for item in self:
+            value = getattr(item, attr)
+            flat.extend(value if isinstance(value, (list, tuple)) else [value])
+        values[:] = type(values)(values.typecode, flat)
+
+
+class Datablock(SimpleNamespace):
+    """An ID with custom properties."""
+
+    def __init__(self, properties=None, **attrs):
+        super().__init__(**attrs)
+        self.properties = dict(properties or {})
+
+    def keys(self):
+        return self.properties.keys()
+
+    def __getitem__(self, key):
+        return self.properties[key]
+
+
+def items(**columns):
+    names = list(columns)
+    return Collection(SimpleNamespace(**dict(zip(names, row))) for row in zip(*columns.values()))
+
+
+def quad_mesh():
+    return Datablock(
+        name="Quad",
+        vertices=items(co=[(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0)]),
+        polygons=items(loop_total=[4], material_index=[0], use_smooth=[False]),
+        loops=items(vertex_index=[0, 1, 2, 3]),
+        edges=items(use_edge_sharp=[False] * 4),
+        uv_layers=Collection(),
+        shape_keys=None,
+        color_attributes=Collection(),
+        has_custom_normals=False,
+        corner_normals=items(vector=[(0.0, 0.0, 1.0)] * 4))
+
+
+def quad_object(mesh=None):
+    return Datablock(
+        name="Quad", type='MESH', parent=None, parent_bone="",
+        matrix_world=[[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0],
+                      [0.0, 0.0, 1.0, 0.0], [0.0, 0.0, 0.0, 1.0]],
+        material_slots=[], vertex_groups=[], modifiers=[], animation_data=None,
+        data=mesh or quad_mesh())
+
+
+def fingerprint(obj):
+    group = SimpleNamespace(name="Props")
+    return cache.fingerprint_group(group, [obj], {"use_mesh_modifiers": True})
+
+
+def test_fingerprint_is_stable():
+    assert fingerprint(quad_object()) == fingerprint(quad_object())
+
+
+def test_fingerprint_covers_shape_keys():
+    obj = quad_object()
+    before = fingerprint(obj)
+
+    basis = SimpleNamespace(
+        name="Basis", value=0.0, slider_min=0.0, slider_max=1.0, mute=False,
+        vertex_group="", interpolation='KEY_LINEAR', data=items(co=[v.co for v in obj.data.vertices]))
+    basis.relative_key = basis
+    smile = SimpleNamespace(
+        name="Smile", relative_key=basis, value=0.0, slider_min=0.0, slider_max=1.0,
+        mute=False, vertex_group="", interpolation='KEY_LINEAR',
+        data=items(co=[v.co for v in obj.data.vertices]))
+    obj.data.shape_keys = SimpleNamespace(use_relative=True, key_blocks=[basis, smile])
+    with_keys = fingerprint(obj)
+    assert with_keys != before
+
+    smile.data[2].co = (1.0, 1.5, 0.0)
+    assert fingerprint(obj) != with_keys
+
+
+def test_fingerprint_covers_color_attributes():
+    obj = quad_object()
+    before = fingerprint(obj)
+
+    layer = SimpleNamespace(name="Color", domain='CORNER',
+                            data=items(color=[(1.0, 1.0, 1.0, 1.0)] * 4))
+    obj.data.color_attributes.append(layer)
+    painted = fingerprint(obj)
+    assert painted != before
+
+    layer.data[0].color = (1.0, 0.0, 0.0, 1.0)
+    assert fingerprint(obj) != painted
+
+
+def test_fingerprint_covers_custom_normals():
+    obj = quad_object()
+    before = fingerprint(obj)
+
+    obj.data.has_custom_normals = True
+    custom = fingerprint(obj)
+    assert custom != before
+
+    obj.data.corner_normals[0].vector = (0.0, 0.6, 0.8)
+    assert fingerprint(obj) != custom
+
+
+def test_fingerprint_covers_custom_properties():
+    obj = quad_object()
+    before = fingerprint(obj)
+
+    obj.properties["lightmap_scale"] = 2
+    on_object = fingerprint(obj)
+    assert on_object != before
+
+    obj.data.properties["collider"] = "box"
+    assert fingerprint(obj) != on_object
+
+
+def test_fingerprint_covers_export_options():
+    obj = quad_object()
+    group = SimpleNamespace(name="Props")
+    fast = cache.fingerprint_group(group, [obj], {"export_backend": 'FAST'})
+    blender = cache.fingerprint_group(group, [obj], {"export_backend": 'FBX'})
+    assert fast != blender
@@ -0,0 +1,35 @@
+import os
+import socket
+
+import preflight_daemon
+
+
+def test_socket_path_in_a_new_directory_is_private(tmp_path):
+    socket_path = str(tmp_path / "run" / "preflight.sock")
+    assert preflight_daemon.check_socket_path(socket_path) == ""
+    assert os.stat(str(tmp_path / "run")).st_mode & 0o777 == 0o700
+
+
+def test_socket_path_must_not_be_a_file(tmp_path):
+    socket_path = tmp_path / "preflight.sock"
+    socket_path.write_text("")
+    assert "not a socket" in preflight_daemon.check_socket_path(str(socket_path))
+
+
+def test_stale_socket_can_be_replaced(tmp_path):
+    socket_path = str(tmp_path / "preflight.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.close()
+    assert preflight_daemon.check_socket_path(socket_path) == ""
+    assert not preflight_daemon.socket_is_live(socket_path)
+
+
+def test_shared_fallback_directory_is_refused(tmp_path, monkeypatch):
+    socket_dir = tmp_path / "preflight-1000"
+    socket_dir.mkdir(mode=0o755)
+    os.chmod(str(socket_dir), 0o755)
+    socket_path = str(socket_dir / "preflight.sock")
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(preflight_daemon, "DEFAULT_SOCKET", socket_path)
+    assert "other users" in preflight_daemon.check_socket_path(socket_path)
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+from fbx_preflight import fast_writer
+
+
+class Datablock(SimpleNamespace):
+    def __init__(self, properties=None, **attrs):
+        super().__init__(**attrs)
+        self.properties = dict(properties or {})
+
+    def keys(self):
+        return self.properties.keys()
+
+    def __getitem__(self, key):
+        return self.properties[key]
+
+
+def mesh_object(**mesh_attrs):
+    mesh = SimpleNamespace(**dict({"shape_keys": None, "color_attributes": []}, **mesh_attrs))
+    return Datablock(type='MESH', modifiers=[], animation_data=None,
+                     material_slots=[], data=mesh)
+
+
+OPTIONS = {"object_types": {'MESH', 'EMPTY'}}
+
+
+def test_plain_meshes_use_the_fast_writer():
+    assert fast_writer.can_export([mesh_object()], OPTIONS)
+
+
+def test_shape_keys_and_vertex_colors_fall_back():
+    shape_keys = SimpleNamespace(key_blocks=[])
+    assert not fast_writer.can_export([mesh_object(shape_keys=shape_keys)], OPTIONS)
+    assert not fast_writer.can_export([mesh_object(color_attributes=["Color"])], OPTIONS)
+
+
+def test_custom_props_the_fast_writer_cannot_write_fall_back():
+    options = dict(OPTIONS, use_custom_props=True)
+    obj = mesh_object()
+    obj.properties.update(screen_size=0.5, lod="LOD0", _hidden=[1, 2])
+    assert fast_writer.can_export([obj], options)
+
+    obj.properties["flags"] = [1, 2, 3]
+    assert not fast_writer.can_export([obj], options)
+    # Only written when custom properties are exported
+    assert fast_writer.can_export([obj], OPTIONS)
+
+    obj = mesh_object()
+    material = Datablock(properties={"surface": "metal"})
+    obj.material_slots = [SimpleNamespace(material=material)]
+    assert not fast_writer.can_export([obj], options)
@@ -0,0 +1,62 @@
+import struct
+import zlib
+
+from fbx_preflight import fbx_binary, output
+
+ELEM_HEAD = struct.Struct("<3IB")
+
+
+def elements(data, elem=None):
+    """Read the top level elements of an encoded file, or the children of one."""
+    stream = SeekableBytes(data)
+    if elem is None:
+        elem = (b"", 0, len(fbx_binary.HEAD_MAGIC) + 4, len(data))
+    return list(output.walk_children(stream, ELEM_HEAD, elem))
+
+
+class SeekableBytes:
+    """Bytes read like a file, without copying them into one."""
+
+    def __init__(self, data):
+        self.data = data
+        self.offset = 0
+
+    def seek(self, offset):
+        self.offset = offset
+
+    def read(self, size):
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+
+def test_encoded_elements_can_be_walked():
+    header = fbx_binary.FBXElem(b"FBXHeaderExtension")
+    fbx_binary.elem_data(header, b"FBXVersion", fbx_binary.FBX_VERSION)
+    fbx_binary.elem_data(header, b"Creator", "Preflight")
+    objects = fbx_binary.FBXElem(b"Objects")
+    data = fbx_binary.encode([header, objects])
+
+    assert data.startswith(fbx_binary.HEAD_MAGIC)
+    assert data.endswith(fbx_binary.FOOT_MAGIC)
+    top = elements(data)
+    assert [elem[0] for elem in top] == [b"FBXHeaderExtension", b"Objects"]
+    assert [elem[0] for elem in elements(data, top[0])] == [b"FBXVersion", b"Creator"]
+
+    version = elements(data, top[0])[0]
+    assert data[version[1]:version[1] + 1] == b"I"
+    assert struct.unpack_from("<i", data, version[1] + 1)[0] == fbx_binary.FBX_VERSION
+
+
+def test_large_arrays_are_compressed():
+    values = list(range(100))
+    elem = fbx_binary.FBXElem(b"Indices")
+    elem.add_array(b"i", struct.pack("<100i", *values))
+    data = elem.encode(0, is_last=True)
+
+    props = ELEM_HEAD.size + len(b"Indices")
+    assert data[props:props + 1] == b"i"
+    count, encoding, size = struct.unpack_from("<3I", data, props + 1)
+    assert (count, encoding) == (100, 1)
+    payload = data[props + 13:props + 13 + size]
+    assert list(struct.unpack("<100i", zlib.decompress(payload))) == values
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from fbx_preflight import lods
+
+
+def mesh_object(name):
+    return SimpleNamespace(name=name, type='MESH', modifiers=[])
+
+
+def test_chain_names_match_unitys_lod_convention():
+    names = lods.chain_names(mesh_object("Rock"), [(1.0, 0.5), (0.5, 0.2)])
+    assert names == ["Rock_LODGroup", "Rock_LOD0", "Rock_LOD1"]
+
+
+def test_taken_chain_names_are_refused(monkeypatch):
+    existing = {"Rock": None, "Rock_LOD1": None, "Tree_LODGroup": None}
+    monkeypatch.setattr(lods.bpy, "data", SimpleNamespace(objects=existing), raising=False)
+    levels = [(1.0, 0.5), (0.5, 0.2)]
+
+    lods.check_names([mesh_object("Bush")], levels)
+    with pytest.raises(ValueError, match="Rock_LOD1"):
+        lods.check_names([mesh_object("Rock"), mesh_object("Bush")], levels)
+    # Objects that keep their own mesh do not need the names
+    armature = SimpleNamespace(name="Tree", type='ARMATURE', modifiers=[])
+    lods.check_names([armature], levels)
+
+
+def lod_group(ratios, screen_sizes):
+    return SimpleNamespace(lod_ratios=ratios, lod_screen_sizes=screen_sizes)
+
+
+def test_levels_start_with_the_full_mesh():
+    assert lods.levels(lod_group("0.5, 0.25", "0.6 0.3 0.1")) == [
+        (1.0, 0.6), (0.5, 0.3), (0.25, 0.1)]
+
+
+def test_levels_refuse_settings_unity_would_not_accept():
+    for ratios, screen_sizes in (("0.5", "0.6 0.3 0.1"), ("1.5", "0.6 0.3"),
+                                 ("0.5", "0.3 0.6"), ("half", "0.6 0.3")):
+        with pytest.raises(ValueError):
+            lods.levels(lod_group(ratios, screen_sizes))
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from fbx_preflight import memory
+
+
+def mesh_object(vertices):
+    return SimpleNamespace(type='MESH', data=SimpleNamespace(vertices=[None] * vertices))
+
+
+def test_vertex_count_skips_other_objects():
+    objects = [mesh_object(8), SimpleNamespace(type='ARMATURE', data=None), None, mesh_object(4)]
+    assert memory.count_vertices(objects) == 12
+
+
+def test_vertex_cost_starts_from_the_default():
+    cost = memory.VertexCost(default=500)
+    assert cost.estimate(1000) == 500000
+
+
+def test_vertex_cost_is_weighed_by_vertices():
+    cost = memory.VertexCost(default=500)
+    cost.measure(100000, 30000000)
+    # A small group's fixed cost barely moves the estimate
+    cost.measure(10, 1000000)
+    assert 300 < cost.bytes_per_vertex < 311
+    assert cost.estimate(1000) == int(1000 * cost.bytes_per_vertex)
+
+
+def test_vertex_cost_ignores_unmeasured_groups():
+    cost = memory.VertexCost(default=500)
+    cost.measure(100000, None)
+    cost.measure(0, 1000)
+    assert cost.bytes_per_vertex == 500
@@ -0,0 +1,149 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from fbx_preflight import mesh_data
+
+
+class Collection(list):
+    """A bpy collection of items with plain attributes."""
+
+    def foreach_get(self, attr, values):
+        values[:] = np.asarray([getattr(item, attr) for item in self]).reshape(-1)
+
+
+def items(**columns):
+    names = list(columns)
+    return Collection(SimpleNamespace(**dict(zip(names, row))) for row in zip(*columns.values()))
+
+
+def quad_mesh():
+    return SimpleNamespace(
+        polygons=items(loop_start=[0], loop_total=[4], material_index=[0]),
+        vertices=items(co=[(0.0, 0.0, 0.0), (1.0, 0.0, 0.0), (1.0, 1.0, 0.0), (0.0, 1.0, 0.0)]),
+        loops=items(vertex_index=[0, 1, 2, 3]),
+        corner_normals=items(vector=[(0.0, 0.0, 1.0)] * 4),
+        uv_layers=[])
+
+
+def grid_buffers(size, seed=None):
+    """A flat grid of size x size quads, split into triangles, in a random order with `seed`."""
+    xs, ys = np.meshgrid(np.arange(size + 1), np.arange(size + 1))
+    positions = np.stack([xs.ravel(), ys.ravel(), np.zeros(xs.size)], axis=1).astype(np.float32)
+    corner = (np.arange(size)[:, None] * (size + 1) + np.arange(size)[None, :]).ravel()
+    quads = np.stack([corner, corner + 1, corner + size + 2, corner + size + 1], axis=1)
+    if seed is not None:
+        quads = quads[np.random.default_rng(seed).permutation(len(quads))]
+
+    loop_vertices = quads.reshape(-1).astype(np.int32)
+    loops = np.arange(len(loop_vertices), dtype=np.int32).reshape(-1, 4)
+    return mesh_data.MeshBuffers(
+        positions=positions,
+        loop_vertices=loop_vertices,
+        loop_totals=np.full(len(quads), 4, dtype=np.int32),
+        normals=np.tile(np.array([0.0, 0.0, 1.0], dtype=np.float32), (len(loop_vertices), 1)),
+        uv_layers=[("UVMap", positions[loop_vertices, :2] / size)],
+        material_indices=np.zeros(len(quads), dtype=np.int32),
+        triangles=np.concatenate([loops[:, [0, 1, 2]], loops[:, [0, 2, 3]]]),
+        triangle_polygons=np.tile(np.arange(len(quads), dtype=np.int32), 2))
+
+
+def acmr(buffers, cache_size=mesh_data.VERTEX_CACHE_SIZE):
+    """Average vertices transformed per triangle through a FIFO cache."""
+    cache = []
+    misses = 0
+    for vertex in buffers.loop_vertices[buffers.triangles.reshape(-1)].tolist():
+        if vertex not in cache:
+            misses += 1
+            cache.append(vertex)
+            if len(cache) > cache_size:
+                cache.pop(0)
+    return misses / len(buffers.triangles)
+
+
+def test_optimize_welds_grid_vertices_and_keeps_triangles():
+    buffers = grid_buffers(8, seed=1)
+    optimized = mesh_data.optimize(buffers)
+
+    assert optimized.vertex_count == 81
+    assert len(optimized.triangles) == 128
+    assert optimized.loop_vertices.max() == 80
+    # Vertices are numbered in order of first use
+    first_use = np.unique(optimized.loop_vertices, return_index=True)[1]
+    assert np.all(np.diff(first_use) > 0)
+
+
+def test_optimize_orders_triangles_for_the_vertex_cache():
+    buffers = grid_buffers(40, seed=2)
+    optimized = mesh_data.optimize(buffers)
+
+    assert acmr(optimized) < 0.8
+    assert acmr(optimized) < acmr(buffers) / 2
+
+
+def test_optimize_only_welds_loops_that_match():
+    buffers = grid_buffers(2)
+    # A UV seam down the middle column of vertices, and a hard edge on one quad
+    seam = buffers.positions[buffers.loop_vertices, 0] == 1.0
+    left = np.repeat(np.arange(4) % 2 == 0, 4)
+    buffers.uv_layers[0][1][seam & left, 0] = 0.75
+    buffers.normals[4:8] = (0.0, 0.6, 0.8)
+
+    optimized = mesh_data.optimize(buffers)
+    corners = optimized.loop_vertices
+    for name, uvs in optimized.uv_layers:
+        for vertex in range(optimized.vertex_count):
+            assert len(np.unique(uvs[corners == vertex], axis=0)) == 1
+    for vertex in range(optimized.vertex_count):
+        assert len(np.unique(optimized.normals[corners == vertex], axis=0)) == 1
+    assert optimized.vertex_count > 9
+
+
+def test_optimize_welds_negative_zero():
+    buffers = grid_buffers(1)
+    duplicate = mesh_data.MeshBuffers(
+        positions=np.concatenate([buffers.positions, buffers.positions * np.float32(-0.0) + buffers.positions]),
+        loop_vertices=buffers.loop_vertices,
+        loop_totals=buffers.loop_totals,
+        normals=buffers.normals,
+        uv_layers=buffers.uv_layers,
+        material_indices=buffers.material_indices,
+        triangles=buffers.triangles,
+        triangle_polygons=buffers.triangle_polygons)
+    duplicate.positions[0, 2] = -0.0
+    duplicate.loop_vertices = duplicate.loop_vertices.copy()
+    duplicate.loop_vertices[0] = 4
+
+    optimized = mesh_data.optimize(duplicate)
+    assert optimized.vertex_count == 4
+    assert not np.signbit(optimized.positions).any()
+
+
+def test_tipsify_emits_every_triangle_once():
+    corners = grid_buffers(10, seed=3)
+    order, cluster_starts = mesh_data.tipsify(
+        corners.loop_vertices[corners.triangles], 121, mesh_data.VERTEX_CACHE_SIZE)
+    assert sorted(order.tolist()) == list(range(200))
+    assert cluster_starts[0] == 0
+
+
+def test_morton_codes_follow_each_axis():
+    points = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 1]], dtype=np.float32)
+    codes = mesh_data.morton_codes(points).tolist()
+    assert codes[0] == 0
+    assert codes[1] < codes[2] < codes[3] < codes[4]
+
+
+def test_extract_mesh_only_triangulates_when_asked():
+    mesh = quad_mesh()
+    buffers = mesh_data.extract_mesh(mesh)
+    assert buffers.triangles is None
+    assert buffers.nbytes == sum(a.nbytes for a in (
+        buffers.positions, buffers.loop_vertices, buffers.loop_totals,
+        buffers.normals, buffers.material_indices))
+
+    mesh.calc_loop_triangles = lambda: None
+    mesh.loop_triangles = items(loops=[(0, 1, 2), (0, 2, 3)], polygon_index=[0, 0])
+    buffers = mesh_data.extract_mesh(mesh, triangles=True)
+    assert buffers.triangles.tolist() == [[0, 1, 2], [0, 2, 3]]
+    assert mesh_data.optimize(buffers).vertex_count == 4
@@ -0,0 +1,124 @@
+import json
+import os
+
+from fbx_preflight import fbx_binary, output
+
+
+def write(path, data=b"fbx"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as output_file:
+        output_file.write(data)
+
+
+def manifest_with(tmp_path, names):
+    """Save a manifest listing one file per name, from a full run."""
+    manifest = output.OutputManifest(str(tmp_path / output.MANIFEST_FILENAME), run="first")
+    expected = []
+    for name in names:
+        path = str(tmp_path / (name + ".fbx"))
+        write(path)
+        manifest.record(name, path, 0.0)
+        expected.append((name, path))
+    assert manifest.save(expected)
+    return manifest
+
+
+def read(tmp_path):
+    with open(str(tmp_path / output.MANIFEST_FILENAME)) as manifest_file:
+        return json.load(manifest_file)
+
+
+def test_full_run_orphans_files_no_group_writes(tmp_path):
+    manifest_with(tmp_path, ["Props", "Walls"])
+
+    manifest = output.OutputManifest.load(str(tmp_path))
+    path = str(tmp_path / "Props.fbx")
+    manifest.record("Props", path, 0.0)
+    assert manifest.save([("Props", path)])
+
+    data = read(tmp_path)
+    assert sorted(data["files"]) == ["Props.fbx"]
+    assert data["orphaned"]["Walls.fbx"]["status"] == "orphaned"
+
+
+def test_scoped_run_leaves_other_groups_alone(tmp_path):
+    manifest_with(tmp_path, ["Props", "Walls", "Hero@Run"])
+
+    # Like a partial load of Props: the scene knows nothing of the rest
+    manifest = output.OutputManifest.load(str(tmp_path))
+    path = str(tmp_path / "Props.fbx")
+    manifest.record("Props", path, 0.0)
+    assert manifest.save([("Props", path)], scope={"Props"})
+
+    data = read(tmp_path)
+    assert sorted(data["files"]) == ["Hero@Run.fbx", "Props.fbx", "Walls.fbx"]
+    assert data["orphaned"] == {}
+
+
+def test_scoped_run_orphans_files_its_groups_stopped_writing(tmp_path):
+    manifest_with(tmp_path, ["Props", "Walls"])
+
+    manifest = output.OutputManifest.load(str(tmp_path))
+    moved = str(tmp_path / "Moved" / "Props.fbx")
+    write(moved)
+    manifest.record("Props", moved, 0.0)
+    assert manifest.save([("Props", moved)], scope={"Props"})
+
+    data = read(tmp_path)
+    assert sorted(data["files"]) == ["Moved/Props.fbx", "Walls.fbx"]
+    assert list(data["orphaned"]) == ["Props.fbx"]
+
+
+def test_statuses_only_describe_the_run_that_exported_them(tmp_path):
+    manifest_with(tmp_path, ["Props", "Walls"])
+
+    manifest = output.OutputManifest.load(str(tmp_path))
+    path = str(tmp_path / "Props.fbx")
+    write(path, b"changed")
+    manifest.record("Props", path, 0.0)
+    assert manifest.save([("Props", path), ("Walls", str(tmp_path / "Walls.fbx"))])
+
+    files = read(tmp_path)["files"]
+    assert files["Props.fbx"]["status"] == output.CHANGED
+    assert files["Walls.fbx"]["status"] == output.UNCHANGED
+
+
+def blender_like_fbx(path, hour):
+    """An FBX file stamped like Blender's exporter stamps a file exported to `path`."""
+    header = fbx_binary.FBXElem(b"FBXHeaderExtension")
+    stamp = header.add(b"CreationTimeStamp")
+    fbx_binary.elem_data(stamp, b"Version", 1000)
+    for name, value in ((b"Year", 2026), (b"Month", 10), (b"Day", 18), (b"Hour", hour),
+                        (b"Minute", 30), (b"Second", 5), (b"Millisecond", 250)):
+        fbx_binary.elem_data(stamp, name, value)
+    scene_info = header.add(b"SceneInfo")
+    props = fbx_binary.elem_props(scene_info)
+    fbx_binary.elem_prop(props, b"DocumentUrl", b"KString", b"Url", b"", path.encode("utf-8"))
+    return fbx_binary.encode([header, fbx_binary.FBXElem(b"Objects")])
+
+
+def test_concurrent_stages_of_a_file_do_not_share_a_path(tmp_path):
+    filepath = str(tmp_path / "Props.fbx")
+    first = output.StagedFile(filepath)
+    second = output.StagedFile(filepath)
+
+    assert first.path != second.path
+    assert os.path.dirname(first.path) == str(tmp_path / output.STAGING_DIR)
+    assert os.path.basename(first.path).startswith("Props.")
+    assert first.path.endswith(".fbx")
+
+
+def test_stages_normalize_to_the_same_bytes(tmp_path):
+    filepath = str(tmp_path / "Props.fbx")
+    staged_bytes = []
+    for hour in (9, 17):
+        staged = output.StagedFile(filepath)
+        write(staged.path, blender_like_fbx(staged.path, hour))
+        with open(staged.path, "r+b") as staged_file:
+            staged.seal(staged_file, durable=False)
+        with open(staged.path, "rb") as staged_file:
+            staged_bytes.append(staged_file.read())
+        staged.discard()
+
+    assert staged_bytes[0] == staged_bytes[1]
+    assert output.STAGING_TOKEN_FILLER.encode("ascii") in staged_bytes[0]
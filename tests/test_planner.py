@@ -0,0 +1,52 @@
+import os
+
+import preflight_planner
+
+TEST_BLEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "test", "Preflight Test.blend")
+
+
+def file_plan(name, group_costs, file_cost=0.5, splittable=True):
+    groups = [{"name": "{0}{1}".format(name, idx), "cost": cost}
+              for idx, cost in enumerate(group_costs)]
+    return {"blendfile": name + ".blend", "file_cost": file_cost, "groups": groups,
+            "splittable": splittable, "cost": file_cost + sum(group_costs)}
+
+
+def test_plan_file_costs_the_groups_of_the_test_file():
+    plan = preflight_planner.plan_file(TEST_BLEND)
+    assert plan["error"] is None
+    assert [group["name"] for group in plan["groups"]] == ["Export Group 1"]
+    assert plan["cost"] > plan["file_cost"]
+
+
+def test_unreadable_files_are_one_job_costed_by_size(tmp_path):
+    path = tmp_path / "broken.blend"
+    path.write_bytes(b"not a blend file")
+    plan = preflight_planner.plan_file(str(path))
+    assert plan["error"]
+    assert plan["cost"] == plan["file_cost"]
+
+
+def test_big_files_are_split_across_workers():
+    plans = [file_plan("Level", [4.0, 4.0, 4.0, 4.0]), file_plan("Prop", [1.0])]
+    jobs = preflight_planner.plan_jobs(plans, workers=4)
+
+    level_jobs = [job for job in jobs if job["blendfile"] == "Level.blend"]
+    assert len(level_jobs) > 1
+    assert sorted(name for job in level_jobs for name in job["groups"]) == [
+        "Level0", "Level1", "Level2", "Level3"]
+    assert [job["cost"] for job in jobs] == sorted((job["cost"] for job in jobs), reverse=True)
+
+
+def test_files_with_clips_stay_whole():
+    jobs = preflight_planner.plan_jobs([file_plan("Hero", [4.0] * 4, splittable=False)], workers=4)
+    assert len(jobs) == 1
+    assert "groups" not in jobs[0]
+
+
+def test_split_groups_balances_cost():
+    groups = [{"name": str(cost), "cost": cost} for cost in (5.0, 4.0, 3.0, 3.0, 1.0)]
+    shares = preflight_planner.split_groups(groups, 2)
+    loads = sorted(sum(group["cost"] for group in share) for share in shares)
+    assert loads == [8.0, 8.0]
@@ -0,0 +1,51 @@
+from fbx_preflight import report
+
+
+def test_merge_orders_groups_and_adds_stats():
+    first = report.ExportReport(groups=[{"name": "Walls", "status": report.EXPORTED}],
+                                stats={"io": {"jobs": 2, "bytes": 100}})
+    second = report.ExportReport(groups=[{"name": "Props", "status": report.FAILED}],
+                                 stats={"io": {"jobs": 1}, "memory": {"deferred": 1}})
+
+    merged = report.ExportReport.merge([first, second], blendfile="level.blend",
+                                       order=["Props", "Walls"])
+    assert [group["name"] for group in merged.groups] == ["Props", "Walls"]
+    assert merged.stats == {"io": {"jobs": 3, "bytes": 100}, "memory": {"deferred": 1}}
+    assert merged.as_dict()["failed"] == 1
+
+
+def test_reports_round_trip_through_json(tmp_path):
+    export_report = report.ExportReport(blendfile="level.blend", seconds=1.5)
+    timings = report.GroupTimings()
+    timings.add_counts(bytes=10)
+    export_report.add_group("Props", report.CACHED, 0.25, "/out/Props.fbx", timings=timings)
+
+    path = str(tmp_path / "build" / "report.json")
+    export_report.write(path)
+    read = report.ExportReport.read(path)
+    assert read.as_dict() == export_report.as_dict()
+
+
+def test_listen_sees_every_group_added_inside_the_block():
+    seen = []
+    export_report = report.ExportReport()
+    with report.listen(seen.append):
+        export_report.add_group("Props", report.EXPORTED)
+        with report.listen(lambda entry: None):
+            export_report.add_group("Hidden", report.EXPORTED)
+        export_report.add_group("Walls", report.FAILED, error="Boom")
+    export_report.add_group("After", report.EXPORTED)
+
+    assert [entry["name"] for entry in seen] == ["Props", "Walls"]
+    assert seen[1]["error"] == "Boom"
+
+
+def test_nested_stages_only_count_in_the_inner_one():
+    timings = report.GroupTimings()
+    with report.record_timings(timings):
+        with report.stage("validation"):
+            with report.stage("resolve"):
+                pass
+    stages = timings.as_dict()["stages"]
+    assert list(stages) == ["validation", "resolve"]
+    assert stages["validation"] >= 0.0
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from fbx_preflight import rules
+
+
+def rule_group(pattern, match_type):
+    return SimpleNamespace(use_rules=True, rule_collection=None, rule_name_pattern=pattern,
+                           rule_name_match=match_type, rule_object_types=set(),
+                           rule_property="", rule_property_value="")
+
+
+def test_glob_and_regex_patterns_match_names():
+    assert rules.name_matcher("SM_*")("SM_Rock")
+    assert not rules.name_matcher("SM_*")("Rock_SM_")
+    assert rules.name_matcher("_LOD[0-9]$", 'REGEX')("Rock_LOD1")
+
+
+def test_invalid_regex_matches_nothing_and_says_why():
+    group = rule_group("Rock_(", 'REGEX')
+    assert not rules.name_matcher(group.rule_name_pattern, 'REGEX')("Rock_(")
+    assert rules.rule_error(group).startswith("Invalid name pattern")
+
+
+def test_globs_and_valid_regexes_have_no_error():
+    assert rules.rule_error(rule_group("Rock_(", 'GLOB')) == ""
+    assert rules.rule_error(rule_group("Rock_.*", 'REGEX')) == ""
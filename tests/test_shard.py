@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from fbx_preflight import shard
+
+
+def test_grid_cells_hold_the_objects_centered_in_them():
+    centers = np.array([[1.0, 1.0, 0.0], [9.0, 9.0, 0.0], [11.0, 1.0, 0.0], [-1.0, 0.0, 0.0]])
+    cells = {cell.name: sorted(cell.members.tolist()) for cell in shard.grid_cells(centers, 10.0)}
+    assert cells == {"0_0_0": [0, 1], "1_0_0": [2], "-1_0_0": [3]}
+
+
+def test_octree_cells_split_until_small_enough():
+    centers = np.random.default_rng(4).random((200, 3)) * 100.0
+    cells = shard.octree_cells(centers, 16)
+
+    members = np.concatenate([cell.members for cell in cells])
+    assert sorted(members.tolist()) == list(range(200))
+    assert all(len(cell.members) <= 16 for cell in cells)
+    for cell in cells:
+        inside = centers[cell.members]
+        assert (inside >= cell.bounds_min - 1e-9).all() and (inside <= cell.bounds_max + 1e-9).all()
+
+
+def test_index_lists_the_cell_files_it_wrote(tmp_path):
+    group = SimpleNamespace(name="Terrain", shard_mode='GRID', shard_cell_size=10.0)
+    objects = [SimpleNamespace(name="Rock"), SimpleNamespace(name="Tree")]
+    cells = shard.grid_cells(np.array([[1.0, 1.0, 0.0], [11.0, 1.0, 0.0]]), 10.0)
+    for cell in cells:
+        cell.content_min = cell.bounds_min
+        cell.content_max = cell.bounds_max
+
+    path = shard.index_path(str(tmp_path / "Terrain.fbx"))
+    with open(path, "wb") as index_file:
+        index_file.write(shard.encode_index(group, cells, objects, path, {"axis_up": "Z"}))
+
+    index = shard.read_index(path)
+    assert index["axis_up"] == "Z"
+    assert index["cell_size"] == 10.0
+    assert [cell["file"] for cell in index["cells"]] == ["Terrain_0_0_0.fbx", "Terrain_1_0_0.fbx"]
+    assert shard.outputs(path, ["Rock", "Tree"]) == [
+        (path, ["Rock", "Tree"]),
+        (str(tmp_path / "Terrain_0_0_0.fbx"), ["Rock"]),
+        (str(tmp_path / "Terrain_1_0_0.fbx"), ["Tree"]),
+    ]
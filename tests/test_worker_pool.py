@@ -0,0 +1,20 @@
+import worker_pool
+
+
+def test_events_round_trip_through_worker_output():
+    event = {"event": "group", "name": "Props", "seconds": 0.5}
+    line = worker_pool.encode_event(event) + "\n"
+    assert worker_pool.decode_event(line) == event
+
+
+def test_other_output_is_not_an_event():
+    assert worker_pool.decode_event("Blender 4.2.0\n") is None
+    assert worker_pool.decode_event(worker_pool.EVENT_PREFIX + "{not json\n") is None
+
+
+def test_failed_result_names_the_job():
+    result = worker_pool.failed_result({"blendfile": "/art/level.blend"}, "Worker exited.")
+    assert result["event"] == "result"
+    assert result["blendfile"] == "/art/level.blend"
+    assert result["groups"] == []
+    assert result["error"] == "Worker exited."
@@ -0,0 +1,162 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+from bpy.app.handlers import persistent
+
+from . import rules
+
+
+class GroupValidity:
+    """
+    Validity of every export group of a scene, computed in one pass:
+    which groups are valid, which names are duplicated, and whether
+    all groups can be exported together.
+    """
+    __slots__ = ("signature", "valid", "duplicates", "exportable")
+
+    def __init__(self, scene):
+        groups = scene.preflight_props.fbx_export_groups
+        object_names = set(bpy.data.objects.keys())
+
+        self.signature = signature(scene)
+        self.valid = []
+        self.exportable = len(groups) > 0
+
+        seen = set()
+        self.duplicates = set()
+        for group in groups:
+            if group.name in seen:
+                self.duplicates.add(group.name)
+            seen.add(group.name)
+
+        for group in groups:
+            pointers = [obj.obj_pointer for obj in group.obj_names]
+            has_objects = (len(pointers) > 0 or rules.group_has_rules(group)) \
+                and all(pointers)
+            self.exportable = self.exportable and has_objects
+            has_valid_rules = not rules.rule_error(group)
+            self.exportable = self.exportable and has_valid_rules
+            self.valid.append(
+                bool(group.name)
+                and has_objects
+                and has_valid_rules
+                and all(obj.name in object_names for obj in pointers)
+                and group.name not in self.duplicates)
+
+
+# GroupValidity of each scene, by scene pointer
+index = {}
+
+# Set while the add-on is registered
+registered = False
+
+
+def signature(scene):
+    """
+    Cheap summary of the scene, to catch edits made while no handler
+    ran, like groups or objects added by a script in the background.
+    """
+    return (len(scene.preflight_props.fbx_export_groups), len(bpy.data.objects))
+
+
+def for_scene(scene):
+    """Return the GroupValidity of a scene, rebuilding it if it is stale."""
+    key = scene.as_pointer()
+    validity = index.get(key)
+    if validity is None or validity.signature != signature(scene):
+        add_handlers()
+        validity = index[key] = GroupValidity(scene)
+    return validity
+
+
+def group_is_valid(scene, group_idx):
+    valid = for_scene(scene).valid
+    return group_idx < len(valid) and valid[group_idx]
+
+
+def invalidate(*args):
+    """
+    Drop the index, to be rebuilt on the next draw or poll. Takes
+    any arguments, so it can be used as a property update callback.
+    """
+    index.clear()
+
+
+#
+# Handlers
+#
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph=None):
+    # Transform and geometry edits do not change validity, while
+    # objects being added, removed or relinked update their scene
+    # and collections, as do edits of the groups themselves.
+    if not index:
+        return
+    if depsgraph is None:
+        invalidate()
+        return
+
+    for update in depsgraph.updates:
+        if isinstance(update.id, (bpy.types.Scene, bpy.types.Collection)):
+            invalidate()
+            return
+
+
+@persistent
+def on_reset(*args):
+    invalidate()
+
+
+def handler_lists():
+    handlers = bpy.app.handlers
+    return (
+        (handlers.depsgraph_update_post, on_depsgraph_update),
+        (handlers.undo_post, on_reset),
+        (handlers.redo_post, on_reset),
+        (handlers.load_post, on_reset),
+    )
+
+
+def add_handlers():
+    """
+    Add the handlers that keep the index fresh. They are only needed
+    once something asks for validity, like a panel or an export's
+    poll, so background runs that never do skip them entirely.
+    """
+    if not registered:
+        return
+    for handler_list, handler in handler_lists():
+        if handler not in handler_list:
+            handler_list.append(handler)
+
+
+def register():
+    global registered
+    registered = True
+
+
+def unregister():
+    global registered
+    registered = False
+    for handler_list, handler in handler_lists():
+        if handler in handler_list:
+            handler_list.remove(handler)
+    invalidate()
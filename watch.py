@@ -0,0 +1,301 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 2
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+import bpy
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from bpy.app.handlers import persistent
+
+from . import report
+from . import rules
+
+CLI_SCRIPT = os.path.join(os.path.dirname(__file__), "cli", "preflight_blendfile.py")
+POLL_INTERVAL = 0.5
+
+
+class WatchState:
+    """
+    What changed since the groups were last exported, and the
+    background export started on the last save, if it is running.
+    """
+
+    def __init__(self):
+        # (ID type, name) of the objects and data edited since the last export
+        self.dirty = set()
+        # Objects, options and path of each group when it was last exported
+        self.signatures = {}
+        # Groups to export once the running export finishes
+        self.pending = set()
+        self.job = None
+        self.status = ""
+
+
+state = WatchState()
+
+
+def id_key(datablock):
+    return (type(datablock).__name__, datablock.name)
+
+
+def object_keys(obj):
+    """
+    Return the keys of an object and of the data its export depends
+    on, including the objects its modifiers reference, like a boolean
+    cutter or a deform target, and their data.
+    """
+    keys = [id_key(obj)]
+    if obj.data is not None:
+        keys.append(id_key(obj.data))
+    keys += [id_key(slot.material) for slot in obj.material_slots if slot.material]
+    animation_data = obj.animation_data
+    if animation_data is not None and animation_data.action is not None:
+        keys.append(id_key(animation_data.action))
+    for target in modifier_targets(obj):
+        keys.append(id_key(target))
+        if isinstance(target, bpy.types.Object) and target.data is not None:
+            keys.append(id_key(target.data))
+    return keys
+
+
+def modifier_targets(obj):
+    """
+    Yield the datablocks the modifiers of an object point to, with the
+    objects of referenced collections, as edits to a collection only
+    show up as edits to its objects.
+    """
+    for modifier in obj.modifiers:
+        for prop in modifier.bl_rna.properties:
+            target = getattr(modifier, prop.identifier, None) if prop.type == 'POINTER' else None
+            if isinstance(target, bpy.types.Collection):
+                yield from target.all_objects
+            elif isinstance(target, bpy.types.ID):
+                yield target
+
+
+def group_signature(group, context):
+    """
+    Summarize which objects a group exports, and how and where, with
+    the same settings as the export cache, like shard and LOD settings
+    and the exporter that writes it.
+    """
+    from . import operators
+
+    objects = operators.objects_for_group(group, context)
+    return (
+        tuple(obj.name for obj in objects if obj is not None),
+        json.dumps(operators.group_settings(group, context), sort_keys=True, default=sorted),
+        operators.export_path_for_group(group, context),
+    )
+
+
+def snapshot(context):
+    """Take the current state of every group as already exported."""
+    state.dirty.clear()
+    with rules.scene_index(context.scene):
+        state.signatures = {group.name: group_signature(group, context)
+                            for group in context.scene.preflight_props.fbx_export_groups}
+
+
+def dirty_groups(context):
+    """
+    Return the names of the groups that contain an object edited
+    since their last export, or whose objects, options or export
+    path changed, like an object added to the group or matched by
+    its rules.
+    """
+    from . import operators
+
+    names = []
+    with rules.scene_index(context.scene):
+        for group in context.scene.preflight_props.fbx_export_groups:
+            signature = group_signature(group, context)
+            if state.signatures.get(group.name) != signature:
+                names.append(group.name)
+                continue
+
+            for obj in operators.objects_for_group(group, context):
+                if obj is not None and state.dirty.intersection(object_keys(obj)):
+                    names.append(group.name)
+                    break
+    return names
+
+
+def mark_exported(context, group_names):
+    """Record groups as exported, so they are clean until edited again."""
+    groups = context.scene.preflight_props.fbx_export_groups
+    with rules.scene_index(context.scene):
+        for name in group_names:
+            group = groups.get(name)
+            if group is not None:
+                state.signatures[name] = group_signature(group, context)
+
+
+def start_export(context, group_names):
+    """
+    Export groups from the saved file in a background Blender, so
+    the UI stays responsive. A save during a running export queues
+    its groups for when it finishes.
+    """
+    # Groups are clean as of this save. Edits made from now on mark
+    # them dirty again for the next one.
+    mark_exported(context, group_names)
+    if state.job is not None:
+        state.pending.update(group_names)
+        return
+
+    report_dir = tempfile.mkdtemp(prefix="preflight-watch-")
+    report_path = os.path.join(report_dir, "report.json")
+    command = [
+        bpy.app.binary_path, "--background", bpy.data.filepath,
+        "--python", CLI_SCRIPT, "--",
+        "--report", report_path, "--groups"] + list(group_names)
+
+    process = subprocess.Popen(
+        command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    state.job = (process, sorted(group_names), report_dir, report_path, time.time())
+    set_status("Preflight: Re-exporting {0}...".format(", ".join(sorted(group_names))))
+
+    if not bpy.app.timers.is_registered(poll_export):
+        bpy.app.timers.register(poll_export, first_interval=POLL_INTERVAL)
+
+
+def poll_export():
+    """Timer checking on the background export, until it finishes."""
+    process, group_names, report_dir, report_path, time_start = state.job
+    if process.poll() is None:
+        return POLL_INTERVAL
+
+    seconds = time.time() - time_start
+    try:
+        export_report = report.ExportReport.read(report_path)
+        failed = [group["name"] for group in export_report.failed]
+    except (OSError, ValueError):
+        failed = group_names
+    finally:
+        shutil.rmtree(report_dir, ignore_errors=True)
+
+    state.job = None
+    if failed:
+        # Keep failed groups dirty, so the next save tries them again
+        for name in failed:
+            state.signatures.pop(name, None)
+        set_status("Preflight: Re-export of {0} failed after {1:.1f}s".format(
+            ", ".join(failed), seconds))
+    else:
+        set_status("Preflight: Re-exported {0} in {1:.1f}s".format(
+            ", ".join(group_names), seconds))
+
+    if state.pending:
+        group_names, state.pending = sorted(state.pending), set()
+        start_export(bpy.context, group_names)
+    return None
+
+
+def set_status(text):
+    state.status = text
+    for window in getattr(bpy.context.window_manager, "windows", []):
+        for area in window.screen.areas:
+            if area.type in {'STATUSBAR', 'PROPERTIES'}:
+                area.tag_redraw()
+
+
+def draw_status(self, context):
+    """Status bar entry showing the last re-export."""
+    if state.status and context.scene.preflight_props.export_options.watch_exports:
+        self.layout.label(text=state.status, icon="EXPORT")
+
+
+#
+# Handlers
+#
+
+
+def watching(scene):
+    return scene is not None and scene.preflight_props.export_options.watch_exports
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph=None):
+    if depsgraph is None or not watching(scene):
+        return
+    for update in depsgraph.updates:
+        datablock = update.id.original
+        if isinstance(datablock, (bpy.types.Scene, bpy.types.Collection)):
+            continue
+        # Objects are also updated when they are selected
+        if isinstance(datablock, bpy.types.Object) and not (
+                update.is_updated_transform or update.is_updated_geometry):
+            continue
+        state.dirty.add(id_key(datablock))
+
+
+@persistent
+def on_save_post(*args):
+    context = bpy.context
+    if not watching(context.scene):
+        return
+
+    group_names = dirty_groups(context)
+    if group_names:
+        state.dirty.clear()
+        start_export(context, group_names)
+
+
+@persistent
+def on_load_post(*args):
+    # Whatever the file holds is taken as exported until it is edited
+    state.signatures = {}
+    state.pending.clear()
+    state.status = ""
+    if watching(bpy.context.scene):
+        snapshot(bpy.context)
+
+
+def on_toggle(self, context):
+    """Update callback of the watch option: start from a clean state."""
+    if self.watch_exports:
+        snapshot(context)
+
+
+def handler_lists():
+    handlers = bpy.app.handlers
+    return (
+        (handlers.depsgraph_update_post, on_depsgraph_update),
+        (handlers.save_post, on_save_post),
+        (handlers.load_post, on_load_post),
+    )
+
+
+def register():
+    for handler_list, handler in handler_lists():
+        if handler not in handler_list:
+            handler_list.append(handler)
+    bpy.types.STATUSBAR_HT_header.append(draw_status)
+
+
+def unregister():
+    for handler_list, handler in handler_lists():
+        if handler in handler_list:
+            handler_list.remove(handler)
+    bpy.types.STATUSBAR_HT_header.remove(draw_status)
+    if bpy.app.timers.is_registered(poll_export):
+        bpy.app.timers.unregister(poll_export)